@@ -0,0 +1,503 @@
+from Parsing import DEFAULT_ATOM_TYPE, parse_pdb
+from Distances import RESIDUES, DEFAULT_BINS, Chain, iter_distance_blocks, count_distances_by_pairs
+from Training import get_interatomic_distances_distribution_by_pairs, get_distances_distribution_from_files, get_reference_distances_distribution, get_frequencies, get_scores, get_frequencies_by_pairs, get_scores_by_pairs, save_distribs
+from Scoring import load_scores
+from math import ceil, floor
+from Model import ScoringModel
+from Store import CorpusStore, pack
+from Profiling import get_throughput
+import numpy as np
+import subprocess
+import tracemalloc
+import tempfile
+import platform
+import glob
+import json
+import os
+import sys
+import time
+
+#Version of the format of the benchmark reports, the reports of different versions are not compared
+BENCHMARK_VERSION = 2
+
+#Numbers of residues of the synthetic structures added to the bundled pdb files
+SYNTHETIC_SIZES = (1000, 3000, 10000)
+
+#Largest synthetic structure scored with legacy_get_estimated_energy, whose dictionary of raw distances grows with the square of the size
+LEGACY_SCORING_MAX_SIZE = 3000
+
+#Largest residue sequence number of the pdb format, the synthetic structures are split in chains of at most this size
+MAX_RESIDUES_BY_CHAIN = 9999
+
+#Shortest time (in seconds) of a measure, the fast stages are repeated in a loop until it is reached
+MIN_MEASURE_TIME = 0.05
+
+#Relative increase of the time or of the peak memory of a stage from which the compare mode reports a regression
+REGRESSION_THRESHOLD = 0.2
+
+#Increase of the peak memory (in MB) below which no regression is reported, whatever the relative increase
+MIN_MEMORY_INCREASE = 1.0
+
+def legacy_parse_pdb(filename):
+
+	""" Frozen copy of the list comprehension parsing of the C3' atoms of the first version of Training.py, the reference of the parse_legacy stage
+
+	Parsing.parse_pdb now scans the files with the fixed columns of the records, this copy must not be changed
+
+	Parameters
+	----------
+	filename
+		String containing the path to the pdb file that must be parsed
+
+	Returns
+	-------
+	chain_lines
+		Dictionary associating each chain ID to the residue name, residue number and coordinates of each of its C3' atoms
+	"""
+
+	lines = []
+
+	#Gets the lines from the "filename" file and strips them of the Carriage Return at the end of the line
+	with open(filename) as f:
+		lines = [line.rstrip() for line in f]
+
+	#Keeps only the lines containing atoms (Line starts with "ATOM")
+	atom_lines = [line for line in lines if line[0:6].replace(" ", "") == "ATOM"]
+
+	#Keeps only the lines with C3' atoms
+	C3_lines = [line for line in atom_lines if line[12:16].replace(" ", "") == "C3'"]
+
+	#Get the set of chain IDs in the file
+	chain_ids = set([line[21] for line in C3_lines])
+
+	#Dictionnary for parsed lines for each chain in the file
+	chain_lines = dict()
+	for id in chain_ids :
+		chain_lines[id] = []
+
+	#Parses the lines from "C3_lines"
+	for line in C3_lines :
+		chain_lines[line[21]].append([line[17:20].replace(" ", ""), int(line[22:26].replace(" ", "")), float(line[30:38].replace(" ", "")), float(line[38:46].replace(" ", "")), float(line[46:54].replace(" ", ""))])
+	return chain_lines
+
+def legacy_get_estimated_energy(input_distances_distrib, distance_scores_by_pairs):
+
+	""" Frozen copy of the dictionary based scoring of the first version of Scoring.py, the reference of the scoring_legacy stage
+
+	Scoring.get_estimated_energy now scores with the arrays of Model.ScoringModel, this copy must not be changed
+
+	Parameters
+	----------
+	input_distances_distrib
+		Dictionary containing the distribution of distances between 1 and 20 included and not rounded down
+	distance_scores_by_pairs
+		Dictionary of the distribution of scores for distances between 1 and 20 included and rounded down for each pair of nucleosides
+
+	Returns
+	-------
+	sum(scores)
+		The estimated Gibbs free energy which is the sum of the scores calculated by linear interpolation for the input distances
+	"""
+
+	scores = []
+	for pair, distrib in input_distances_distrib.items():
+		for distance, nb in distrib.items() :
+			x0 = floor(distance)
+			while (not(x0 in distance_scores_by_pairs[pair].keys()) and x0 > 0):
+				x0 -= 1
+			x1 = ceil(distance)
+			while (not(x1 in distance_scores_by_pairs[pair].keys()) and x1 < 20):
+				x1 += 1
+			y0, y1 = distance_scores_by_pairs[pair][x0], distance_scores_by_pairs[pair][x1]
+			scores.append( ( (y0 * (x1 - distance)) + (y1 * (distance - x0)) ) / (x1 - x0) * nb )
+	return sum( scores )
+
+def get_synthetic_chain(nb_residues : int, seed : int = 0):
+
+	""" Function building a synthetic chain of C3' atoms following a random walk with steps of the length of a nucleotide
+
+	Parameters
+	----------
+	nb_residues : int
+		Number of residues of the chain
+	seed : int
+		Seed of the random generator, the same seed always gives the same chain
+
+	Returns
+	-------
+	chain : Chain
+		Chain of random residues numbered from 1, with coordinates rounded to the 3 decimals of the pdb format
+	"""
+
+	rng = np.random.default_rng(seed)
+	steps = rng.normal(size = (nb_residues, 3))
+	steps *= 5.9 / np.linalg.norm(steps, axis = 1)[:, None]
+	return Chain(rng.integers(0, len(RESIDUES), nb_residues), np.arange(1, nb_residues + 1), np.round(np.cumsum(steps, axis = 0), 3))
+
+def write_synthetic_pdb(path : str, chain : Chain):
+
+	""" Function writing a synthetic chain as a pdb file, with the other backbone atoms of each residue around its C3' atom
+
+	Parameters
+	----------
+	path : str
+		String containing the path to the pdb file
+	chain : Chain
+		Chain written, split in chains A, B, ... of at most MAX_RESIDUES_BY_CHAIN residues
+
+	Returns
+	-------
+	None
+	"""
+
+	atom_names = ["P", "O5'", "C5'", "C4'", "C3'", "O3'"]
+	nb_chains = -(-len(chain) // MAX_RESIDUES_BY_CHAIN)
+	size = -(-len(chain) // nb_chains)
+	serial = 1
+	with open(path, "w") as f :
+		for k in range(len(chain)) :
+			chain_id = chr(ord("A") + k // size)
+			x, y, z = chain.coordinates[k]
+			for offset, name in enumerate(atom_names) :
+				shift = 0.0 if name == "C3'" else 0.7 * (offset - 4)
+				f.write(f"ATOM  {serial % 100000:5d} {name:<4s}   {RESIDUES[chain.residues[k]]} {chain_id}{k % size + 1:4d}    {x + shift:8.3f}{y:8.3f}{z - shift:8.3f}  1.00  0.00\n")
+				serial += 1
+		f.write("END\n")
+	return
+
+def measure(function, repeat : int = 3):
+
+	""" Function measuring the time and the peak memory of a function
+
+	The function is called in a loop of enough calls to last MIN_MEASURE_TIME, the loop is repeated and the fastest one is kept,
+	then the function is called once more while the memory allocations are traced
+
+	Parameters
+	----------
+	function
+		Function called without any parameter
+	repeat : int
+		Number of timed loops
+
+	Returns
+	-------
+	result
+		Dictionary with the time of one call in seconds, the number of calls by loop and the peak memory in MB
+	"""
+
+	loops = 1
+	while (True) :
+		start = time.perf_counter()
+		for k in range(loops) :
+			function()
+		elapsed = time.perf_counter() - start
+		if (elapsed >= MIN_MEASURE_TIME) :
+			break
+		loops *= 10 if elapsed * 10 < MIN_MEASURE_TIME else 2
+
+	times = [elapsed / loops]
+	for r in range(repeat - 1) :
+		start = time.perf_counter()
+		for k in range(loops) :
+			function()
+		times.append((time.perf_counter() - start) / loops)
+
+	tracemalloc.start()
+	function()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return {"seconds" : min(times), "median_seconds" : float(np.median(times)), "loops" : loops, "peak_memory" : peak / (1 << 20)}
+
+def measure_import_time(modules = ("Training", "Scoring")):
+
+	""" Function measuring in a new interpreter the time spent to import some scripts
+
+	Parameters
+	----------
+	modules
+		Names of the modules imported together
+
+	Returns
+	-------
+	result
+		Dictionary with the import time in seconds and whether matplotlib was loaded by the imports
+	"""
+
+	code = "import sys, time\nstart = time.perf_counter()\nimport " + ", ".join(modules) + "\nprint(time.perf_counter() - start, 'matplotlib' in sys.modules)"
+	times = []
+	for k in range(3) :
+		output = subprocess.run([sys.executable, "-c", code], cwd = os.path.dirname(os.path.abspath(__file__)), capture_output = True, text = True, check = True).stdout.split()
+		times.append(float(output[0]))
+	return {"seconds" : min(times), "median_seconds" : float(np.median(times)), "loops" : 1, "peak_memory" : 0.0, "matplotlib_loaded" : output[1] == "True"}
+
+def consume_distance_blocks(chains, method : str):
+
+	""" Function computing all the distances of chains below the maximal distance of the default bins, without using them
+
+	Parameters
+	----------
+	chains
+		Iterable of Chain objects
+	method : str
+		See Distances.iter_distance_blocks
+
+	Returns
+	-------
+	nb_distances : int
+		Number of distances computed
+	"""
+
+	nb_distances = 0
+	for chain in chains :
+		for i, j, distances in iter_distance_blocks(chain, DEFAULT_BINS.max + DEFAULT_BINS.width, method = method) :
+			nb_distances += len(distances)
+	return nb_distances
+
+def run_benchmarks(path_data_dir : str, sizes = SYNTHETIC_SIZES, repeat : int = 3, stages = None, verbose : bool = False):
+
+	""" Function running each stage of the training and scoring pipelines in isolation on the bundled and synthetic structures
+
+	Parameters
+	----------
+	path_data_dir : str
+		String containing the path to the data directory, the pdb files of its pdb* sub-directories are used
+	sizes
+		Numbers of residues of the synthetic structures
+	repeat : int
+		See measure
+	stages
+		Names of the stages run, all of them if None
+	verbose : bool
+		Boolean used to print each result on the error output as soon as it is measured
+
+	Returns
+	-------
+	report
+		Dictionary with the environment, the parameters and the results of each stage and case, keyed "stage/case"
+	"""
+
+	pdb_file_names = sorted(glob.glob(os.path.join(path_data_dir, "pdb*/*.pdb")))
+	results = dict()
+
+	def run(stage, case, function, **details) :
+		if (stages is not None and not (stage in stages)) :
+			return
+		result = {**measure(function, repeat), **details}
+		#The stages reading files also report their throughput
+		if ("bytes" in details) :
+			result["megabytes_per_second"] = get_throughput(details.get("files", 0), details["bytes"], result["seconds"])[1]
+		results[f"{stage}/{case}"] = result
+		if (verbose) :
+			print(f"{stage}/{case} : {result['seconds']:.6f} s, {result['peak_memory']:.1f} MB" + (f", {result['megabytes_per_second']:.2f} MB/s" if "megabytes_per_second" in result else ""), file = sys.stderr)
+
+	with tempfile.TemporaryDirectory() as tmp_dir :
+
+		#Structures of each case : the bundled files as a corpus, then each synthetic structure alone
+		cases = [("bundled", pdb_file_names)]
+		for size in sizes :
+			path = os.path.join(tmp_dir, f"synthetic_{size}.pdb")
+			write_synthetic_pdb(path, get_synthetic_chain(size))
+			cases.append((f"synthetic_{size}", [path]))
+
+		#The structures of each case are packed in a store, from which the following stages read them instead of parsing the files again
+		stores = dict()
+		for case, file_names in cases :
+			nb_bytes = sum(os.path.getsize(f) for f in file_names)
+			stores[case] = os.path.join(tmp_dir, f"{case}.store")
+			pack(file_names, stores[case])
+			store = CorpusStore(stores[case])
+			chains = [chain for name, table in store.iter_tables() for chain in table.get_chains(DEFAULT_ATOM_TYPE)]
+			nb_atoms = sum(len(chain) for chain in chains)
+
+			run("parse_legacy", case, lambda : [legacy_parse_pdb(f) for f in file_names], files = len(file_names), bytes = nb_bytes)
+			run("parse", case, lambda : [parse_pdb(f) for f in file_names], files = len(file_names), bytes = nb_bytes)
+			run("pack", case, lambda : pack(file_names, stores[case], reuse = False), files = len(file_names), bytes = nb_bytes)
+			run("store_read", case, lambda : [table for name, table in store.iter_tables()], files = len(file_names), bytes = os.path.getsize(stores[case]))
+			for method in ("brute", "grid") :
+				run(f"distances_{method}", case, lambda : consume_distance_blocks(chains, method), atoms = nb_atoms)
+			run("binning", case, lambda : count_distances_by_pairs(chains), atoms = nb_atoms)
+
+		#Reduction of the counts of the bundled corpus into frequencies and scores, with the dictionaries then with the arrays
+		distances_distribution_by_pairs = get_distances_distribution_from_files(pdb_file_names)
+		reference_distribution = get_reference_distances_distribution(distances_distribution_by_pairs)
+		distance_frequencies_by_pairs = {pair : get_frequencies(distrib) for pair, distrib in distances_distribution_by_pairs.items()}
+		reference_distance_frequencies = get_frequencies(reference_distribution)
+		distance_scores_by_pairs = get_scores(distance_frequencies_by_pairs, reference_distance_frequencies)
+
+		run("reference_distribution", "bundled", lambda : get_reference_distances_distribution(distances_distribution_by_pairs))
+		run("frequencies", "bundled", lambda : ({pair : get_frequencies(distrib) for pair, distrib in distances_distribution_by_pairs.items()}, get_frequencies(reference_distribution)))
+		run("scores", "bundled", lambda : get_scores(distance_frequencies_by_pairs, reference_distance_frequencies))
+
+		counts = sum(count_distances_by_pairs(table.get_chains(DEFAULT_ATOM_TYPE)) for name, table in CorpusStore(stores["bundled"]).iter_tables())
+		counts = np.vstack([counts, counts.sum(axis = 0)])
+		frequencies = get_frequencies_by_pairs(counts)
+		run("frequencies_arrays", "bundled", lambda : get_frequencies_by_pairs(counts))
+		run("scores_arrays", "bundled", lambda : get_scores_by_pairs(frequencies[:-1], frequencies[-1], counts[:-1]))
+
+		#Csv files of the scores, written and read like the training and scoring scripts do
+		scores_dir = os.path.join(tmp_dir, "scores")
+		run("csv_save", "bundled", lambda : save_distribs(scores_dir, distance_scores_by_pairs), files = len(distance_scores_by_pairs))
+		run("csv_load", "bundled", lambda : load_scores(tmp_dir), files = len(distance_scores_by_pairs))
+
+		#Scoring with the dictionaries of raw distances, then with the streaming model
+		#The legacy scorer reads the scores from the csv files like the first Scoring.py did, with all the bins
+		save_distribs(scores_dir, distance_scores_by_pairs)
+		legacy_scores_by_pairs = load_scores(tmp_dir)
+		model = ScoringModel.from_dict(distance_scores_by_pairs)
+		for case, file_names in cases :
+			if (case == "bundled" or int(case.split("_")[-1]) <= LEGACY_SCORING_MAX_SIZE) :
+				run("scoring_legacy", case, lambda : [legacy_get_estimated_energy(get_interatomic_distances_distribution_by_pairs(f, dict(), round_down = False), legacy_scores_by_pairs) for f in file_names], files = len(file_names))
+			chains = [chain for name, table in CorpusStore(stores[case]).iter_tables() for chain in table.get_chains(DEFAULT_ATOM_TYPE)]
+			run("scoring", case, lambda : model.score(chains), atoms = sum(len(chain) for chain in chains))
+
+	if (stages is None or "import" in stages) :
+		results["import/Training+Scoring"] = measure_import_time()
+		#Scoring alone must stay light, it is what a scoring run imports
+		results["import/Scoring"] = measure_import_time(["Scoring"])
+
+	return {
+		"version" : BENCHMARK_VERSION,
+		"environment" : {"python" : platform.python_version(), "numpy" : np.__version__, "platform" : platform.platform(), "cpus" : os.cpu_count(), "date" : time.strftime("%Y-%m-%dT%H:%M:%S")},
+		"parameters" : {"sizes" : list(sizes), "repeat" : repeat, "bundled_files" : len(pdb_file_names)},
+		"results" : results
+	}
+
+def compare_reports(report : dict, baseline : dict, threshold : float = REGRESSION_THRESHOLD):
+
+	""" Function comparing the results of a benchmark report to the ones of a baseline report
+
+	Parameters
+	----------
+	report : dict
+		Report produced by run_benchmarks
+	baseline : dict
+		Report of the same version used as reference
+	threshold : float
+		Relative increase of the time or of the peak memory from which a stage is reported as a regression
+
+	Returns
+	-------
+	comparison
+		List of dictionaries with the stage and case, the ratios of the times and peak memories to the baseline and the regressions found
+	"""
+
+	if (baseline.get("version") != report["version"]) :
+		raise ValueError(f"The baseline report has the version {baseline.get('version')} instead of {report['version']}")
+
+	comparison = []
+	for key, result in report["results"].items() :
+		if not (key in baseline["results"]) :
+			continue
+		reference = baseline["results"][key]
+		regressions = []
+		time_ratio = result["seconds"] / reference["seconds"] if reference["seconds"] > 0 else 1.0
+		memory_ratio = result["peak_memory"] / reference["peak_memory"] if reference["peak_memory"] > 0 else 1.0
+		if (time_ratio > 1 + threshold) :
+			regressions.append("time")
+		if (memory_ratio > 1 + threshold and result["peak_memory"] - reference["peak_memory"] > MIN_MEMORY_INCREASE) :
+			regressions.append("memory")
+		if (result.get("matplotlib_loaded") and not (reference.get("matplotlib_loaded"))) :
+			regressions.append("matplotlib")
+		comparison.append({"key" : key, "time_ratio" : time_ratio, "memory_ratio" : memory_ratio, "regressions" : regressions})
+	return comparison
+
+def main():
+
+	""" Function called when this script is executed as a script and not imported as a library
+
+	Parameters
+	----------
+	None
+
+	Returns
+	-------
+	None
+	"""
+
+	path_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+	output_path = None
+	baseline_path = None
+	threshold = REGRESSION_THRESHOLD
+	repeat = 3
+	sizes = SYNTHETIC_SIZES
+	stages = None
+	usage = ("Usage :\n"
+		"python [Path_to_Benchmark.py] [-h, --help] [--output File] [--compare Baseline] [--threshold T] [--repeat N] [--sizes N,N,...] [--stages Stage,Stage,...] [Path_to_data_directory]\n"
+		"\t[Path_to_Benchmark.py] : Path to this benchmark script \n"
+		"\t[-h, --help] : Prints this help text \n"
+		"\t[--output File] : File where the JSON report is written (default : standard output) \n"
+		"\t[--compare Baseline] : JSON report of a previous run, the stages slower or using more memory than in it are reported and the exit status is 1 \n"
+		"\t[--threshold T] : Relative increase from which a stage is reported as a regression by --compare (default : 0.2) \n"
+		"\t[--repeat N] : Number of timed loops of each stage, the fastest is kept (default : 3) \n"
+		"\t[--sizes N,N,...] : Numbers of residues of the synthetic structures (default : 1000,3000,10000) \n"
+		"\t[--stages Stage,Stage,...] : Stages run (default : all), among parse_legacy, parse, pack, store_read, distances_brute, distances_grid, binning, reference_distribution, frequencies, scores, frequencies_arrays, scores_arrays, csv_save, csv_load, scoring_legacy, scoring and import \n"
+		"\t[Path_to_data_directory] : Path to the data directory\n"
+		"\t\tMust contain a directory containing pdb files")
+
+	i = 1
+	while (i < len(sys.argv)):
+		if (sys.argv[i] in ["-h","--help"]) :
+			print(usage)
+			return
+		elif (sys.argv[i] in ["--output", "--compare", "--stages"] and i + 1 < len(sys.argv)) :
+			if (sys.argv[i] == "--output") :
+				output_path = sys.argv[i + 1]
+			elif (sys.argv[i] == "--compare") :
+				baseline_path = sys.argv[i + 1]
+			else :
+				stages = sys.argv[i + 1].split(",")
+			i += 1
+		elif (sys.argv[i] == "--threshold" and i + 1 < len(sys.argv)) :
+			try :
+				threshold = float(sys.argv[i + 1])
+			except ValueError :
+				print(usage)
+				return
+			i += 1
+		elif (sys.argv[i] == "--repeat" and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() and int(sys.argv[i + 1]) > 0) :
+			repeat = int(sys.argv[i + 1])
+			i += 1
+		elif (sys.argv[i] == "--sizes" and i + 1 < len(sys.argv) and all(s.isdigit() for s in sys.argv[i + 1].split(","))) :
+			sizes = tuple(int(s) for s in sys.argv[i + 1].split(",") if int(s) > 0)
+			i += 1
+		elif (os.path.exists(sys.argv[i])):
+			path_data_dir = os.path.abspath(sys.argv[i])
+		else:
+			print(usage)
+			return
+		i += 1
+
+	if not (os.path.isdir(path_data_dir)) :
+		print("Data directory not found.")
+		print(usage)
+		return
+
+	baseline = None
+	if (baseline_path is not None) :
+		with open(baseline_path) as f :
+			baseline = json.load(f)
+
+	report = run_benchmarks(path_data_dir, sizes, repeat, stages, verbose = True)
+
+	if (output_path is None) :
+		print(json.dumps(report, indent = 1))
+	else :
+		with open(output_path, "w") as f :
+			json.dump(report, f, indent = 1)
+
+	if (baseline is not None) :
+		comparison = compare_reports(report, baseline, threshold)
+		print(f"{'Stage/case':<40s} {'Time':>8s} {'Memory':>8s}", file = sys.stderr)
+		for c in comparison :
+			print(f"{c['key']:<40s} {c['time_ratio']:>7.2f}x {c['memory_ratio']:>7.2f}x {' '.join('REGRESSION(' + r + ')' for r in c['regressions'])}", file = sys.stderr)
+		regressions = [c for c in comparison if c["regressions"]]
+		print(f"{len(regressions)} regression(s) out of {len(comparison)} stages compared with {baseline_path}", file = sys.stderr)
+		if (regressions) :
+			sys.exit(1)
+
+	return
+
+#Call the main function when this script is executed as a script and not imported as a library
+if __name__ == "__main__" :
+	main()
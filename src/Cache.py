@@ -0,0 +1,196 @@
+from Distances import PAIRS, MIN_SEPARATION, DEFAULT_BINS, BinSpec
+import numpy as np
+import hashlib
+import os
+
+#Version of the cache format and of the parsing of the pdb files, must be increased when either changes to invalidate the existing caches
+CACHE_VERSION = 2
+
+def get_file_hash(filename : str):
+
+	""" Function calculating the SHA-256 hash of the content of a file
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the file
+
+	Returns
+	-------
+	hash : str
+		Hexadecimal digest of the content of the file
+	"""
+
+	h = hashlib.sha256()
+	with open(filename, "rb") as f :
+		for block in iter(lambda : f.read(1 << 20), b"") :
+			h.update(block)
+	return h.hexdigest()
+
+def get_cache_parameters(bins : BinSpec = DEFAULT_BINS, legacy_pairs : bool = False, atom_types = None):
+
+	""" Function building the string describing the parameters the cached counts depend on
+
+	A cache is only reused if it was built with the same parameters
+
+	Parameters
+	----------
+	bins : BinSpec
+		Bins of the cached counts
+	legacy_pairs : bool
+		See Training.get_interatomic_distances_distribution_by_pairs
+	atom_types
+		List of the atom types of the cached counts (see Training.count_atom_types), None for the counts of the default atom only
+
+	Returns
+	-------
+	parameters : str
+		String describing the version of the cache, the bins, the minimal separation, the pairs, the pair selection and the atom types
+	"""
+
+	parameters = f"version={CACHE_VERSION};bins={bins};min_separation={MIN_SEPARATION};pairs={','.join(PAIRS)};legacy_pairs={legacy_pairs}"
+	if (atom_types is not None) :
+		parameters += f";atom_types={','.join(atom_types)}"
+	return parameters
+
+class TrainingCache :
+
+	""" Class storing on disk the counts of interatomic distances of each pdb file used for the training
+
+	The counts of a file are kept as long as its content and the parameters of the cache do not change,
+	so a new training only parses the files that were added or modified since the last one
+
+	Attributes
+	----------
+	path
+		String containing the path to the .npz file of the cache
+	parameters
+		String built by get_cache_parameters
+	bins
+		Bins of the cached counts
+	shape
+		Shape of the array of counts of a file, (len(PAIRS), bins.nb_bins) or (number of atom types, len(PAIRS), bins.nb_bins)
+	entries
+		Dictionary associating the absolute path of each file to the hash of its content and its array of counts
+	total
+		Array of the sum of the counts of all the files in entries
+	"""
+
+	def __init__(self, path : str, parameters : str, bins : BinSpec = DEFAULT_BINS, nb_atom_types : int = None):
+		self.path = path
+		self.parameters = parameters
+		self.bins = bins
+		self.shape = (len(PAIRS), bins.nb_bins) if nb_atom_types is None else (nb_atom_types, len(PAIRS), bins.nb_bins)
+		self.entries = dict()
+		self.total = np.zeros(self.shape, dtype = np.int64)
+
+	def load(self):
+
+		""" Method loading the cache file if it exists and was built with the same parameters
+
+		Returns
+		-------
+		loaded : bool
+			True if the cache file was loaded, False if the cache starts empty
+		"""
+
+		if not (os.path.isfile(self.path)) :
+			return False
+		try :
+			with np.load(self.path) as data :
+				if (str(data["parameters"]) != self.parameters) :
+					return False
+				for filename, h, counts in zip(data["paths"].tolist(), data["hashes"].tolist(), data["counts"].astype(np.int64)) :
+					self.entries[filename] = (h, counts)
+				self.total = data["total"].astype(np.int64)
+		except (OSError, KeyError, ValueError) :
+			#Unreadable or incomplete cache, it is rebuilt
+			self.entries = dict()
+			self.total = np.zeros(self.shape, dtype = np.int64)
+			return False
+		return True
+
+	def update(self, filenames, count_files, hashes = None):
+
+		""" Method updating the cache so that it contains exactly the files passed as parameters
+
+		Parameters
+		----------
+		filenames
+			List of the paths to the pdb files used for the training
+		count_files
+			Function taking a list of paths and returning an iterable of (filename, counts, elapsed) like Training.iter_distances_counts
+			Only called on the files whose content is not already in the cache
+		hashes
+			List of the hash of each file (see get_file_hash) when it is already known, like the hashes of a corpus store, None to hash the files
+
+		Returns
+		-------
+		parsed, reused, removed
+			Numbers of files parsed, of files whose counts were taken from the cache under another path
+			and of files removed from the cache whose content is not in the files passed either (deleted files)
+		"""
+
+		hashes = {os.path.abspath(f) : get_file_hash(f) for f in filenames} if hashes is None else {os.path.abspath(f) : h for f, h in zip(filenames, hashes)}
+
+		#The counts of every file of the cache can be reused by a file with the same content, even if their path is removed below (moved or copied files)
+		counts_by_hash = {h : counts for h, counts in self.entries.values()}
+
+		#Files deleted, moved or modified since the cache was saved
+		new_hashes = set(hashes.values())
+		removed = 0
+		for filename in [f for f, (h, counts) in self.entries.items() if hashes.get(f) != h] :
+			h, counts = self.entries.pop(filename)
+			self.total -= counts
+			if not (filename in hashes or h in new_hashes) :
+				removed += 1
+
+		reused = 0
+		to_parse = []
+		for filename, h in hashes.items() :
+			if (filename in self.entries) :
+				continue
+			if (h in counts_by_hash) :
+				self.entries[filename] = (h, counts_by_hash[h])
+				self.total += counts_by_hash[h]
+				reused += 1
+			else :
+				to_parse.append(filename)
+
+		for filename, counts, elapsed in count_files(to_parse) :
+			self.entries[filename] = (hashes[filename], counts)
+			self.total += counts
+
+		return len(to_parse), reused, removed
+
+	def get_corpus_hash(self):
+
+		""" Method calculating a hash identifying the set of files in the cache, whatever their paths
+
+		Returns
+		-------
+		hash : str
+			Hexadecimal SHA-256 digest of the sorted hashes of the files
+		"""
+
+		return hashlib.sha256("\n".join(sorted(h for h, counts in self.entries.values())).encode()).hexdigest()
+
+	def save(self):
+
+		""" Method saving the cache to its .npz file, the previous file is only replaced once the new one is complete
+
+		Returns
+		-------
+		None
+		"""
+
+		os.makedirs(os.path.dirname(self.path), exist_ok = True)
+		filenames = list(self.entries.keys())
+		counts = np.zeros((len(filenames), *self.shape), dtype = np.int32)
+		for k, filename in enumerate(filenames) :
+			counts[k] = self.entries[filename][1]
+
+		tmp_path = self.path + ".tmp.npz"
+		np.savez_compressed(tmp_path, parameters = np.array(self.parameters), paths = np.array(filenames, dtype = str), hashes = np.array([self.entries[f][0] for f in filenames], dtype = str), counts = counts, total = self.total)
+		os.replace(tmp_path, self.path)
+		return
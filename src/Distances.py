@@ -0,0 +1,488 @@
+from Profiling import add_counters
+import numpy as np
+
+#Residues for which the distances are taken into account, any other residue ("N", ...) is skipped
+RESIDUES = "ACGU"
+
+#Keys of the pairs of residues in the order used for the rows of the count arrays
+PAIRS = [RESIDUES[i] + RESIDUES[j] for i in range(len(RESIDUES)) for j in range(i, len(RESIDUES))]
+
+#Table giving the row in PAIRS of the pair formed by two residue codes
+PAIR_INDEX = np.full((len(RESIDUES), len(RESIDUES)), -1, dtype=np.intp)
+for k, pair in enumerate(PAIRS) :
+	PAIR_INDEX[RESIDUES.index(pair[0]), RESIDUES.index(pair[1])] = k
+	PAIR_INDEX[RESIDUES.index(pair[1]), RESIDUES.index(pair[0])] = k
+
+#Minimal number of positions between two residues of a chain for their distance to be used
+MIN_SEPARATION = 3
+
+#Largest distance (in Angstrom) kept in the distributions by default
+MAX_DISTANCE = 20
+
+#Number of atoms processed at once along the rows of the distance matrix
+BLOCK_SIZE = 256
+
+#Largest number of candidate pairs of atoms measured at once, bounds the memory used by a block whatever the size of the chain
+BLOCK_PAIRS = 1 << 18
+
+#Number of atoms of a chain from which the cell grid is used instead of the brute force when the method is "auto"
+GRID_THRESHOLD = 1000
+
+#Offsets of the 13 neighbouring cells visited from each cell of the grid (the other 13 are visited from the neighbours)
+HALF_NEIGHBOURS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)]
+
+class BinSpec :
+
+	""" Class describing the bins of the distance distributions
+
+	The bins are labelled by their lower bound : min, min + width, ..., max
+	A distance d belongs to the bin of label min + k * width if min + k * width <= d < min + (k + 1) * width,
+	so the training keeps the distances from min to max + width excluded while the scoring interpolates between min and max included
+	The default bins (1 to 20 by 1) are the distances rounded down to an integer between 1 and 20 included
+
+	Attributes
+	----------
+	min
+		Label of the first bin
+	max
+		Label of the last bin
+	width
+		Width of the bins
+	nb_bins
+		Number of bins
+	labels
+		Array of the labels of the bins
+	"""
+
+	def __init__(self, min : float = 1, max : float = MAX_DISTANCE, width : float = 1):
+		self.min = min
+		self.max = max
+		self.width = width
+		if (width <= 0 or min < 0 or max <= min) :
+			raise ValueError(f"Invalid bins {min}:{max}:{width}, 0 <= min < max and width > 0 are expected")
+		self.nb_bins = int(round((max - min) / width)) + 1
+		self.labels = min + width * np.arange(self.nb_bins, dtype = np.float64)
+
+	@classmethod
+	def parse(cls, text : str):
+
+		""" Method creating bins from a "min:max:width" string
+
+		Parameters
+		----------
+		text : str
+			String containing the label of the first and last bins and the width of the bins separated by ":"
+
+		Returns
+		-------
+		bins : BinSpec
+			Bins described by the string
+		"""
+
+		values = [float(v) for v in text.split(":")]
+		if (len(values) != 3) :
+			raise ValueError(f"Invalid bins {text}, min:max:width expected")
+		return cls(*[int(v) if v.is_integer() else v for v in values])
+
+	@classmethod
+	def from_metadata(cls, metadata : dict):
+
+		""" Method creating bins from the metadata of a model file, see to_metadata
+
+		Parameters
+		----------
+		metadata : dict
+			Dictionary containing the "bin_min", "bin_max" and "bin_width" keys
+
+		Returns
+		-------
+		bins : BinSpec
+			Bins described by the metadata
+		"""
+
+		return cls(metadata["bin_min"], metadata["bin_max"], metadata["bin_width"])
+
+	def to_metadata(self):
+
+		""" Method describing the bins in a dictionary that can be saved in JSON
+
+		Returns
+		-------
+		metadata : dict
+			Dictionary containing the "bin_min", "bin_max" and "bin_width" keys
+		"""
+
+		return {"bin_min" : self.min, "bin_max" : self.max, "bin_width" : self.width}
+
+	def get_labels(self):
+
+		""" Method returning the labels of the bins as Python numbers, integers when all the labels are integers
+
+		Returns
+		-------
+		labels
+			List of the labels of the bins, used as keys of the distribution dictionaries and in the csv files
+		"""
+
+		if (float(self.min).is_integer() and float(self.width).is_integer()) :
+			return [int(label) for label in self.labels]
+		return self.labels.tolist()
+
+	def get_bins(self, distances):
+
+		""" Method calculating the index of the bin of each distance
+
+		Parameters
+		----------
+		distances
+			Array of distances
+
+		Returns
+		-------
+		bins
+			Array of the index of the bin of each distance, -1 for the distances outside of the bins
+		"""
+
+		bins = np.floor((distances - self.min) / self.width).astype(np.intp)
+		bins[(bins < 0) | (bins >= self.nb_bins)] = -1
+		return bins
+
+	def __eq__(self, other):
+		return isinstance(other, BinSpec) and (self.min, self.max, self.width) == (other.min, other.max, other.width)
+
+	def __repr__(self):
+		return f"{self.min}:{self.max}:{self.width}"
+
+#Bins used when none are given, the distances rounded down to an integer between 1 and 20 like the saved csv files
+DEFAULT_BINS = BinSpec()
+
+class Chain :
+
+	""" Class holding the C3' atoms of a chain in contiguous arrays
+
+	Attributes
+	----------
+	residues
+		Array of the residue codes of the atoms (index in RESIDUES, -1 for the other residues)
+	positions
+		Array of the residue sequence numbers of the atoms
+	coordinates
+		Array of shape (n, 3) of the X, Y and Z coordinates of the atoms
+	chain_ids
+		Array of the chain ID of the atoms in the file, used to label the results by residue
+	residue_numbers
+		Array of the residue sequence numbers of the atoms in the file, equal to positions except for the chains merged by Parsing.group_chains
+	"""
+
+	def __init__(self, residues, positions, coordinates, chain_ids = None, residue_numbers = None):
+		self.residues = np.asarray(residues, dtype=np.int8)
+		self.positions = np.asarray(positions, dtype=np.int64)
+		self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+		self.chain_ids = np.full(len(self.positions), "", dtype="U4") if chain_ids is None else np.asarray(chain_ids, dtype="U4")
+		self.residue_numbers = self.positions if residue_numbers is None else np.asarray(residue_numbers, dtype=np.int64)
+
+	def __len__(self):
+		return len(self.positions)
+
+def get_residue_codes(residue_names):
+
+	""" Function converting residue names to the residue codes used in the Chain class
+
+	Parameters
+	----------
+	residue_names
+		Iterable of residue names, only their last character is used ("A", "PSU", "5MC", ...)
+
+	Returns
+	-------
+	residue_codes
+		Array of the index of each residue in RESIDUES, -1 for the residues not in RESIDUES
+	"""
+
+	return np.array([RESIDUES.find(name[-1]) if name else -1 for name in residue_names], dtype=np.int8)
+
+def iter_distance_blocks(chain : Chain, cutoff : float = MAX_DISTANCE, block_size : int = BLOCK_SIZE, legacy_pairs : bool = False, method : str = "auto", stats : dict = None):
+
+	""" Generator computing the interatomic distances of a chain below a cutoff with the selected neighbour search
+
+	Parameters
+	----------
+	chain : Chain
+		Chain whose interatomic distances must be computed
+	cutoff : float
+		Largest distance yielded (included)
+	block_size : int
+		Number of atoms processed at once
+	legacy_pairs : bool
+		See iter_brute_force_blocks
+	method : str
+		"brute" to measure every pair of atoms, "grid" to only measure the pairs of atoms in neighbouring cells of a grid
+		"auto" uses the grid for chains of at least GRID_THRESHOLD atoms
+	stats : dict
+		Dictionary where the numbers of distances computed ("pairs_evaluated") and yielded ("pairs_within_cutoff") are added, None to count nothing
+
+	Yields
+	------
+	i, j, distances
+		Arrays of the indices of the two atoms of the pairs and of their distances
+		Both methods yield the same pairs and distances but not in the same order
+	"""
+
+	if (method == "auto") :
+		method = "grid" if len(chain) >= GRID_THRESHOLD else "brute"
+
+	if (method == "brute") :
+		return iter_brute_force_blocks(chain, cutoff, block_size, legacy_pairs, stats)
+	elif (method == "grid") :
+		return iter_grid_blocks(chain, cutoff, block_size, legacy_pairs, stats)
+	else :
+		raise ValueError(f"Unknown neighbour search method : {method}")
+
+def iter_brute_force_blocks(chain : Chain, cutoff : float = MAX_DISTANCE, block_size : int = BLOCK_SIZE, legacy_pairs : bool = False, stats : dict = None):
+
+	""" Generator computing the interatomic distances of a chain by blocks of rows of the distance matrix
+
+	Parameters
+	----------
+	chain : Chain
+		Chain whose interatomic distances must be computed
+	cutoff : float
+		Largest distance yielded (included)
+	block_size : int
+		Largest number of rows of the distance matrix computed at once, fewer rows are used when they would hold more than BLOCK_PAIRS distances
+	legacy_pairs : bool
+		If True, the pairs are selected like the former double loop did (i from 0 to n-2, j from 1 to n-1 and pos2 - pos1 >= 3)
+		which only differs from the upper triangle when the sequence numbers are not increasing along the chain
+		If False, each pair i < j with |pos2 - pos1| >= 3 is used once
+	stats : dict
+		See iter_distance_blocks
+
+	Yields
+	------
+	i, j, distances
+		Arrays of the indices of the two atoms of the pairs and of their distances
+	"""
+
+	n = len(chain)
+	positions = chain.positions
+	coordinates = chain.coordinates
+
+	start = 0
+	while (start < n) :
+		#Fewer rows for the long chains so that a block never holds more than BLOCK_PAIRS distances
+		first_col = 1 if legacy_pairs else start + 1
+		rows_per_block = max(1, min(block_size, BLOCK_PAIRS // max(1, n - first_col)))
+		stop = min(start + rows_per_block, n - 1 if legacy_pairs else n)
+		if (stop <= start or first_col >= n) :
+			break
+
+		rows = np.arange(start, stop)
+		cols = np.arange(first_col, n)
+
+		#Same operations in the same order as sqrt((x1-x2)**2 + (y1-y2)**2 + (z1-z2)**2) to get identical distances
+		diff = coordinates[start:stop, None, :] - coordinates[None, first_col:, :]
+		distances = np.sqrt(diff[:, :, 0]**2 + diff[:, :, 1]**2 + diff[:, :, 2]**2)
+
+		separation = positions[None, first_col:] - positions[start:stop, None]
+		if (legacy_pairs) :
+			mask = separation >= MIN_SEPARATION
+		else :
+			mask = (cols[None, :] > rows[:, None]) & (np.abs(separation) >= MIN_SEPARATION)
+		mask &= distances <= cutoff
+
+		i, j = np.nonzero(mask)
+		add_counters(stats, pairs_evaluated = distances.size, pairs_within_cutoff = len(i))
+		yield rows[i], cols[j], distances[i, j]
+		start = stop
+
+def iter_grid_blocks(chain : Chain, cutoff : float = MAX_DISTANCE, block_size : int = BLOCK_SIZE, legacy_pairs : bool = False, stats : dict = None):
+
+	""" Generator computing the interatomic distances of a chain using a uniform grid of cells as large as the cutoff
+
+	Only the atoms of the same or of neighbouring cells can be closer than the cutoff,
+	so the number of distances measured grows with the number of atoms instead of its square
+
+	Parameters
+	----------
+	chain : Chain
+		Chain whose interatomic distances must be computed
+	cutoff : float
+		Largest distance yielded (included)
+	block_size : int
+		Largest number of atoms whose neighbours are searched at once, fewer atoms are used when they have more than BLOCK_PAIRS candidates
+	legacy_pairs : bool
+		See iter_brute_force_blocks
+	stats : dict
+		See iter_distance_blocks
+
+	Yields
+	------
+	i, j, distances
+		Arrays of the indices of the two atoms of the pairs (i < j) and of their distances
+	"""
+
+	n = len(chain)
+	if (n < 2) :
+		return
+	positions = chain.positions
+	coordinates = chain.coordinates
+
+	#Cell of each atom, shifted by one so that the neighbours of the border cells have valid keys
+	cells = np.floor((coordinates - coordinates.min(axis = 0)) / cutoff).astype(np.int64) + 1
+	dims = cells.max(axis = 0) + 2
+	keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+	#Atoms sorted by cell, the atoms of a cell are contiguous in "order"
+	order = np.argsort(keys, kind = "stable")
+	sorted_keys = keys[order]
+
+	offsets = [(dx * dims[1] + dy) * dims[2] + dz for dx, dy, dz in HALF_NEIGHBOURS]
+
+	#Ranges of candidates of every atom in "order" : the atoms after it in its own cell, then all the atoms of its neighbouring cells
+	first = np.empty((n, len(offsets) + 1), dtype = np.int64)
+	last = np.empty((n, len(offsets) + 1), dtype = np.int64)
+	first[:, 0] = np.arange(1, n + 1)
+	last[:, 0] = np.searchsorted(sorted_keys, sorted_keys, side = "right")
+	for k, offset in enumerate(offsets) :
+		first[:, k + 1] = np.searchsorted(sorted_keys, sorted_keys + offset, side = "left")
+		last[:, k + 1] = np.searchsorted(sorted_keys, sorted_keys + offset, side = "right")
+	nb = last - first
+	cumulative = np.cumsum(nb.sum(axis = 1))
+
+	start = 0
+	while (start < n) :
+		#Atoms are added to the block until it holds BLOCK_PAIRS candidates, with at least one atom per block
+		done = cumulative[start - 1] if start > 0 else 0
+		stop = min(start + block_size, max(start + 1, int(np.searchsorted(cumulative, done + BLOCK_PAIRS, side = "right"))))
+		block_nb = nb[start:stop].ravel()
+
+		#Expands the ranges of candidates into pairs of atoms
+		a = np.repeat(order[start:stop], nb[start:stop].sum(axis = 1))
+		b = order[np.repeat(first[start:stop].ravel() - np.cumsum(block_nb) + block_nb, block_nb) + np.arange(block_nb.sum())]
+		i = np.minimum(a, b)
+		j = np.maximum(a, b)
+
+		diff = coordinates[i] - coordinates[j]
+		distances = np.sqrt(diff[:, 0]**2 + diff[:, 1]**2 + diff[:, 2]**2)
+
+		separation = positions[j] - positions[i]
+		if (legacy_pairs) :
+			mask = ((separation >= MIN_SEPARATION) & (i < n - 1) & (j > 0)) | ((separation <= -MIN_SEPARATION) & (j < n - 1) & (i > 0))
+		else :
+			mask = np.abs(separation) >= MIN_SEPARATION
+		mask &= distances <= cutoff
+
+		add_counters(stats, pairs_evaluated = len(distances), pairs_within_cutoff = np.count_nonzero(mask))
+		yield i[mask], j[mask], distances[mask]
+		start = stop
+
+def iter_distances_by_pairs(chains, cutoff : float = MAX_DISTANCE, block_size : int = BLOCK_SIZE, legacy_pairs : bool = False, method : str = "auto", stats : dict = None):
+
+	""" Generator computing the interatomic distances of chains along with the pair of residues of each distance
+
+	Parameters
+	----------
+	chains
+		Iterable of Chain objects, the distances are only computed between atoms of the same chain
+	cutoff, block_size, legacy_pairs, method, stats
+		See iter_distance_blocks, the pairs skipped because of their residues are also counted ("pairs_dropped_unknown_residues")
+
+	Yields
+	------
+	pairs, distances
+		Arrays of the row in PAIRS of the pairs of residues and of their distances
+		The pairs involving a residue not in RESIDUES are skipped
+	"""
+
+	for chain in chains :
+		for i, j, distances in iter_distance_blocks(chain, cutoff, block_size, legacy_pairs, method, stats) :
+			r1 = chain.residues[i]
+			r2 = chain.residues[j]
+			known = (r1 >= 0) & (r2 >= 0)
+			add_counters(stats, pairs_dropped_unknown_residues = len(known) - np.count_nonzero(known))
+			yield PAIR_INDEX[r1[known], r2[known]], distances[known]
+
+def count_distances_by_pairs(chains, bins : BinSpec = DEFAULT_BINS, block_size : int = BLOCK_SIZE, legacy_pairs : bool = False, method : str = "auto", stats : dict = None):
+
+	""" Function computing the distribution of the distances in bins for each pair of residues
+
+	Parameters
+	----------
+	chains
+		Iterable of Chain objects
+	bins : BinSpec
+		Bins of the distribution
+	block_size, legacy_pairs, method, stats
+		See iter_distances_by_pairs
+
+	Returns
+	-------
+	counts
+		Array of shape (len(PAIRS), bins.nb_bins) where counts[p, k] is the number of distances in the bin k for the pair PAIRS[p]
+	"""
+
+	counts = np.zeros(len(PAIRS) * bins.nb_bins, dtype=np.int64)
+
+	for pairs, distances in iter_distances_by_pairs(chains, bins.max + bins.width, block_size, legacy_pairs, method, stats) :
+		indices = bins.get_bins(distances)
+		kept = indices >= 0
+		counts += np.bincount(pairs[kept] * bins.nb_bins + indices[kept], minlength=len(counts))
+
+	return counts.reshape(len(PAIRS), bins.nb_bins)
+
+def add_counts_to_distribution(counts, distances_distribution_by_pairs : dict, bins : BinSpec = DEFAULT_BINS):
+
+	""" Function adding a count array produced by count_distances_by_pairs to a dictionary of distributions by pairs
+
+	Parameters
+	----------
+	counts
+		Array of shape (len(PAIRS), bins.nb_bins)
+	distances_distribution_by_pairs : dict
+		Dictionary in which the counts are added with the labels of the bins as keys, only the non null counts are stored like in the former implementation
+	bins : BinSpec
+		Bins of the counts
+
+	Returns
+	-------
+	distances_distribution_by_pairs : dict
+		Dictionary passed as a parameter
+	"""
+
+	return add_values_to_distribution(counts, counts > 0, distances_distribution_by_pairs, bins)
+
+def add_values_to_distribution(values, present, distributions_by_pairs : dict, bins : BinSpec = DEFAULT_BINS, pairs = PAIRS):
+
+	""" Function adding an array of counts, frequencies or scores by pairs and bins to a dictionary of distributions by pairs
+
+	Parameters
+	----------
+	values
+		Array of shape (len(pairs), bins.nb_bins)
+	present
+		Array of booleans of the same shape telling which values must be stored, the pairs without any are not added to the dictionary
+	distributions_by_pairs : dict
+		Dictionary in which the values are added with the labels of the bins as keys
+	bins : BinSpec
+		Bins of the values
+	pairs
+		List of the pairs in the order of the rows of the array
+
+	Returns
+	-------
+	distributions_by_pairs : dict
+		Dictionary passed as a parameter
+	"""
+
+	labels = bins.get_labels()
+	for p, pair in enumerate(pairs) :
+		indices = np.flatnonzero(present[p])
+		if (len(indices) == 0) :
+			continue
+		if not (pair in distributions_by_pairs.keys()) :
+			distributions_by_pairs[pair] = dict()
+		distrib = distributions_by_pairs[pair]
+		for k, value in zip(indices.tolist(), values[p, indices].tolist()) :
+			distrib[labels[k]] = distrib.get(labels[k], 0) + value
+
+	return distributions_by_pairs
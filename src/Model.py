@@ -0,0 +1,576 @@
+from Distances import PAIRS, PAIR_INDEX, MIN_SEPARATION, DEFAULT_BINS, BinSpec, Chain, iter_distance_blocks, iter_distances_by_pairs
+from Parsing import DEFAULT_ATOM_TYPE, CROSS_ATOM_SEPARATOR, parse_structure, get_atom_names, split_atom_type
+from Utility_script import import_from_binary, MODEL_FILE_NAME
+import numpy as np
+import os
+
+def get_model_file_name(atom_type : str = DEFAULT_ATOM_TYPE):
+
+	""" Function giving the name of the model file of an atom type in the data directory
+
+	Parameters
+	----------
+	atom_type : str
+		Atom type of the model, see Parsing.AtomTable.select
+
+	Returns
+	-------
+	name : str
+		MODEL_FILE_NAME for the default atom type, model_<atom type>.bin otherwise with "'" written "p" ("model_C4p.bin", "model_N1N9.bin", "model_C3p_P.bin")
+	"""
+
+	if (atom_type == DEFAULT_ATOM_TYPE) :
+		return MODEL_FILE_NAME
+	return "model_" + atom_type.replace("'", "p").replace("/", "").replace(CROSS_ATOM_SEPARATOR, "_") + ".bin"
+
+class ScoringModel :
+
+	""" Class holding the scores of each pair of nucleosides in dense arrays to score arrays of distances at once
+
+	The scores are linearly interpolated between the labels of the bins, like Scoring.get_estimated_energy does between the integer distances
+
+	Attributes
+	----------
+	scores
+		Array of shape (len(PAIRS), bins.nb_bins) where scores[p, k] is the score of the pair PAIRS[p] at the label of the bin k
+	slopes
+		Array of shape (len(PAIRS), bins.nb_bins - 1) where slopes[p, k] is the slope of the score of the pair PAIRS[p] between the bins k and k + 1
+	known
+		Array of booleans telling for each pair if scores were given for it
+	bins
+		BinSpec of the scores, only the distances up to bins.max are scored
+	atom_type
+		Atom type whose distances are scored by score_table (see Parsing.AtomTable.select)
+	"""
+
+	def __init__(self, scores, known = None, bins : BinSpec = DEFAULT_BINS, atom_type : str = DEFAULT_ATOM_TYPE):
+		self.scores = np.asarray(scores, dtype = np.float64)
+		self.slopes = np.diff(self.scores, axis = 1) / bins.width
+		self.known = np.ones(len(PAIRS), dtype = bool) if known is None else np.asarray(known, dtype = bool)
+		self.bins = bins
+		self.atom_type = atom_type
+
+	@classmethod
+	def from_dict(cls, distance_scores_by_pairs : dict, bins : BinSpec = None):
+
+		""" Method compiling a dictionary of scores by pairs into a ScoringModel
+
+		Parameters
+		----------
+		distance_scores_by_pairs : dict
+			Dictionary of the scores for the distances used as keys for each pair of nucleosides, like the one imported from the score csv files
+			The missing distances are linearly interpolated between the closest ones, like Scoring.get_estimated_energy does
+		bins : BinSpec
+			Bins of the model, the scores of the dictionary are interpolated at their labels
+			If None, the bins are deduced from the distances of the dictionary (first, last and gap between the first two)
+
+		Returns
+		-------
+		model : ScoringModel
+			Model holding the scores of the dictionary
+		"""
+
+		if (bins is None) :
+			distances = sorted(set(d for distrib in distance_scores_by_pairs.values() for d in distrib.keys()))
+			bins = BinSpec(distances[0], distances[-1], distances[1] - distances[0]) if len(distances) > 1 else DEFAULT_BINS
+
+		scores = np.zeros((len(PAIRS), bins.nb_bins), dtype = np.float64)
+		known = np.zeros(len(PAIRS), dtype = bool)
+		for p, pair in enumerate(PAIRS) :
+			if not (pair in distance_scores_by_pairs.keys()) or len(distance_scores_by_pairs[pair]) == 0 :
+				continue
+			distances = sorted(distance_scores_by_pairs[pair].keys())
+			scores[p] = np.interp(bins.labels, distances, [distance_scores_by_pairs[pair][d] for d in distances])
+			known[p] = True
+		return cls(scores, known, bins)
+
+	@classmethod
+	def from_file(cls, path : str):
+
+		""" Method loading the scores of a binary model file saved by Training.save_model
+
+		The scores are memory-mapped, so the processes loading the same file share them
+
+		Parameters
+		----------
+		path : str
+			String containing the path to the model file
+
+		Returns
+		-------
+		model : ScoringModel
+			Model holding the scores of the file, the pairs without any count in the training are unknown
+		"""
+
+		data, metadata = import_from_binary(path)
+		if (metadata["pairs"][:len(PAIRS)] != PAIRS) :
+			raise ValueError(f"{path} was not trained with the pairs of this version")
+		arrays = metadata["arrays"]
+		known = data[arrays.index("counts"), :len(PAIRS)].sum(axis = 1) > 0
+		return cls(data[arrays.index("scores"), :len(PAIRS)], known, BinSpec.from_metadata(metadata), metadata.get("atom_type", DEFAULT_ATOM_TYPE))
+
+	def score_distances(self, pairs, distances):
+
+		""" Method calculating the score of each distance by linear interpolation
+
+		Parameters
+		----------
+		pairs
+			Array of the rows in PAIRS of the pairs of nucleosides
+		distances
+			Array of the distances, the distances outside of the bins get the score of the closest bin
+
+		Returns
+		-------
+		scores
+			Array of the interpolated score of each distance
+		"""
+
+		if not (self.known[pairs].all()) :
+			raise KeyError(PAIRS[pairs[~self.known[pairs]][0]])
+		distances = np.clip(distances, self.bins.min, self.bins.max)
+		lower = np.clip(np.floor((distances - self.bins.min) / self.bins.width).astype(np.intp), 0, self.bins.nb_bins - 2)
+		return self.scores[pairs, lower] + self.slopes[pairs, lower] * (distances - self.bins.labels[lower])
+
+	def score(self, chains, method : str = "auto", stats : dict = None):
+
+		""" Method calculating the estimated Gibbs free energy of chains along with the number of distances scored
+
+		Parameters
+		----------
+		chains
+			Iterable of Chain objects (see Distances.py)
+		method : str
+			See Distances.iter_distance_blocks
+		stats : dict
+			See Distances.iter_distances_by_pairs
+
+		Returns
+		-------
+		energy, nb_pairs
+			Sum of the scores of the interatomic distances up to bins.max and number of these distances
+		"""
+
+		energy = 0.0
+		nb_pairs = 0
+		for pairs, distances in iter_distances_by_pairs(chains, self.bins.max, method = method, stats = stats) :
+			energy += float(self.score_distances(pairs, distances).sum())
+			nb_pairs += len(distances)
+		return energy, nb_pairs
+
+	def score_models(self, models, method : str = "auto", stats : dict = None):
+
+		""" Method calculating the estimated Gibbs free energy of each model of an ensemble independently
+
+		Parameters
+		----------
+		models
+			Iterable of the serial number of each model with the list of its Chain objects, like Parsing.get_models returns
+		method, stats
+			See score
+
+		Returns
+		-------
+		energies
+			List of the serial number, the estimated Gibbs free energy and the number of distances scored of each model
+		"""
+
+		return [(model, *self.score(chains, method, stats)) for model, chains in models]
+
+	def score_table(self, table, inter_chain : bool = False, method : str = "auto", stats : dict = None):
+
+		""" Method calculating the estimated Gibbs free energy of each model of a parsed structure for the atom type of this model
+
+		The energy of a cross atom type ("C3'-P") is the energy of the atoms of both types minus the energies of the atoms of each type,
+		which leaves the distances between an atom of each type
+
+		Parameters
+		----------
+		table
+			Parsing.AtomTable of the structure, holding the atoms of the atom type
+		inter_chain : bool
+			See Parsing.group_chains
+		method, stats
+			See score
+
+		Returns
+		-------
+		energies
+			See score_models
+		"""
+
+		energies = self.score_models(table.iter_models(self.atom_type, inter_chain), method, stats)
+		atom_types = split_atom_type(self.atom_type)
+		if (len(atom_types) > 1) :
+			for atom_type in atom_types :
+				others = {model : (energy, nb_pairs) for model, energy, nb_pairs in self.score_models(table.iter_models(atom_type, inter_chain), method, stats)}
+				energies = [(model, energy - others.get(model, (0.0, 0))[0], nb_pairs - others.get(model, (0.0, 0))[1]) for model, energy, nb_pairs in energies]
+		return energies
+
+	def get_atom_names(self):
+
+		""" Method listing the names of the atoms to parse for the atom type of this model
+
+		Returns
+		-------
+		atom_names
+			See Parsing.get_atom_names
+		"""
+
+		return get_atom_names([self.atom_type])
+
+	def decompose(self, chain, window : int = 0, method : str = "auto"):
+
+		""" Method splitting the estimated Gibbs free energy of a chain into the contributions of its residues and of its windows of residues
+
+		The score of each distance is computed once : half of it goes to each of its two residues,
+		and it is added to the windows containing both residues with a difference array whose prefix sum gives the energy of every window
+
+		Parameters
+		----------
+		chain : Chain
+			Chain whose energy is decomposed
+		window : int
+			Number of consecutive residues of the windows, no window energy is computed if 0
+		method : str
+			See Distances.iter_distance_blocks
+
+		Returns
+		-------
+		residue_energies, window_energies
+			Array of the contribution of each residue, whose sum is the energy of the chain,
+			and array where window_energies[k] is the energy of the distances between the residues k to k + window - 1 included
+			(the energy of this fragment scored alone), NaN when the window passes the end of the chain, None if window is 0
+		"""
+
+		n = len(chain)
+		residue_energies = np.zeros(n, dtype = np.float64)
+		differences = np.zeros(n + 1, dtype = np.float64)
+
+		for i, j, distances in iter_distance_blocks(chain, self.bins.max, method = method) :
+			r1 = chain.residues[i]
+			r2 = chain.residues[j]
+			known = (r1 >= 0) & (r2 >= 0)
+			i, j = i[known], j[known]
+			scores = self.score_distances(PAIR_INDEX[r1[known], r2[known]], distances[known])
+			residue_energies += np.bincount(i, scores / 2, minlength = n) + np.bincount(j, scores / 2, minlength = n)
+
+			#The distance between i < j is in the windows starting from j - window + 1 to i included
+			if (window > 0) :
+				inside = j - i < window
+				differences += np.bincount(np.maximum(j[inside] - window + 1, 0), scores[inside], minlength = n + 1)
+				differences -= np.bincount(i[inside] + 1, scores[inside], minlength = n + 1)
+
+		if (window <= 0) :
+			return residue_energies, None
+		window_energies = np.cumsum(differences[:n])
+		window_energies[max(n - window + 1, 0):] = np.nan
+		return residue_energies, window_energies
+
+	def get_energy(self, chains, method : str = "auto"):
+
+		""" Method calculating the estimated Gibbs free energy of chains
+
+		Parameters
+		----------
+		chains
+			Iterable of Chain objects (see Distances.py)
+		method : str
+			See Distances.iter_distance_blocks
+
+		Returns
+		-------
+		energy : float
+			Sum of the scores of the interatomic distances up to bins.max
+		"""
+
+		return self.score(chains, method)[0]
+
+	def score_file(self, filename : str, method : str = "auto"):
+
+		""" Method calculating the estimated Gibbs free energy of the structure of a pdb file for the atom type of this model
+
+		Parameters
+		----------
+		filename : str
+			String containing the path to the pdb file
+		method : str
+			See Distances.iter_distance_blocks
+
+		Returns
+		-------
+		energy : float
+			See get_energy, the models of an ensemble are scored as a single structure like the former scoring did (see score_file_models)
+			The energy of a cross atom type is computed like in score_table
+		"""
+
+		table = parse_structure(filename, self.get_atom_names())
+		energy = self.get_energy(table.get_chains(self.atom_type), method)
+		atom_types = split_atom_type(self.atom_type)
+		if (len(atom_types) > 1) :
+			energy -= sum(self.get_energy(table.get_chains(atom_type), method) for atom_type in atom_types)
+		return energy
+
+	def score_file_models(self, filename : str, inter_chain : bool = False, method : str = "auto"):
+
+		""" Method calculating the estimated Gibbs free energy of each model of the structure of a pdb file for the atom type of this model
+
+		Parameters
+		----------
+		filename : str
+			String containing the path to the pdb file
+		inter_chain : bool
+			See Parsing.group_chains
+		method : str
+			See Distances.iter_distance_blocks
+
+		Returns
+		-------
+		energies
+			See score_models
+		"""
+
+		return self.score_table(parse_structure(filename, self.get_atom_names()), inter_chain, method)
+
+class WeightedScoringModel :
+
+	""" Class scoring structures with a weighted sum of the energies given by the models of several atom types
+
+	Attributes
+	----------
+	models
+		List of the ScoringModel of each atom type
+	weights
+		List of the weight of the energy of each model
+	"""
+
+	def __init__(self, models, weights):
+		self.models = list(models)
+		self.weights = [float(w) for w in weights]
+
+	@classmethod
+	def from_directory(cls, path_data_dir : str, weights : dict):
+
+		""" Method loading the model files of atom types saved by the training in a data directory
+
+		Parameters
+		----------
+		path_data_dir : str
+			String containing the path to the data directory
+		weights : dict
+			Dictionary associating each atom type to the weight of its energy
+
+		Returns
+		-------
+		model : WeightedScoringModel
+			Model of the atom types, the model file of each one is named by get_model_file_name
+		"""
+
+		models = []
+		for atom_type in weights.keys() :
+			path = os.path.join(path_data_dir, get_model_file_name(atom_type))
+			if not (os.path.isfile(path)) :
+				raise FileNotFoundError(f"No model for the atom type {atom_type} ({path}), train it with Training.py --atoms")
+			models.append(ScoringModel.from_file(path))
+			models[-1].atom_type = atom_type
+		return cls(models, weights.values())
+
+	def get_atom_names(self):
+
+		""" Method listing the names of the atoms to parse for the models
+
+		Returns
+		-------
+		atom_names
+			See Parsing.get_atom_names
+		"""
+
+		return get_atom_names([model.atom_type for model in self.models])
+
+	def score_table(self, table, inter_chain : bool = False, method : str = "auto", stats : dict = None):
+
+		""" Method calculating the weighted sum of the estimated Gibbs free energies of each model of a parsed structure
+
+		Parameters
+		----------
+		table
+			Parsing.AtomTable of the structure, holding the atoms of all the atom types (see get_atom_names)
+		inter_chain, method, stats
+			See ScoringModel.score_table
+
+		Returns
+		-------
+		energies
+			List of the serial number, the weighted energy and the total number of distances scored of each model of the structure
+		"""
+
+		energies = dict()
+		for model, weight in zip(self.models, self.weights) :
+			for model_id, energy, nb_pairs in model.score_table(table, inter_chain, method, stats) :
+				total, total_pairs = energies.get(model_id, (0.0, 0))
+				energies[model_id] = (total + weight * energy, total_pairs + nb_pairs)
+		return [(model_id, energy, nb_pairs) for model_id, (energy, nb_pairs) in energies.items()]
+
+class IncrementalScorer :
+
+	""" Class keeping the estimated Gibbs free energy of chains up to date while some of their atoms are moved, for sampling loops
+
+	A move of k atoms only changes the scores of the distances involving them, so its energy difference is computed from k x n distances
+	instead of scoring all the distances again. A move is first proposed, then committed or rolled back
+
+	Attributes
+	----------
+	model
+		ScoringModel used to score the distances
+	residues, positions, chain_index
+		Arrays of the residue code, the residue sequence number (see Distances.Chain) and the index of the chain of each atom
+		The atoms are numbered in the order of the chains passed to the constructor, then in the order of each chain
+	coordinates
+		Array of shape (n, 3) of the coordinates of the atoms after the last committed move
+	energy
+		Estimated Gibbs free energy of the chains after the last committed move
+	pending
+		Indices, new coordinates and energy difference of the move proposed and not committed yet, None if there is none
+	"""
+
+	def __init__(self, model : ScoringModel, chains, method : str = "auto"):
+		chains = list(chains)
+		self.model = model
+		self.residues = np.concatenate([chain.residues for chain in chains]) if chains else np.zeros(0, dtype = np.int8)
+		self.positions = np.concatenate([chain.positions for chain in chains]) if chains else np.zeros(0, dtype = np.int64)
+		self.chain_index = np.repeat(np.arange(len(chains)), [len(chain) for chain in chains])
+		self.coordinates = np.concatenate([chain.coordinates for chain in chains]) if chains else np.zeros((0, 3), dtype = np.float64)
+		self.energy = model.get_energy(chains, method)
+		self.pending = None
+
+	def __len__(self):
+		return len(self.positions)
+
+	def get_chains(self):
+
+		""" Method building the chains at their current coordinates
+
+		Returns
+		-------
+		chains
+			List of the Chain objects, in the order of the chains passed to the constructor
+		"""
+
+		chains = []
+		for k in np.unique(self.chain_index).tolist() :
+			atoms = np.flatnonzero(self.chain_index == k)
+			chains.append(Chain(self.residues[atoms], self.positions[atoms], self.coordinates[atoms]))
+		return chains
+
+	def get_contribution(self, indices, coordinates):
+
+		""" Method calculating the sum of the scores of the distances involving some atoms placed at given coordinates, the other atoms staying in place
+
+		Parameters
+		----------
+		indices
+			Array of the indices of the atoms, without duplicates
+		coordinates
+			Array of shape (len(indices), 3) of the coordinates of these atoms
+
+		Returns
+		-------
+		energy : float
+			Sum of the scores of the distances up to model.bins.max between these atoms and all the others, each distance counted once
+		"""
+
+		moved = np.zeros(len(self), dtype = bool)
+		moved[indices] = True
+		current = self.coordinates.copy()
+		current[indices] = coordinates
+		others = np.arange(len(self))
+
+		#Same operations as Distances.iter_distance_blocks to get identical distances
+		diff = current[indices, None, :] - current[None, :, :]
+		distances = np.sqrt(diff[:, :, 0]**2 + diff[:, :, 1]**2 + diff[:, :, 2]**2)
+
+		#The distances between two moved atoms are only counted from the one with the lowest index
+		mask = (self.chain_index[indices, None] == self.chain_index[None, :]) & (np.abs(self.positions[None, :] - self.positions[indices, None]) >= MIN_SEPARATION)
+		mask &= ~moved[None, :] | (others[None, :] > indices[:, None])
+		mask &= (self.residues[indices, None] >= 0) & (self.residues[None, :] >= 0)
+		mask &= distances <= self.model.bins.max
+
+		i, j = np.nonzero(mask)
+		return float(self.model.score_distances(PAIR_INDEX[self.residues[indices[i]], self.residues[j]], distances[i, j]).sum())
+
+	def propose(self, indices, coordinates):
+
+		""" Method calculating the energy difference of a move of some atoms, the move replaces any move proposed and not committed
+
+		Parameters
+		----------
+		indices
+			Iterable of the indices of the moved atoms
+		coordinates
+			Array of shape (len(indices), 3) of the new coordinates of the moved atoms
+
+		Returns
+		-------
+		delta : float
+			Energy after the move minus the energy before it
+		"""
+
+		indices = np.asarray(indices, dtype = np.intp).ravel()
+		coordinates = np.asarray(coordinates, dtype = np.float64).reshape(-1, 3)
+		if (len(indices) != len(coordinates)) :
+			raise ValueError(f"{len(indices)} atoms moved but {len(coordinates)} coordinates given")
+		if (len(np.unique(indices)) != len(indices)) :
+			raise ValueError("An atom is moved more than once")
+
+		delta = self.get_contribution(indices, coordinates) - self.get_contribution(indices, self.coordinates[indices])
+		self.pending = (indices, coordinates, delta)
+		return delta
+
+	def commit(self):
+
+		""" Method applying the proposed move to the coordinates and the energy
+
+		Returns
+		-------
+		energy : float
+			Energy after the move
+		"""
+
+		if (self.pending is None) :
+			raise RuntimeError("No move to commit")
+		indices, coordinates, delta = self.pending
+		self.coordinates[indices] = coordinates
+		self.energy += delta
+		self.pending = None
+		return self.energy
+
+	def rollback(self):
+
+		""" Method discarding the proposed move, the coordinates and the energy stay the ones of the last committed move
+
+		Returns
+		-------
+		energy : float
+			Energy of the last committed move
+		"""
+
+		self.pending = None
+		return self.energy
+
+	def recompute(self, method : str = "auto"):
+
+		""" Method scoring all the distances again, to remove the rounding errors accumulated by many moves
+
+		Parameters
+		----------
+		method : str
+			See Distances.iter_distance_blocks
+
+		Returns
+		-------
+		energy : float
+			Energy of the current coordinates
+		"""
+
+		self.energy = self.model.get_energy(self.get_chains(), method)
+		return self.energy
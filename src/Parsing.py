@@ -0,0 +1,739 @@
+from Distances import MIN_SEPARATION, Chain, get_residue_codes
+from Profiling import add_counters
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import numpy as np
+import threading
+import mmap
+import io
+import glob
+import gzip
+import bz2
+import os
+import re
+
+#Atom kept by default, the representative atom of the nucleotides used by the scoring
+DEFAULT_ATOM_TYPE = "C3'"
+DEFAULT_ATOM_NAMES = (DEFAULT_ATOM_TYPE,)
+
+#Atom types whose atom depends on the residue (by the last character of its name) : the glycosidic nitrogen is N9 for the purines and N1 for the pyrimidines
+RESIDUE_ATOM_TYPES = {"N1/N9" : {"A" : "N9", "G" : "N9", "C" : "N1", "U" : "N1"}}
+
+#Separator of the two atom types of a cross atom type ("C3'-P"), whose distances are the ones between an atom of each type
+CROSS_ATOM_SEPARATOR = "-"
+
+#Number of decimals of the coordinates in the pdb format, used to restore the exact parsed values from the float32 storage
+COORDINATE_DECIMALS = 3
+
+#Model of the atoms of the files without MODEL records and of the atoms before the first MODEL record
+DEFAULT_MODEL = 1
+
+#Regular expression matching the MODEL records and their serial number, the line start is checked like for the ATOM records
+MODEL_RECORD_PATTERN = re.compile(rb"MODEL [ ]*([0-9]+)")
+
+#Extensions of the structure files in each format, each of them can be followed by a compression extension
+PDB_EXTENSIONS = (".pdb", ".ent")
+MMCIF_EXTENSIONS = (".cif", ".mmcif")
+
+#Functions opening the compressed files by extension, the files are decompressed while they are read
+COMPRESSED_OPENERS = {".gz" : gzip.open, ".bz2" : bz2.open}
+
+#Number of bytes of the compressed pdb files decompressed and scanned at once
+STREAM_BLOCK_SIZE = 1 << 22
+
+#Default number of files read ahead of their parsing by the pipelined mode, and of threads reading them
+PREFETCH_DEPTH = 8
+PREFETCH_THREADS = 4
+
+#Regular expression splitting a line of a mmCIF loop into values, the quoted values end at a quote followed by a blank
+MMCIF_VALUE_PATTERN = re.compile(r"""'(?:[^']|'(?=\S))*'(?!\S)|"(?:[^"]|"(?=\S))*"(?!\S)|\S+""")
+
+#Columns of the _atom_site loop of the mmCIF files read for each field, the first one present in the file is used
+MMCIF_COLUMNS = {
+	"group" : ("group_PDB",),
+	"atom_name" : ("auth_atom_id", "label_atom_id"),
+	"residue_name" : ("auth_comp_id", "label_comp_id"),
+	"chain_id" : ("auth_asym_id", "label_asym_id"),
+	"position" : ("auth_seq_id", "label_seq_id"),
+	"x" : ("Cartn_x",),
+	"y" : ("Cartn_y",),
+	"z" : ("Cartn_z",),
+	"model" : ("pdbx_PDB_model_num",)
+}
+
+class AtomTable :
+
+	""" Class holding the parsed atoms of a structure in columns
+
+	Attributes
+	----------
+	chain_ids
+		Array of the chain ID of each atom (up to 4 characters in the mmCIF files)
+	residue_names
+		Array of the residue name of each atom ("A", "PSU", ...)
+	atom_names
+		Array of the name of each atom ("C3'", ...)
+	positions
+		Array of the residue sequence number of each atom
+	coordinates
+		Array of shape (n, 3) of the X, Y and Z coordinates of each atom in float32
+	models
+		Array of the serial number of the model (MODEL record) of each atom, DEFAULT_MODEL for the files with a single model
+	"""
+
+	def __init__(self, chain_ids, residue_names, atom_names, positions, coordinates, models = None):
+		self.chain_ids = np.asarray(chain_ids, dtype = "U4")
+		self.residue_names = np.asarray(residue_names, dtype = "U5")
+		self.atom_names = np.asarray(atom_names, dtype = "U4")
+		self.positions = np.asarray(positions, dtype = np.int32)
+		self.coordinates = np.asarray(coordinates, dtype = np.float32).reshape(-1, 3)
+		self.models = np.full(len(self.positions), DEFAULT_MODEL, dtype = np.int32) if models is None else np.asarray(models, dtype = np.int32)
+
+	def __len__(self):
+		return len(self.positions)
+
+	def select(self, atom_type : str = None):
+
+		""" Method selecting the atoms of an atom type
+
+		Parameters
+		----------
+		atom_type : str
+			Name of the atoms ("C3'", "P", ...), atom type of RESIDUE_ATOM_TYPES ("N1/N9"), or cross atom type ("C3'-P") selecting the atoms of both types
+			All the atoms of the table if None
+
+		Returns
+		-------
+		selected
+			Array of booleans telling which atoms are of the atom type
+		"""
+
+		if (atom_type is None) :
+			return np.ones(len(self), dtype = bool)
+		selected = np.zeros(len(self), dtype = bool)
+		for name in split_atom_type(atom_type) :
+			if (name in RESIDUE_ATOM_TYPES) :
+				for residue, atom_name in RESIDUE_ATOM_TYPES[name].items() :
+					selected |= (self.atom_names == atom_name) & np.char.endswith(self.residue_names, residue)
+			else :
+				selected |= self.atom_names == name
+		return selected
+
+	def get_coordinates(self):
+
+		""" Method returning the coordinates in float64 with the exact values written in the file
+
+		The pdb coordinates have three decimals, which the float32 storage keeps, so rounding restores the value float() gives for the text
+
+		Returns
+		-------
+		coordinates
+			Array of shape (n, 3) of the coordinates in float64
+		"""
+
+		scale = 10 ** COORDINATE_DECIMALS
+		return np.round(self.coordinates.astype(np.float64) * scale) / scale
+
+	def get_model_ids(self):
+
+		""" Method listing the models of the table
+
+		Returns
+		-------
+		models
+			List of the serial numbers of the models, in the order of their first atom in the file
+		"""
+
+		return list(dict.fromkeys(self.models.tolist()))
+
+	def get_chains(self, atom_name : str = None, model : int = None, inter_chain : bool = False):
+
+		""" Method grouping the atoms by chain in the Chain objects used to compute the distances
+
+		Parameters
+		----------
+		atom_name : str
+			Name or type of the atoms put in the chains (see select), all the atoms of the table if None
+		model : int
+			Serial number of the model whose atoms are put in the chains
+			If None, the atoms of all the models are put in the chains of their chain ID, like the former parser did
+		inter_chain : bool
+			See group_chains
+
+		Returns
+		-------
+		chains
+			List of the Chain objects of each chain ID, in the order of their first atom in the file
+		"""
+
+		selected = self.select(atom_name)
+		if (model is not None) :
+			selected &= self.models == model
+		atoms = np.flatnonzero(selected)
+		return group_chains(self.chain_ids[atoms], get_residue_codes(self.residue_names[atoms].tolist()), self.positions[atoms], self.get_coordinates()[atoms], inter_chain)
+
+	def iter_models(self, atom_name : str = None, inter_chain : bool = False):
+
+		""" Generator grouping the atoms of each model in their own chains, so that the models of an ensemble are scored independently
+
+		The coordinates and the residue codes are converted once for the whole table, each model is a slice of them
+
+		Parameters
+		----------
+		atom_name : str
+			Name or type of the atoms put in the chains (see select), all the atoms of the table if None
+		inter_chain : bool
+			See group_chains
+
+		Yields
+		------
+		model, chains
+			Serial number of the model and list of the Chain objects of its chains, the models are yielded in the order of the file
+		"""
+
+		selected = self.select(atom_name)
+		coordinates = self.get_coordinates()
+		residue_codes = get_residue_codes(self.residue_names.tolist())
+
+		for model in self.get_model_ids() :
+			atoms = np.flatnonzero(selected & (self.models == model))
+			if (len(atoms) > 0) :
+				yield model, group_chains(self.chain_ids[atoms], residue_codes[atoms], self.positions[atoms], coordinates[atoms], inter_chain)
+
+def split_atom_type(atom_type : str):
+
+	""" Function splitting a cross atom type into its two atom types
+
+	Parameters
+	----------
+	atom_type : str
+		Atom type, see AtomTable.select
+
+	Returns
+	-------
+	atom_types
+		List of the two atom types of a cross atom type, or of the atom type alone
+	"""
+
+	return atom_type.split(CROSS_ATOM_SEPARATOR)
+
+def get_atom_names(atom_types):
+
+	""" Function listing the names of the atoms to parse for atom types
+
+	Parameters
+	----------
+	atom_types
+		Iterable of atom types, see AtomTable.select
+
+	Returns
+	-------
+	atom_names
+		Tuple of the names of the atoms, in the order of the atom types
+	"""
+
+	names = []
+	for atom_type in atom_types :
+		for name in split_atom_type(atom_type) :
+			names.extend(RESIDUE_ATOM_TYPES[name].values() if name in RESIDUE_ATOM_TYPES else [name])
+	return tuple(dict.fromkeys(names))
+
+def group_chains(chain_ids, residue_codes, positions, coordinates, inter_chain : bool = False):
+
+	""" Function grouping atoms by chain ID in Chain objects
+
+	Parameters
+	----------
+	chain_ids, residue_codes, positions, coordinates
+		Arrays of the chain ID, residue code (see Distances.get_residue_codes), residue sequence number and coordinates of each atom
+	inter_chain : bool
+		If False, one Chain is built for each chain ID and the distances are only computed inside the chains
+		If True, a single Chain holds all the atoms so that the distances between atoms of different chains are also computed (complexes)
+		The residue numbers of each chain are then shifted so that two atoms of different chains are always at least MIN_SEPARATION residues apart
+
+	Returns
+	-------
+	chains
+		List of the Chain objects, in the order of the first atom of each chain ID
+	"""
+
+	order = list(dict.fromkeys(chain_ids.tolist()))
+	groups = [np.flatnonzero(chain_ids == chain_id) for chain_id in order]
+
+	if (inter_chain and len(groups) > 1) :
+		shift = int(positions.max()) - int(positions.min()) + MIN_SEPARATION
+		atoms = np.concatenate(groups)
+		shifted_positions = np.concatenate([positions[g].astype(np.int64) + k * shift for k, g in enumerate(groups)])
+		return [Chain(residue_codes[atoms], shifted_positions, coordinates[atoms], chain_ids[atoms], positions[atoms])]
+
+	return [Chain(residue_codes[g], positions[g], coordinates[g], chain_ids[g]) for g in groups]
+
+def get_atom_record_pattern(atom_names = DEFAULT_ATOM_NAMES):
+
+	""" Function building the regular expression matching the start of the ATOM records of the atoms passed as parameters
+
+	Parameters
+	----------
+	atom_names
+		Iterable of the names of the atoms to match
+
+	Returns
+	-------
+	pattern
+		Compiled regular expression matching "ATOM", the serial number and the atom name field, whatever the alignment of the name in its 4 columns
+	"""
+
+	fields = set()
+	for name in atom_names :
+		for left in range(4 - len(name) + 1) :
+			fields.add(re.escape((" " * left + name).ljust(4).encode()))
+	#Not anchored on the start of the lines so that the engine can search the literal "ATOM  " prefix quickly, the line start is checked afterwards
+	return re.compile(rb"ATOM  .{6}(?:" + b"|".join(sorted(fields)) + rb")")
+
+def get_file_format(filename : str):
+
+	""" Function finding the format and the compression of a structure file from its extensions
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the file
+
+	Returns
+	-------
+	file_format, compression
+		"pdb", "mmcif" or None if the extension is not one of a structure file, and the compression extension (".gz", ".bz2") or None
+	"""
+
+	name = filename.lower()
+	compression = None
+	for extension in COMPRESSED_OPENERS.keys() :
+		if (name.endswith(extension)) :
+			compression = extension
+			name = name[:-len(extension)]
+	if (name.endswith(PDB_EXTENSIONS)) :
+		return "pdb", compression
+	if (name.endswith(MMCIF_EXTENSIONS)) :
+		return "mmcif", compression
+	return None, compression
+
+def is_structure_file(filename : str):
+
+	""" Function telling if a file is a structure file read by the parser from its extensions
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the file
+
+	Returns
+	-------
+	is_structure : bool
+		True for the pdb (.pdb, .ent) and mmCIF (.cif, .mmcif) files, compressed (.gz, .bz2) or not
+	"""
+
+	return get_file_format(filename)[0] is not None
+
+def list_structure_files(pattern : str):
+
+	""" Function listing the structure files matching a glob pattern
+
+	Parameters
+	----------
+	pattern : str
+		Glob pattern of the files, the files that are not structure files (see is_structure_file) are ignored
+
+	Returns
+	-------
+	file_names
+		Sorted list of the paths to the structure files
+	"""
+
+	return sorted(f for f in glob.glob(pattern) if os.path.isfile(f) and is_structure_file(f))
+
+def scan_pdb_records(data, pattern, offset : int, records : list, starts : list, model_starts : list, model_ids : list, stats : dict = None, filename : str = ""):
+
+	""" Function collecting the selected ATOM records and the MODEL records of a block of complete lines of a pdb file
+
+	Parameters
+	----------
+	data
+		Bytes-like object (bytes, mmap) of the block, starting at the start of a line and ending at the end of a line
+	pattern
+		Regular expression built by get_atom_record_pattern
+	offset : int
+		Position of the block in the file
+	records, starts, model_starts, model_ids : list
+		Lists where the 54 first bytes and the position in the file of each selected record, and the position and the serial number of each MODEL record are added
+	stats : dict
+		See parse_pdb
+	filename : str
+		String containing the path to the file, used in the error messages
+
+	Returns
+	-------
+	None
+	"""
+
+	for match in pattern.finditer(data) :
+		start = match.start()
+		if (start > 0 and data[start - 1] != 10) :
+			continue
+		record = data[start:start + 54]
+		if (b"\n" in record or len(record) < 54) :
+			raise ValueError(f"Truncated ATOM record in {filename} : {record.splitlines()[0].decode(errors = 'replace')}")
+		records.append(record)
+		starts.append(offset + start)
+	#The atoms belong to the last MODEL record before them
+	for match in MODEL_RECORD_PATTERN.finditer(data) :
+		if (match.start() == 0 or data[match.start() - 1] == 10) :
+			model_starts.append(offset + match.start())
+			model_ids.append(int(match.group(1)))
+	if (stats is not None) :
+		add_counters(stats, atoms_parsed = data[:].count(b"\nATOM  ") + (data[:6] == b"ATOM  "))
+	return
+
+def parse_pdb(filename : str, atom_names = DEFAULT_ATOM_NAMES, stats : dict = None):
+
+	""" Function parsing the ATOM records of a pdb file for the atoms passed as parameters
+
+	The file is memory-mapped and scanned with a regular expression, only the selected records are decoded
+	The compressed files (.gz, .bz2) are decompressed and scanned by blocks of complete lines, without being written to the disk
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the pdb file
+	atom_names
+		Iterable of the names of the atoms to keep
+	stats : dict
+		Dictionary where the numbers of ATOM records of the file ("atoms_parsed") and of atoms kept ("atoms_kept") are added, None to count nothing
+		Counting the ATOM records needs another pass over the file
+
+	Returns
+	-------
+	table : AtomTable
+		Table of the selected atoms in the order of the file, with the model of each atom given by the MODEL records
+	"""
+
+	pattern = get_atom_record_pattern(atom_names)
+	records = []
+	starts = []
+	model_starts = []
+	model_ids = []
+	compression = get_file_format(filename)[1]
+
+	if (compression is None) :
+		with open(filename, "rb") as f :
+			if (os.fstat(f.fileno()).st_size > 0) :
+				with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data :
+					scan_pdb_records(data, pattern, 0, records, starts, model_starts, model_ids, stats, filename)
+	else :
+		with COMPRESSED_OPENERS[compression](filename, "rb") as f :
+			offset = 0
+			rest = b""
+			while (True) :
+				block = f.read(STREAM_BLOCK_SIZE)
+				data = rest + block
+				#The last incomplete line is kept for the next block, except at the end of the file
+				end = data.rfind(b"\n") + 1 if block else len(data)
+				scan_pdb_records(data[:end], pattern, offset, records, starts, model_starts, model_ids, stats, filename)
+				offset += end
+				rest = data[end:]
+				if not (block) :
+					break
+	add_counters(stats, atoms_kept = len(records))
+	return get_pdb_atom_table(records, starts, model_starts, model_ids)
+
+def parse_pdb_data(data : bytes, atom_names = DEFAULT_ATOM_NAMES, stats : dict = None):
+
+	""" Function parsing the ATOM records of the content of a pdb file already in memory, like parse_pdb does for a file
+
+	Parameters
+	----------
+	data : bytes
+		Content of the pdb file
+	atom_names, stats
+		See parse_pdb
+
+	Returns
+	-------
+	table : AtomTable
+		See parse_pdb
+	"""
+
+	records = []
+	starts = []
+	model_starts = []
+	model_ids = []
+	scan_pdb_records(data, get_atom_record_pattern(atom_names), 0, records, starts, model_starts, model_ids, stats, "the pdb data")
+	add_counters(stats, atoms_kept = len(records))
+	return get_pdb_atom_table(records, starts, model_starts, model_ids)
+
+def get_pdb_atom_table(records : list, starts : list, model_starts : list, model_ids : list):
+
+	""" Function converting the records collected by scan_pdb_records into an AtomTable
+
+	Parameters
+	----------
+	records, starts, model_starts, model_ids : list
+		See scan_pdb_records
+
+	Returns
+	-------
+	table : AtomTable
+		See parse_pdb
+	"""
+
+	#The fields are cut from a single block of fixed-width records and converted at once by NumPy
+	block = np.frombuffer(b"".join(records), dtype = "S1").reshape(len(records), 54) if records else np.zeros((0, 54), dtype = "S1")
+	columns = lambda start, stop : block[:, start:stop].copy().view(f"S{stop - start}").ravel()
+
+	models = np.array([DEFAULT_MODEL] + model_ids, dtype = np.int32)[np.searchsorted(np.array(model_starts, dtype = np.int64), np.array(starts, dtype = np.int64))]
+
+	return AtomTable(columns(21, 22).astype("U1"), np.char.replace(columns(17, 20), b" ", b"").astype("U3"), np.char.replace(columns(12, 16), b" ", b"").astype("U4"), columns(22, 26).astype(np.int64), np.stack([columns(30, 38), columns(38, 46), columns(46, 54)], axis = 1).astype(np.float64), models)
+
+def parse_mmcif(filename : str, atom_names = DEFAULT_ATOM_NAMES, stats : dict = None, data : bytes = None):
+
+	""" Function parsing the _atom_site loop of a mmCIF file for the atoms passed as parameters
+
+	The file is read line by line, decompressed while it is read if it is compressed (.gz, .bz2),
+	and only the lines containing one of the atom names are split into values
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the mmCIF file
+	atom_names
+		Iterable of the names of the atoms to keep
+	stats : dict
+		See parse_pdb, the ATOM lines of the _atom_site loop are counted
+	data : bytes
+		Content of the file already read and decompressed (see read_structure_data), None to read the file
+
+	Returns
+	-------
+	table : AtomTable
+		Table of the selected ATOM atoms in the order of the file, with the author chain IDs, residue names and numbers when the file has them
+	"""
+
+	atom_names = tuple(atom_names)
+	rows = []
+	columns = []
+	#State of the reader : "" outside of the _atom_site loop, "header" while its columns are listed and "rows" while its rows are read
+	state = ""
+	nb_atoms = 0
+	compression = get_file_format(filename)[1]
+
+	if (data is not None) :
+		source = io.StringIO(data.decode())
+	else :
+		source = open(filename, "r") if compression is None else COMPRESSED_OPENERS[compression](filename, "rt")
+
+	with source as f :
+		for line in f :
+			if (state == "header" and not line.startswith("_atom_site.")) :
+				state = "rows"
+			if (state == "rows") :
+				#The loop ends at the next category, loop or data block
+				if (line.startswith(("_", "#", "loop_", "data_"))) :
+					break
+				if (line.startswith("ATOM")) :
+					nb_atoms += 1
+				if not (any(name in line for name in atom_names)) :
+					continue
+				values = [v[1:-1] if v[0] in "'\"" else v for v in MMCIF_VALUE_PATTERN.findall(line)]
+				if (len(values) != len(columns)) :
+					raise ValueError(f"Incomplete _atom_site row in {filename} : {line.strip()}")
+				rows.append(values)
+			elif (line.startswith("loop_")) :
+				state = "loop"
+			elif (state in ("loop", "header") and line.startswith("_atom_site.")) :
+				state = "header"
+				columns.append(line.split()[0][len("_atom_site."):])
+			else :
+				state = ""
+
+	add_counters(stats, atoms_parsed = nb_atoms)
+
+	index = {name : k for k, name in enumerate(columns)}
+	fields = {field : next((index[c] for c in candidates if c in index), None) for field, candidates in MMCIF_COLUMNS.items()}
+	for field in ("atom_name", "residue_name", "chain_id", "position", "x", "y", "z") :
+		if (rows and fields[field] is None) :
+			raise ValueError(f"No column for the {field} in the _atom_site loop of {filename}")
+
+	rows = [r for r in rows if (fields["group"] is None or r[fields["group"]] == "ATOM") and r[fields["atom_name"]] in atom_names]
+	add_counters(stats, atoms_kept = len(rows))
+	get = lambda field : [r[fields[field]] for r in rows]
+
+	return AtomTable(get("chain_id"), get("residue_name"), get("atom_name"), np.array(get("position"), dtype = np.int64), np.array([get("x"), get("y"), get("z")], dtype = np.float64).T.reshape(-1, 3), get("model") if fields["model"] is not None else None)
+
+def parse_structure(filename : str, atom_names = DEFAULT_ATOM_NAMES, stats : dict = None, data : bytes = None):
+
+	""" Function parsing a structure file with the parser of its format
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the file, the mmCIF files are recognized by their extension (see MMCIF_EXTENSIONS)
+		and any other file is parsed as a pdb file, compressed (.gz, .bz2) or not
+	atom_names, stats
+		See parse_pdb
+	data : bytes
+		Content of the file already read and decompressed (see read_structure_data), None to read the file
+
+	Returns
+	-------
+	table : AtomTable
+		Table of the selected atoms in the order of the file
+	"""
+
+	if (get_file_format(filename)[0] == "mmcif") :
+		return parse_mmcif(filename, atom_names, stats, data)
+	if (data is not None) :
+		return parse_pdb_data(data, atom_names, stats)
+	return parse_pdb(filename, atom_names, stats)
+
+def read_structure_data(filename : str):
+
+	""" Function reading the whole content of a structure file, decompressed if it is compressed
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the file
+
+	Returns
+	-------
+	data : bytes
+		Content of the file, parsed by parse_structure(filename, data = data)
+	"""
+
+	compression = get_file_format(filename)[1]
+	with (open(filename, "rb") if compression is None else COMPRESSED_OPENERS[compression](filename, "rb")) as f :
+		return f.read()
+
+def iter_structure_data(filenames, depth : int = PREFETCH_DEPTH, threads : int = PREFETCH_THREADS):
+
+	""" Generator reading structure files with threads ahead of their use, so that the reading of the next files overlaps the processing of the current one
+
+	Parameters
+	----------
+	filenames
+		Iterable of the paths to the files
+	depth : int
+		Largest number of files read ahead, being read or waiting to be yielded
+	threads : int
+		Number of threads reading the files, the reading and the decompression release the GIL
+
+	Yields
+	------
+	filename, data
+		Path to each file and its content (see read_structure_data), in the order of filenames
+		The content is an exception raised while reading the file when it cannot be read, so that one file does not stop the others
+	"""
+
+	def read(filename) :
+		try :
+			return read_structure_data(filename)
+		except (OSError, EOFError) as e :
+			return e
+
+	with ThreadPoolExecutor(max_workers = max(1, min(threads, depth))) as executor :
+		pending = deque()
+		for filename in filenames :
+			pending.append((filename, executor.submit(read, filename)))
+			if (len(pending) >= depth) :
+				filename, future = pending.popleft()
+				yield filename, future.result()
+		while (pending) :
+			filename, future = pending.popleft()
+			yield filename, future.result()
+
+def imap_prefetched(function, filenames, pool = None, depth : int = PREFETCH_DEPTH, threads : int = PREFETCH_THREADS):
+
+	""" Generator applying a function to the content of structure files read ahead by threads (see iter_structure_data), in the processes of a pool if given
+
+	The files sent to the pool wait for a free slot, so at most depth files are read ahead and depth more are waiting in the pool or being processed
+
+	Parameters
+	----------
+	function
+		Function taking a tuple (filename, data) yielded by iter_structure_data, picklable if a pool is given
+	filenames
+		List of the paths to the files
+	pool
+		multiprocessing.Pool whose processes apply the function, the function is applied in this process if None
+	depth, threads
+		See iter_structure_data
+
+	Yields
+	------
+	result
+		Result of the function for each file, in the order of filenames without a pool and in the order in which they end with a pool
+	"""
+
+	items = iter_structure_data(filenames, depth, threads)
+	if (pool is None) :
+		yield from map(function, items)
+		return
+
+	slots = threading.Semaphore(depth)
+	stop = threading.Event()
+
+	#Run by the thread of the pool sending the tasks, which reads all its input without waiting for the results otherwise
+	def feed() :
+		for item in items :
+			slots.acquire()
+			if (stop.is_set()) :
+				return
+			yield item
+
+	try :
+		for result in pool.imap_unordered(function, feed()) :
+			slots.release()
+			yield result
+	finally :
+		#Unblocks the thread sending the tasks if the results are not all used, before the pool is closed
+		stop.set()
+		slots.release()
+
+def get_chains(filename, stats : dict = None):
+
+	""" Function parsing the C3' atoms of a pdb file into chains
+
+	Parameters
+	----------
+	filename
+		String containing the path to the pdb file that must be parsed
+	stats : dict
+		See parse_pdb
+
+	Returns
+	-------
+	chains
+		List of the Chain objects (see Distances.py) of the chains in the file, the models of an ensemble are not separated (see get_models)
+	"""
+
+	return parse_structure(filename, stats = stats).get_chains()
+
+def get_models(filename, inter_chain : bool = False, stats : dict = None):
+
+	""" Function parsing the C3' atoms of a pdb file into chains for each of its models
+
+	Parameters
+	----------
+	filename
+		String containing the path to the pdb file that must be parsed
+	inter_chain : bool
+		See group_chains
+	stats : dict
+		See parse_pdb
+
+	Returns
+	-------
+	models
+		List of the serial number of each model with the list of its Chain objects, a single model for the files without MODEL records
+	"""
+
+	return list(parse_structure(filename, stats = stats).iter_models(inter_chain = inter_chain))
@@ -1,192 +1,576 @@
-import matplotlib.pyplot as plt
-from math import ceil
-from Utility_script import import_from_csv
-import os, sys, glob
-
-def plot_distrib(fig,distances_distribution, pair = "",nb_ax = 0):
-
-    """ Function creating the subplot for the dictionary passed in parameters
-
-    Parameters
-    ----------
-    fig
-        Figure where the subplot will be displayed
-    distances_distribution
-        Dictionary containing the distribution, frequencies or scores for the distances used as keys
-        The dictionary is the kind produced for each pair of nucleosides in the Training.py script
-        This function is specifically design for a dictionnary with keys ranging from 1 to 20 included
-    pair : str
-        String containing the title of the subplot
-    nb_ax
-        Index of the subplot in the figure
-
-    Returns
-    -------
-    None
-    
-    """
-	
-    ax =fig.axes[nb_ax]
-    ax.bar(distances_distribution.keys(),distances_distribution.values())
-    ax.axis([0 , 20 + 1, min(distances_distribution.values()), max(distances_distribution.values()) * 1.1])
-    ax.set_title(pair)
-    
-    return
-
-def plot_distrib_by_pairs(distances_distribution_by_pairs, plot_name = "") :
-
-    """ Function creating the plot for the dictionary passed in parameters containing dictionaries for pairs of nucleosides
-
-    Parameters
-    ----------
-    distances_distribution_by_pairs
-        Dictionary containing for each pair of nucleosides the dictionary of the distribution, frequencies or scores for the distances used as keys
-        The dictionary is the kind produced in the Training.py script
-        This function is specifically design for a dictionary containing dictionaries with keys ranging from 1 to 20 included
-    plot_name : str, optional
-        String containing the title for the plot
-
-    Returns
-    -------
-    None
-    
-    """
-	
-    #print(distances_distribution_by_pairs,"\n")
-
-    nb_rows = min(2,len(distances_distribution_by_pairs.keys()))
-    nb_cols = ceil(len(distances_distribution_by_pairs.keys())/nb_rows)
-
-    fig, axs = plt.subplots(nrows= nb_rows, ncols= nb_cols, figsize=(16, 8))
-
-    plt.subplots_adjust(hspace=0.5,wspace=0.7)
-    fig.suptitle(plot_name)
-
-    for i,(key, value) in enumerate(distances_distribution_by_pairs.items()) :
-        plot_distrib(fig,value,key,nb_ax =i)
-    
-    plt.show()
-
-    return
-
-def plot_score_function(fig,scores, pair = "",nb_ax = 0):
-
-    """ Function creating the subplot for the dictionary passed in parameters as a function
-
-    Parameters
-    ----------
-    fig
-        Figure where the subplot will be displayed
-    scores
-        Dictionary containing the scores for the distances used as keys
-        The dictionary is the kind imported for each pair of nucleosides for the data saved that was produced in the Training.py script
-        This function is specifically design for a dictionnary with keys ranging from 1 to 20 included
-    pair : str
-        String containing the title for the subplot
-    nb_ax
-        Index of the subplot in the figure
-    
-
-    Returns
-    -------
-    None
-    
-    """
-	
-    ax =fig.axes[nb_ax]
-    ax.plot([ int(d) for d in scores.keys()], [float(v) for v in scores.values()])
-    ax.set_title(pair)
-	
-    return
-
-def plot_score_functions_by_pairs(scores_by_pairs):
-
-    """ Function creating the plot for the dictionary passed in parameters as a function
-
-    Parameters
-    ----------
-    scores_by_pairs
-        Dictionary containing for each pair of nucleosides the dictionary of the scores for the distances used as keys
-        The dictionary is the kind imported from the csv files used to save the data produced in the Training.py script
-        This function is specifically design for a dictionary containing dictionaries with keys ranging from 1 to 20 included
-
-    Returns
-    -------
-    None
-    
-    """
-	
-    #print(scores_by_pairs,"\n")
-
-    nb_rows = min(2,len(scores_by_pairs.keys()))
-    nb_cols = ceil(len(scores_by_pairs.keys())/nb_rows)
-
-    fig, axs = plt.subplots(nrows= nb_rows, ncols= nb_cols, figsize=(16, 8))
-
-    plt.subplots_adjust(hspace=0.5,wspace=0.3)
-    fig.suptitle("Scores functions")
-
-    for i,(key, value) in enumerate(scores_by_pairs.items()) :
-        plot_score_function(fig,value,key,nb_ax =i)
-    
-    plt.show()
-
-    return
-
-def main():
-    
-    """ Function called when this script is executed as a script and not imported as a library
-
-    Parameters
-    ----------
-    None
-
-    Returns
-    -------
-    None
-    """
-
-    path_data_dir = str(os.path.join(__file__, "data"))
-    usage = "Usage :\npython [Path_to_Plotting.py] [-h, --help] [Path_to_data_directory]\n\t[Path_to_Plotting.py] : Path to this plotting script \n\t[-h, --help] : Prints this help text \n\t[Path_to_data_directory] : Path to the data directory\n\t\tMust contain a directory containing the score csv files"
-
-    if (len(sys.argv) > 1):
-        for i in range(len(sys.argv)):
-            if (sys.argv[i] in ["-h","--help"]) :
-                print(usage)
-                return
-            elif (os.path.exists(sys.argv[i])):
-                if (os.path.isabs(sys.argv[i])) :
-                    path_data_dir = str(sys.argv[i])
-                else:
-                    path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
-            else:
-                print(usage)
-                return
-
-	
-    print(path_data_dir)
-
-    if( not (os.path.exists(path_data_dir and os.path.isdir(path_data_dir)))):
-        print("Data directory not found.")
-        print(usage)
-        return
-
-    scores_file_names = glob.glob(os.path.join(path_data_dir,"*/scores*.csv"))
-
-    distance_scores_by_pairs = dict()
-    for file_path in scores_file_names :
-
-        #print(file_path)
-        dict_scores = dict()
-        distance_scores_by_pairs[os.path.splitext(os.path.basename(file_path))[0].split("_")[-1]] = import_from_csv(file_path,dict_scores)
-
-        #print(distance_scores_by_pairs)
-
-    plot_score_functions_by_pairs(distance_scores_by_pairs)
-	
-
-    return
-
-#Call the main function when this script is executed as a script and not imported as a library
-if __name__ == "__main__" :
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from math import ceil
+from multiprocessing import Pool
+from Utility_script import import_from_csv, import_from_binary, get_bootstrap_path, MODEL_FILE_NAME
+from Distances import DEFAULT_BINS, BinSpec
+from Profiling import RunProfiler
+from Cache import get_file_hash
+import numpy as np
+import os, sys, glob, json, hashlib
+
+#Figures drawn from a model file : name of the image files, title, array of the model, rows drawn ("pairs" or "reference") and kind of plot
+MODEL_FIGURES = [
+    ("distribution_by_pairs", "Distribution of distances by pairs", "counts", "pairs", "bar"),
+    ("frequencies_by_pairs", "Frequencies of distances by pairs", "frequencies", "pairs", "bar"),
+    ("reference_frequencies", "Reference distance frequencies", "frequencies", "reference", "bar"),
+    ("scores_by_pairs", "Distribution of distance scores by pairs", "scores", "pairs", "bar"),
+    ("score_functions", "Scores functions", "scores", "pairs", "line")
+]
+
+#Figure drawn when the bootstrap percentiles of the scores are saved next to the model file (see Training.py --bootstrap)
+BOOTSTRAP_FIGURE = ("score_intervals", "Scores functions and their bootstrap intervals")
+
+#Default formats of the image files and name of the file keeping the hash of the model of each image file in the directory of the plots
+PLOT_FORMATS = ("png",)
+PLOTS_MANIFEST = "plots.json"
+
+#Version of the drawing of the figures, must be increased when it changes so that the figures saved by a previous version are drawn again
+PLOTS_VERSION = 1
+
+def plot_bars(ax, labels, values, title = "", bins = DEFAULT_BINS):
+
+    """ Function drawing a distribution as bars on a subplot
+
+    Parameters
+    ----------
+    ax
+        Subplot where the bars are drawn
+    labels
+        Array of the labels of the bins of the distribution
+    values
+        Array of the distribution, frequencies or scores of each bin
+    title : str
+        String containing the title of the subplot
+    bins
+        BinSpec of the distribution, used for the width of the bars and the limits of the X axis
+
+    Returns
+    -------
+    None
+    """
+
+    ax.bar(labels, values, width = 0.8 * bins.width)
+    if (len(values) > 0) :
+        ax.axis([bins.min - bins.width , bins.max + bins.width, values.min(), values.max() * 1.1])
+    ax.set_title(title)
+    return
+
+def plot_line(ax, x, y, title = ""):
+
+    """ Function drawing a function as a line on a subplot
+
+    Parameters
+    ----------
+    ax
+        Subplot where the line is drawn
+    x, y
+        Arrays of the distances and of the values of the function at these distances
+    title : str
+        String containing the title of the subplot
+
+    Returns
+    -------
+    None
+    """
+
+    ax.plot(x, y)
+    ax.set_title(title)
+    return
+
+def plot_interval(ax, x, y, title = ""):
+
+    """ Function drawing a function as a line on a subplot, with the band of its interval
+
+    Parameters
+    ----------
+    ax
+        Subplot where the line is drawn
+    x
+        Array of the distances
+    y
+        Array of shape (3, len(x)) of the values of the function and of the lower and upper bounds of their intervals
+    title : str
+        String containing the title of the subplot
+
+    Returns
+    -------
+    None
+    """
+
+    ax.fill_between(x, y[1], y[2], alpha = 0.3, linewidth = 0)
+    ax.plot(x, y[0])
+    ax.set_title(title)
+    return
+
+def draw_figure(fig, plot_name, kind, names, xs, ys, bins = DEFAULT_BINS):
+
+    """ Function drawing one subplot by pair of nucleosides on a figure, on 2 rows
+
+    Parameters
+    ----------
+    fig
+        Figure where the subplots are drawn, from pyplot or a matplotlib.figure.Figure which needs no display
+    plot_name : str
+        String containing the title of the figure
+    kind : str
+        "bar" to draw distributions (see plot_bars), "line" to draw functions (see plot_line) or "interval" to draw functions with their intervals (see plot_interval)
+    names
+        List of the titles of the subplots
+    xs, ys
+        Lists of the arrays of the X and Y values of each subplot
+    bins
+        See plot_bars
+
+    Returns
+    -------
+    None
+    """
+
+    nb_rows = min(2,len(names))
+    nb_cols = ceil(len(names)/nb_rows)
+
+    fig.subplots(nrows= nb_rows, ncols= nb_cols)
+    fig.subplots_adjust(hspace=0.5,wspace=0.7 if kind == "bar" else 0.3)
+    fig.suptitle(plot_name)
+
+    for ax, name, x, y in zip(fig.axes, names, xs, ys) :
+        if (kind == "bar") :
+            plot_bars(ax, x, y, name, bins)
+        elif (kind == "interval") :
+            plot_interval(ax, x, y, name)
+        else :
+            plot_line(ax, x, y, name)
+    return
+
+def get_arrays(distributions_by_pairs):
+
+    """ Function converting a dictionary of distributions by pairs into arrays for draw_figure
+
+    Parameters
+    ----------
+    distributions_by_pairs
+        Dictionary containing for each pair of nucleosides the dictionary of the values for the distances used as keys
+
+    Returns
+    -------
+    names, xs, ys
+        List of the pairs and lists of the arrays of the distances and of the values of each pair
+    """
+
+    names = list(distributions_by_pairs.keys())
+    xs = [np.array([float(d) for d in distributions_by_pairs[name].keys()], dtype = np.float64) for name in names]
+    ys = [np.array([float(v) for v in distributions_by_pairs[name].values()], dtype = np.float64) for name in names]
+    return names, xs, ys
+
+def show_or_save(fig, path = None):
+
+    """ Function showing a figure drawn with pyplot, or saving it to a file and closing it
+
+    Parameters
+    ----------
+    fig
+        Figure created with pyplot
+    path
+        String containing the path to the image file (its extension gives the format : png, svg, pdf, ...), None to show the figure
+
+    Returns
+    -------
+    None
+    """
+
+    if (path is None) :
+        plt.show()
+    else :
+        fig.savefig(path)
+        plt.close(fig)
+    return
+
+def plot_distrib(fig,distances_distribution, pair = "",nb_ax = 0, bins = DEFAULT_BINS):
+
+    """ Function creating the subplot for the dictionary passed in parameters
+
+    Parameters
+    ----------
+    fig
+        Figure where the subplot will be displayed
+    distances_distribution
+        Dictionary containing the distribution, frequencies or scores for the distances used as keys
+        The dictionary is the kind produced for each pair of nucleosides in the Training.py script
+        The keys are the labels of the bins passed as a parameter
+    pair : str
+        String containing the title of the subplot
+    nb_ax
+        Index of the subplot in the figure
+    bins
+        BinSpec of the distribution, used for the width of the bars and the limits of the X axis (by default the integers from 1 to 20 included)
+
+    Returns
+    -------
+    None
+    
+    """
+
+    names, xs, ys = get_arrays({pair : distances_distribution})
+    plot_bars(fig.axes[nb_ax], xs[0], ys[0], pair, bins)
+    return
+
+def plot_distrib_by_pairs(distances_distribution_by_pairs, plot_name = "", bins = DEFAULT_BINS, path = None) :
+
+    """ Function creating the plot for the dictionary passed in parameters containing dictionaries for pairs of nucleosides
+
+    Parameters
+    ----------
+    distances_distribution_by_pairs
+        Dictionary containing for each pair of nucleosides the dictionary of the distribution, frequencies or scores for the distances used as keys
+        The dictionary is the kind produced in the Training.py script
+        The keys of the dictionaries are the labels of the bins passed as a parameter
+    plot_name : str, optional
+        String containing the title for the plot
+    bins : BinSpec, optional
+        Bins of the distributions (by default the integers from 1 to 20 included)
+    path : str, optional
+        See show_or_save
+
+    Returns
+    -------
+    None
+    
+    """
+
+    fig = plt.figure(figsize=(16, 8))
+    draw_figure(fig, plot_name, "bar", *get_arrays(distances_distribution_by_pairs), bins)
+    show_or_save(fig, path)
+    return
+
+def plot_score_function(fig,scores, pair = "",nb_ax = 0):
+
+    """ Function creating the subplot for the dictionary passed in parameters as a function
+
+    Parameters
+    ----------
+    fig
+        Figure where the subplot will be displayed
+    scores
+        Dictionary containing the scores for the distances used as keys
+        The dictionary is the kind imported for each pair of nucleosides for the data saved that was produced in the Training.py script
+        The keys are the distances of the scores, integers or floats
+    pair : str
+        String containing the title for the subplot
+    nb_ax
+        Index of the subplot in the figure
+    
+
+    Returns
+    -------
+    None
+    
+    """
+
+    names, xs, ys = get_arrays({pair : scores})
+    plot_line(fig.axes[nb_ax], xs[0], ys[0], pair)
+    return
+
+def plot_score_functions_by_pairs(scores_by_pairs, path = None):
+
+    """ Function creating the plot for the dictionary passed in parameters as a function
+
+    Parameters
+    ----------
+    scores_by_pairs
+        Dictionary containing for each pair of nucleosides the dictionary of the scores for the distances used as keys
+        The dictionary is the kind imported from the csv files used to save the data produced in the Training.py script
+        The keys of the dictionaries are the distances of the scores, integers or floats
+    path : str, optional
+        See show_or_save
+
+    Returns
+    -------
+    None
+    
+    """
+
+    fig = plt.figure(figsize=(16, 8))
+    draw_figure(fig, "Scores functions", "line", *get_arrays(scores_by_pairs))
+    show_or_save(fig, path)
+    return
+
+def render_figure(task):
+
+    """ Function drawing a figure and saving it to image files without any display, run by the rendering processes
+
+    Parameters
+    ----------
+    task
+        Tuple of the paths to the image files and of the parameters of draw_figure (plot_name, kind, names, xs, ys, bins)
+
+    Returns
+    -------
+    paths
+        List of the paths to the image files written
+    """
+
+    paths, *parameters = task
+    #A Figure which is not created by pyplot is drawn by the Agg backend, whatever the display
+    fig = Figure(figsize=(16, 8))
+    draw_figure(fig, *parameters)
+    for path in paths :
+        fig.savefig(path)
+    return paths
+
+def is_bootstrap_of_model(bootstrap_metadata : dict, model_metadata : dict):
+
+    """ Function checking that a bootstrap file was computed from the same training as a model file
+
+    Parameters
+    ----------
+    bootstrap_metadata : dict
+        Metadata of the bootstrap file (see Training.save_bootstrap)
+    model_metadata : dict
+        Metadata of the model file (see Training.save_model)
+
+    Returns
+    -------
+    same : bool
+        True if both files have the same corpus hash, bins, pairs and atom type
+    """
+
+    keys = ["corpus_hash", "atom_type"] + list(BinSpec.from_metadata(model_metadata).to_metadata())
+    same_pairs = bootstrap_metadata.get("pairs") == [pair for pair in model_metadata["pairs"] if pair != "XX"]
+    return same_pairs and all(bootstrap_metadata.get(key) == model_metadata.get(key) for key in keys)
+
+def get_model_figures(path_model : str):
+
+    """ Function building the figures of a model file produced by the training, drawn from its arrays
+
+    Parameters
+    ----------
+    path_model : str
+        String containing the path to the model file
+
+    Returns
+    -------
+    figures
+        Dictionary associating the name of each figure (see MODEL_FIGURES and BOOTSTRAP_FIGURE) to the parameters of draw_figure
+    """
+
+    data, model_metadata = import_from_binary(path_model)
+    bins = BinSpec.from_metadata(model_metadata)
+    arrays = {name : np.array(data[k]) for k, name in enumerate(model_metadata["arrays"])}
+    pairs = model_metadata["pairs"]
+    present = arrays["counts"] > 0
+    known = [p for p, pair in enumerate(pairs) if pair != "XX" and present[p].any()]
+    reference = [pairs.index("XX")]
+
+    figures = dict()
+    for name, plot_name, array, rows, kind in MODEL_FIGURES :
+        #The bars of the empty bins are not drawn, like in the dictionaries of the training
+        rows = known if rows == "pairs" else reference
+        mask = present if kind == "bar" else np.ones(present.shape, dtype = bool)
+        figures[name] = (plot_name, kind, [pairs[p] for p in rows], [bins.labels[mask[p]] for p in rows], [arrays[array][p][mask[p]] for p in rows], bins)
+
+    #The interval of each score goes from the first to the last percentile of the bootstrap
+    path_bootstrap = get_bootstrap_path(path_model)
+    if (os.path.isfile(path_bootstrap)) :
+        data, metadata = import_from_binary(path_bootstrap)
+        #A bootstrap of another training (other files, bins or atom type) does not describe the scores of this model
+        if not (is_bootstrap_of_model(metadata, model_metadata)) :
+            print(f"{path_bootstrap} was not computed from the training of {path_model}, the bootstrap intervals are not drawn", file = sys.stderr)
+            return figures
+        bootstrap = {pair : p for p, pair in enumerate(metadata["pairs"])}
+        lower, upper = np.array(data[0]), np.array(data[len(metadata["percentiles"]) - 1])
+        rows = [p for p in known if pairs[p] in bootstrap]
+        name, plot_name = BOOTSTRAP_FIGURE
+        figures[name] = (plot_name, "interval", [pairs[p] for p in rows], [bins.labels for p in rows], [np.stack([arrays["scores"][p], lower[bootstrap[pairs[p]]], upper[bootstrap[pairs[p]]]]) for p in rows], bins)
+    return figures
+
+def render_model_figures(path_model : str, plot_dir : str, formats = PLOT_FORMATS, workers : int = 1, names = None):
+
+    """ Function saving the figures of a model file to image files, in parallel if asked
+
+    The figures already saved for the same model file are not drawn again : the hash of the model of each image file is kept
+    in the PLOTS_MANIFEST file of the directory
+
+    Parameters
+    ----------
+    path_model : str
+        String containing the path to the model file
+    plot_dir : str
+        String containing the path to the directory of the image files, created if needed
+    formats
+        Iterable of the extensions of the image files written for each figure (png, svg, pdf, ...)
+    workers : int
+        Number of processes drawing the figures, they are drawn in this process if 1
+    names
+        Iterable of the names of the figures saved (see MODEL_FIGURES and BOOTSTRAP_FIGURE), None for all of them
+
+    Returns
+    -------
+    rendered, skipped
+        Lists of the paths to the image files written and to the ones kept from a previous run
+    """
+
+    os.makedirs(plot_dir, exist_ok = True)
+    manifest_path = os.path.join(plot_dir, PLOTS_MANIFEST)
+    manifest = dict()
+    if (os.path.isfile(manifest_path)) :
+        try :
+            with open(manifest_path) as f :
+                manifest = json.load(f)
+        except ValueError :
+            manifest = dict()
+
+    model_hash = hashlib.sha256(f"{PLOTS_VERSION}:{get_file_hash(path_model)}".encode()).hexdigest()
+    figures = get_model_figures(path_model)
+    #The figure of the bootstrap intervals also depends on the bootstrap file
+    if (BOOTSTRAP_FIGURE[0] in figures) :
+        bootstrap_hash = hashlib.sha256(f"{model_hash}:{get_file_hash(get_bootstrap_path(path_model))}".encode()).hexdigest()
+    tasks = []
+    skipped = []
+    hashes = dict()
+    for name, parameters in figures.items() :
+        if (names is not None and not name in names) :
+            continue
+        paths = [os.path.join(plot_dir, f"{name}.{extension}") for extension in formats]
+        figure_hash = bootstrap_hash if name == BOOTSTRAP_FIGURE[0] else model_hash
+        if all(manifest.get(os.path.basename(p)) == figure_hash and os.path.isfile(p) for p in paths) :
+            skipped.extend(paths)
+        else :
+            tasks.append((paths, *parameters))
+            hashes.update({os.path.basename(p) : figure_hash for p in paths})
+
+    rendered = []
+    if (workers > 1 and len(tasks) > 1) :
+        with Pool(min(workers, len(tasks))) as pool :
+            for paths in pool.imap_unordered(render_figure, tasks) :
+                rendered.extend(paths)
+    else :
+        for paths in map(render_figure, tasks) :
+            rendered.extend(paths)
+
+    #The manifest is written once all the figures are saved, so an interrupted run draws them again
+    manifest.update({os.path.basename(p) : hashes[os.path.basename(p)] for p in rendered})
+    with open(manifest_path, "w") as f :
+        json.dump(manifest, f, indent = 1)
+    return rendered, skipped
+
+def main():
+    
+    """ Function called when this script is executed as a script and not imported as a library
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    path_data_dir = str(os.path.join(__file__, "data"))
+    stats_path = None
+    profile_path = None
+    plot_dir = None
+    formats = PLOT_FORMATS
+    workers = os.cpu_count() or 1
+    usage = ("Usage :\n"
+        "python [Path_to_Plotting.py] [-h, --help] [--plot-dir Dir] [--plot-format Ext,Ext,...] [--workers N] [--stats File] [--profile File] [Path_to_data_directory]\n"
+        "\t[Path_to_Plotting.py] : Path to this plotting script \n"
+        "\t[-h, --help] : Prints this help text \n"
+        "\t[--plot-dir Dir] : Saves the figures to image files in Dir instead of showing them, without any display\n"
+        "\t\tWith a model.bin file, all the figures of the model are saved and the ones already saved for the same model are not drawn again \n"
+        "\t[--plot-format Ext,Ext,...] : Formats of the image files (default : png), for example png,svg \n"
+        "\t[--workers N] : Number of processes drawing the figures saved with --plot-dir (default : number of CPUs) \n"
+        "\t[--stats File] : Writes a JSON report of the wall time, CPU time and peak memory of each stage \n"
+        "\t[--profile File] : Profiles the run with cProfile and writes the profile to File (readable with pstats), the hottest functions are added to the --stats report \n"
+        "\t[Path_to_data_directory] : Path to the data directory\n"
+        "\t\tMust contain the model.bin file produced by the training or a directory containing the score csv files")
+
+    i = 1
+    while (i < len(sys.argv)):
+        if (sys.argv[i] in ["-h","--help"]) :
+            print(usage)
+            return
+        elif (sys.argv[i] in ["--stats", "--profile", "--plot-dir", "--plot-format"] and i + 1 < len(sys.argv)) :
+            if (sys.argv[i] == "--stats") :
+                stats_path = sys.argv[i + 1]
+            elif (sys.argv[i] == "--profile") :
+                profile_path = sys.argv[i + 1]
+            elif (sys.argv[i] == "--plot-dir") :
+                plot_dir = sys.argv[i + 1]
+            else :
+                formats = tuple(f.strip(".") for f in sys.argv[i + 1].split(",") if f)
+            i += 1
+        elif (sys.argv[i] == "--workers" and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() and int(sys.argv[i + 1]) > 0) :
+            workers = int(sys.argv[i + 1])
+            i += 1
+        elif (os.path.exists(sys.argv[i])):
+            if (os.path.isabs(sys.argv[i])) :
+                path_data_dir = str(sys.argv[i])
+            else:
+                path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
+        else:
+            print(usage)
+            return
+        i += 1
+
+	
+    print(path_data_dir)
+
+    if( not (os.path.exists(path_data_dir and os.path.isdir(path_data_dir)))):
+        print("Data directory not found.")
+        print(usage)
+        return
+
+    profiler = RunProfiler("Plotting.py", profile = profile_path is not None)
+
+    if (plot_dir is not None and os.path.isfile(os.path.join(path_data_dir, MODEL_FILE_NAME))) :
+        with profiler.stage("render") :
+            rendered, skipped = render_model_figures(os.path.join(path_data_dir, MODEL_FILE_NAME), plot_dir, formats, workers)
+        print(f"{len(rendered)} image files saved in {plot_dir}, {len(skipped)} unchanged")
+        profiler.details.update({"images_rendered" : len(rendered), "images_skipped" : len(skipped)})
+        profiler.stop()
+        profiler.save(stats_path, profile_path)
+        return
+
+    with profiler.stage("load_scores") :
+        scores_file_names = glob.glob(os.path.join(path_data_dir,"*/scores*.csv"))
+
+        distance_scores_by_pairs = dict()
+
+        #The binary model written by the training is preferred to the score csv files
+        if (os.path.isfile(os.path.join(path_data_dir, MODEL_FILE_NAME))) :
+            data, metadata = import_from_binary(os.path.join(path_data_dir, MODEL_FILE_NAME))
+            scores = data[metadata["arrays"].index("scores")]
+            counts = data[metadata["arrays"].index("counts")]
+            for p, pair in enumerate(metadata["pairs"]) :
+                if (pair != "XX" and counts[p].sum() > 0) :
+                    distance_scores_by_pairs[pair] = dict(zip(BinSpec.from_metadata(metadata).get_labels(), scores[p].tolist()))
+            scores_file_names = []
+
+        for file_path in scores_file_names :
+
+            #print(file_path)
+            dict_scores = dict()
+            distance_scores_by_pairs[os.path.splitext(os.path.basename(file_path))[0].split("_")[-1]] = import_from_csv(file_path,dict_scores)
+
+            #print(distance_scores_by_pairs)
+
+    with profiler.stage("plot") :
+        if (plot_dir is None) :
+            plot_score_functions_by_pairs(distance_scores_by_pairs)
+        else :
+            #The figures are only saved, pyplot must not open any window
+            plt.switch_backend("Agg")
+            os.makedirs(plot_dir, exist_ok = True)
+            for extension in formats :
+                plot_score_functions_by_pairs(distance_scores_by_pairs, os.path.join(plot_dir, f"score_functions.{extension}"))
+
+    profiler.stop()
+    profiler.save(stats_path, profile_path)
+
+    return
+
+#Call the main function when this script is executed as a script and not imported as a library
+if __name__ == "__main__" :
 	main()
\ No newline at end of file
@@ -0,0 +1,272 @@
+from contextlib import contextmanager
+import resource
+import cProfile
+import pstats
+import json
+import os
+import sys
+import time
+
+#Counters collected on each input file when statistics are asked, the report holds their sum over all the files
+COUNTERS = ("atoms_parsed", "atoms_kept", "pairs_evaluated", "pairs_within_cutoff", "pairs_dropped_unknown_residues")
+
+#Number of functions listed in the reports of the runs profiled with cProfile
+HOTTEST_FUNCTIONS = 20
+
+def add_counters(stats : dict, **counters):
+
+	""" Function adding values to the counters of a dictionary of statistics
+
+	Parameters
+	----------
+	stats : dict
+		Dictionary of the counters, nothing is done if None so that the statistics cost nothing when they are not asked
+	counters
+		Values added to the counters of the same names, the missing counters start at 0
+
+	Returns
+	-------
+	None
+	"""
+
+	if (stats is not None) :
+		for key, value in counters.items() :
+			stats[key] = stats.get(key, 0) + int(value)
+	return
+
+def get_peak_memory():
+
+	""" Function returning the peak resident memory of this process
+
+	Parameters
+	----------
+	None
+
+	Returns
+	-------
+	peak
+		Largest amount of memory (in MB) used by this process since it started
+	"""
+
+	#ru_maxrss is in kilobytes on Linux and in bytes on macOS
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+def get_cpu_time():
+
+	""" Function returning the CPU time used by this process and by its terminated child processes (the workers of a Pool)
+
+	Parameters
+	----------
+	None
+
+	Returns
+	-------
+	cpu_time
+		User and system CPU time in seconds
+	"""
+
+	children = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return time.process_time() + children.ru_utime + children.ru_stime
+
+def get_files_size(filenames):
+
+	""" Function summing the sizes of files on the disk
+
+	Parameters
+	----------
+	filenames
+		Iterable of the paths to the files, the files that cannot be found count for 0
+
+	Returns
+	-------
+	size
+		Number of bytes of the files
+	"""
+
+	size = 0
+	for filename in filenames :
+		try :
+			size += os.path.getsize(filename)
+		except OSError :
+			pass
+	return size
+
+def get_throughput(nb_files : int, nb_bytes : int, elapsed : float):
+
+	""" Function calculating the throughput of the processing of files
+
+	Parameters
+	----------
+	nb_files : int
+		Number of files processed
+	nb_bytes : int
+		Number of bytes of the files, see get_files_size
+	elapsed : float
+		Time in seconds spent on the files
+
+	Returns
+	-------
+	files_per_second, megabytes_per_second
+		Numbers of files and of MB (2^20 bytes) processed by second, 0 if no time was measured
+	"""
+
+	if (elapsed <= 0) :
+		return 0.0, 0.0
+	return nb_files / elapsed, nb_bytes / (1 << 20) / elapsed
+
+class RunProfiler :
+
+	""" Class recording the wall time, the CPU time and the peak memory of the stages and of the input files of a run of a script
+
+	Attributes
+	----------
+	script
+		Name of the script profiled
+	stages
+		List of the dictionaries of each stage, in the order in which they ended
+	files
+		List of the dictionaries of the statistics of each input file, in the order in which they were processed
+	counters
+		Dictionary of the sum of the counters (see COUNTERS) of all the files
+	details
+		Dictionary of the other information added to the report by the script (number of workers, files taken from a cache, ...)
+	profile
+		cProfile.Profile recording the function calls of this process, None if the run is not profiled
+	"""
+
+	def __init__(self, script : str, profile : bool = False):
+		self.script = script
+		self.stages = []
+		self.files = []
+		self.counters = dict.fromkeys(COUNTERS, 0)
+		self.details = dict()
+		self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+		self.start_wall = time.perf_counter()
+		self.start_cpu = get_cpu_time()
+		self.wall = None
+		self.cpu = None
+		self.profile = cProfile.Profile() if profile else None
+		if (self.profile is not None) :
+			self.profile.enable()
+
+	@contextmanager
+	def stage(self, name : str):
+
+		""" Context manager recording the wall time, the CPU time and the peak memory of the code run in it
+
+		Parameters
+		----------
+		name : str
+			Name of the stage in the report
+
+		Yields
+		------
+		None
+		"""
+
+		start_wall = time.perf_counter()
+		start_cpu = get_cpu_time()
+		try :
+			yield
+		finally :
+			self.stages.append({"name" : name, "wall" : time.perf_counter() - start_wall, "cpu" : get_cpu_time() - start_cpu, "peak_memory" : get_peak_memory()})
+
+	def add_file(self, filename : str, statistics : dict):
+
+		""" Method adding the statistics of an input file to the report and its counters to the total ones
+
+		Parameters
+		----------
+		filename : str
+			String containing the path to the file
+		statistics : dict
+			Dictionary of the wall time, CPU time, peak memory and counters of the file, measured by the process which handled it
+
+		Returns
+		-------
+		None
+		"""
+
+		self.files.append({"name" : filename, **statistics})
+		add_counters(self.counters, **{key : value for key, value in statistics.items() if key in COUNTERS})
+		return
+
+	def stop(self):
+
+		""" Method ending the run, its total times are measured and the profiling of the function calls is stopped
+
+		Returns
+		-------
+		None
+		"""
+
+		if (self.profile is not None) :
+			self.profile.disable()
+		self.wall = time.perf_counter() - self.start_wall
+		self.cpu = get_cpu_time() - self.start_cpu
+		return
+
+	def get_hottest_functions(self, nb : int = HOTTEST_FUNCTIONS):
+
+		""" Method listing the functions in which the profiled run spent the most time
+
+		Parameters
+		----------
+		nb : int
+			Number of functions listed
+
+		Returns
+		-------
+		functions
+			List of dictionaries with the location, the number of calls, the time spent in the function itself and the time spent in its calls
+			Empty if the run is not profiled
+		"""
+
+		if (self.profile is None) :
+			return []
+		stats = pstats.Stats(self.profile).stats
+		hottest = sorted(stats.items(), key = lambda item : item[1][2], reverse = True)[:nb]
+		return [{"function" : f"{os.path.basename(filename)}:{line}({name})", "calls" : calls, "total_time" : total_time, "cumulative_time" : cumulative_time} for (filename, line, name), (primitive_calls, calls, total_time, cumulative_time, callers) in hottest]
+
+	def get_report(self):
+
+		""" Method building the report of the run
+
+		Returns
+		-------
+		report
+			Dictionary of the run (script, arguments, start date, times and peak memory), of its details, stages, files and counters,
+			and of the hottest functions if the run is profiled
+		"""
+
+		if (self.wall is None) :
+			self.stop()
+		report = {"script" : self.script, "argv" : sys.argv[1:], "started" : self.started, "wall" : self.wall, "cpu" : self.cpu, "peak_memory" : get_peak_memory(), **self.details, "stages" : self.stages, "counters" : self.counters, "files" : self.files}
+		if (self.profile is not None) :
+			report["hottest_functions"] = self.get_hottest_functions()
+		return report
+
+	def save(self, stats_path : str = None, profile_path : str = None):
+
+		""" Method writing the JSON report of the run and the cProfile statistics
+
+		Parameters
+		----------
+		stats_path : str
+			String containing the path to the JSON report, not written if None
+		profile_path : str
+			String containing the path to the cProfile statistics (readable with pstats), not written if None or if the run is not profiled
+
+		Returns
+		-------
+		None
+		"""
+
+		report = self.get_report()
+		if (stats_path is not None) :
+			with open(stats_path, "w") as f :
+				json.dump(report, f, indent = 1)
+		if (profile_path is not None and self.profile is not None) :
+			self.profile.dump_stats(profile_path)
+		return
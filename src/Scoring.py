@@ -1,119 +1,572 @@
-import os, sys, glob
-from Utility_script import import_from_csv
-from Training import get_interatomic_distances_distribution_by_pairs
-from math import ceil, floor
-
-def linear_interpolation(x,x0,y0,x1,y1):
-    
-    """ Function performing a linear interpolation
-
-    Parameters
-    ----------
-    x
-        The x value for which the y value must be calculated by linear interpolation
-    x0 , y0
-        Coordinates of the lower point used in the linear interpolation
-    x1 , y1
-        Coordinates of the higher point used in the linear interpolation
-
-    Returns
-    -------
-    y
-        Result of the linear interpolation formula performed with the data passed in arguments
-    """
-
-    return ( (y0 * (x1 - x)) + (y1 * (x - x0)) ) / (x1 - x0)
-
-def get_estimated_energy(input_distances_distrib,distance_scores_by_pairs):
-
-    """ Function calculating the estimated Gibbs free energy using the data passed as arguments
-
-    Parameters
-    ----------
-    input_distances_distrib
-        Dictionary containing the distribution of distances between 1 and 20 included and not rounded down
-    distance_scores_by_pairs
-        Dictionary of the distribution of scores for distances between 1 and 20 included and rounded down for each pair of nucleosides
-        This dictionary is used as reference scores for the linear interpolation of the scores for the input distances
-
-    Returns
-    -------
-    sum(scores)
-        The estimated Gibbs free energy which is the sum of the scores calculated by linear interpolation for the input distances
-    """
-
-    scores = []
-    for pair, distrib in input_distances_distrib.items():
-        for distance, nb in distrib.items() :
-            x0 = floor(distance)
-            while (not(x0 in distance_scores_by_pairs[pair].keys()) and x0 > 0):
-                x0 -= 1
-            x1 = ceil(distance)
-            while (not(x1 in distance_scores_by_pairs[pair].keys()) and x1 < 20):
-                x1 += 1
-
-            scores.append( linear_interpolation(distance, x0, distance_scores_by_pairs[pair][x0], x1, distance_scores_by_pairs[pair][x1]) * nb )
-    return sum( scores )
-
-def main():
-
-    """ Function called when this script is executed as a script and not imported as a library
-
-    Parameters
-    ----------
-    None
-
-    Returns
-    -------
-    None
-    """
-
-    path_data_dir = str(os.path.join(__file__, "data"))
-    usage = "Usage :\npython [Path_to_Scoring.py] [-h, --help] [Path_to_data_directory]\n\t[Path_to_Scoring.py] : Path to this scoring script \n\t[-h, --help] : Prints this help text \n\t[Path_to_data_directory] : Path to the data directory\n\t\tMust contain a directory containing the score csv files and another containing only the input pdb file"
-
-    if (len(sys.argv) > 1):
-        for i in range(len(sys.argv)):
-            if (sys.argv[i] in ["-h","--help"]) :
-                print(usage)
-                return
-            elif (os.path.exists(sys.argv[i])):
-                if (os.path.isabs(sys.argv[i])) :
-                    path_data_dir = str(sys.argv[i])
-                else:
-                    path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
-            else:
-                print(usage)
-                return
-
-	
-    print(path_data_dir)
-
-    if( not (os.path.exists(path_data_dir and os.path.isdir(path_data_dir)))):
-        print("Data directory not found.")
-        print(usage)
-        return
-
-    scores_file_names = glob.glob(os.path.join(path_data_dir,"*/scores*.csv"))
-
-    distance_scores_by_pairs = dict()
-    for file_path in scores_file_names :
-
-        #print(file_path)
-        dict_scores = dict()
-        distance_scores_by_pairs[os.path.splitext(os.path.basename(file_path))[0].split("_")[-1]] = import_from_csv(file_path,dict_scores)
-
-        #print(distance_scores_by_pairs)
-
-    input_path = glob.glob(os.path.join(path_data_dir,"input/*.pdb"))[0]
-
-    input_distances_distrib = get_interatomic_distances_distribution_by_pairs(input_path,round_down= False)
-
-    estimated_gibbs_free_energy = get_estimated_energy(input_distances_distrib,distance_scores_by_pairs)
-	
-    print(f"Estimated Gibbs free energy for {os.path.splitext(os.path.basename(input_path))[0]} : {estimated_gibbs_free_energy}")
-
-    return
-
-#Call the main function when this script is executed as a script and not imported as a library
-if __name__ == "__main__" :
+import os, sys, glob, time, json, csv
+from multiprocessing import Pool
+from Utility_script import import_from_csv, MODEL_FILE_NAME
+from Parsing import PREFETCH_THREADS, get_models, list_structure_files, parse_structure, imap_prefetched
+from Model import ScoringModel, WeightedScoringModel
+from Distances import PAIRS, RESIDUES
+from Profiling import RunProfiler, get_peak_memory, get_files_size, get_throughput
+import numpy as np
+
+def linear_interpolation(x,x0,y0,x1,y1):
+    
+    """ Function performing a linear interpolation
+
+    Parameters
+    ----------
+    x
+        The x value for which the y value must be calculated by linear interpolation
+    x0 , y0
+        Coordinates of the lower point used in the linear interpolation
+    x1 , y1
+        Coordinates of the higher point used in the linear interpolation
+
+    Returns
+    -------
+    y
+        Result of the linear interpolation formula performed with the data passed in arguments
+    """
+
+    return ( (y0 * (x1 - x)) + (y1 * (x - x0)) ) / (x1 - x0)
+
+def get_estimated_energy(input_distances_distrib,distance_scores_by_pairs):
+
+    """ Function calculating the estimated Gibbs free energy using the data passed as arguments
+
+    Parameters
+    ----------
+    input_distances_distrib
+        Dictionary containing the distribution of distances not rounded down for each pair of nucleosides
+    distance_scores_by_pairs
+        ScoringModel loaded once by the caller (see ScoringModel.from_file and ScoringModel.from_dict),
+        or dictionary of the distribution of scores for the labels of the bins used for the training for each pair of nucleosides
+        A dictionary is compiled into a ScoringModel at each call, pass the model to score several structures
+
+    Returns
+    -------
+    energy
+        The estimated Gibbs free energy which is the sum of the scores calculated by linear interpolation for the input distances
+    """
+
+    #The scores are interpolated for all the distances of a pair at once
+    model = distance_scores_by_pairs if isinstance(distance_scores_by_pairs, ScoringModel) else ScoringModel.from_dict(distance_scores_by_pairs)
+
+    energy = 0.0
+    for pair, distrib in input_distances_distrib.items():
+        if not (pair in PAIRS) :
+            raise KeyError(pair)
+        distances = np.array(list(distrib.keys()), dtype = np.float64)
+        nb = np.array(list(distrib.values()), dtype = np.float64)
+        energy += float((model.score_distances(np.full(len(distances), PAIRS.index(pair)), distances) * nb).sum())
+    return energy
+
+def load_scores(path_data_dir):
+
+    """ Function importing the score csv files of a data directory
+
+    Parameters
+    ----------
+    path_data_dir
+        String containing the path to the data directory, the score csv files are searched in its sub-directories
+
+    Returns
+    -------
+    distance_scores_by_pairs
+        Dictionary of the distribution of scores for distances between 1 and 20 included for each pair of nucleosides
+    """
+
+    scores_file_names = glob.glob(os.path.join(path_data_dir,"*/scores*.csv"))
+
+    distance_scores_by_pairs = dict()
+    for file_path in scores_file_names :
+
+        #print(file_path)
+        dict_scores = dict()
+        distance_scores_by_pairs[os.path.splitext(os.path.basename(file_path))[0].split("_")[-1]] = import_from_csv(file_path,dict_scores)
+
+        #print(distance_scores_by_pairs)
+
+    return distance_scores_by_pairs
+
+def get_residue_energies(model, models, window = 0):
+
+    """ Function decomposing the energy of each model into the contributions of its residues and of its windows of residues
+
+    Parameters
+    ----------
+    model
+        ScoringModel used to score the distances
+    models
+        List of the serial number of each model with the list of its Chain objects, like Parsing.get_models returns
+    window
+        See ScoringModel.decompose
+
+    Returns
+    -------
+    rows
+        List of one dictionary per residue of each model with the model, the chain ID, the residue number and name,
+        the energy of the residue and the energy of the window starting at the residue (empty if window is 0 or if the window passes the end of the chain)
+    """
+
+    rows = []
+    for model_id, chains in models :
+        for chain in chains :
+            residue_energies, window_energies = model.decompose(chain, window)
+            for k in range(len(chain)) :
+                window_energy = "" if window_energies is None or np.isnan(window_energies[k]) else float(window_energies[k])
+                rows.append({"model" : model_id, "chain" : str(chain.chain_ids[k]), "residue" : int(chain.residue_numbers[k]), "name" : RESIDUES[chain.residues[k]] if chain.residues[k] >= 0 else "N", "energy" : float(residue_energies[k]), "window_energy" : window_energy})
+    return rows
+
+def save_residue_energies(path, rows):
+
+    """ Function saving the energies by residue produced by get_residue_energies in a csv file
+
+    Parameters
+    ----------
+    path
+        String containing the path to the csv file
+    rows
+        List of the dictionaries produced by get_residue_energies
+
+    Returns
+    -------
+    None
+    """
+
+    with open(path, "w", newline = "") as output :
+        writer = csv.DictWriter(output, fieldnames = ["model", "chain", "residue", "name", "energy", "window_energy"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return
+
+def get_batch_input_files(source):
+
+    """ Function listing the pdb files to score in batch mode
+
+    Parameters
+    ----------
+    source
+        "-" to read one path per line from the standard input, path to a directory to score all its structure files (see Parsing.is_structure_file)
+        or glob pattern of which only the structure files are scored too
+
+    Returns
+    -------
+    file_names
+        List of the paths to the files to score
+    """
+
+    if (source == "-") :
+        return [line.strip() for line in sys.stdin if line.strip()]
+    if (os.path.isdir(source)) :
+        return list_structure_files(os.path.join(source, "*"))
+    return list_structure_files(source)
+
+#Model used by the scoring processes, whether they collect statistics and score the inter-chain distances, set once per process by init_batch_worker
+batch_model = None
+batch_statistics = False
+batch_inter_chain = False
+
+def init_batch_worker(model, statistics = False, inter_chain = False):
+
+    """ Function initializing a scoring process with the model shared by the whole batch
+
+    Parameters
+    ----------
+    model
+        ScoringModel used to score the files, or WeightedScoringModel to score them with the models of several atom types
+    statistics
+        Boolean used to add the statistics of each file to its result
+    inter_chain
+        Boolean used to also score the distances between atoms of different chains (see Parsing.group_chains)
+
+    Returns
+    -------
+    None
+    """
+
+    global batch_model, batch_statistics, batch_inter_chain
+    batch_model = model
+    batch_statistics = statistics
+    batch_inter_chain = inter_chain
+    return
+
+def score_batch_file(file_path, data = None):
+
+    """ Function scoring each model of one file of a batch, the errors are reported in the result instead of being raised
+
+    Parameters
+    ----------
+    file_path
+        String containing the path to the pdb file, or its name if data is given
+    data
+        Bytes of the content of a structure file scored instead of reading file_path (see Parsing.read_structure_data), None to read the file
+        An exception raised while reading the file is reported like the errors of the scoring
+
+    Returns
+    -------
+    results
+        List of one dictionary per model (a single one if the file cannot be scored) with the name of the file, the serial number of the model,
+        its estimated energy (None if the file cannot be scored), the number of distances scored, the time spent on the file, the peak memory (in MB) of the process which scored it and the error if any
+        If the process collects statistics, the dictionary of the CPU time and counters (see Profiling.COUNTERS) of the file is added to the first one under "statistics"
+    """
+
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    stats = dict() if batch_statistics else None
+    result = {"name" : os.path.basename(file_path), "model" : "", "energy" : None, "n_pairs" : 0, "elapsed" : 0.0, "peak_memory" : 0.0, "error" : ""}
+    results = [result]
+    try :
+        if (isinstance(data, Exception)) :
+            raise data
+        if (isinstance(batch_model, WeightedScoringModel)) :
+            #All the atom types are parsed at once, each model scores its own atoms
+            table = parse_structure(file_path, batch_model.get_atom_names(), stats, data)
+            energies = batch_model.score_table(table, batch_inter_chain, stats = stats)
+            if not (energies) :
+                raise ValueError("No atom of the scored types found")
+        else :
+            models = get_models(file_path, batch_inter_chain, stats) if data is None else list(parse_structure(file_path, stats = stats, data = data).iter_models(inter_chain = batch_inter_chain))
+            if not (models) :
+                raise ValueError("No C3' atom found")
+            energies = batch_model.score_models(models, stats = stats)
+        results = [{**result, "model" : model, "energy" : energy, "n_pairs" : nb_pairs} for model, energy, nb_pairs in energies]
+    except Exception as e :
+        result["error"] = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    peak_memory = get_peak_memory()
+    for r in results :
+        r["elapsed"] = elapsed
+        r["peak_memory"] = peak_memory
+    if (batch_statistics) :
+        results[0]["statistics"] = {"path" : file_path, "wall" : elapsed, "cpu" : time.process_time() - start_cpu, "peak_memory" : peak_memory, **stats}
+    return results
+
+def score_prefetched_file(item):
+
+    """ Function scoring a file read ahead, run by the scoring processes of the pipelined mode
+
+    Parameters
+    ----------
+    item
+        Tuple of the path to the file and of its content, yielded by Parsing.iter_structure_data
+
+    Returns
+    -------
+    results
+        See score_batch_file
+    """
+
+    return score_batch_file(*item)
+
+def iter_batch_scores(file_names, model, workers = 1, statistics = False, inter_chain = False, prefetch = 0, io_threads = PREFETCH_THREADS):
+
+    """ Generator scoring files with the same model, in parallel if asked
+
+    Parameters
+    ----------
+    file_names
+        List of the paths to the pdb files
+    model
+        ScoringModel used to score the files, sent once to each process
+    workers
+        Number of scoring processes, the files are scored in this process if 1
+    statistics, inter_chain
+        See init_batch_worker
+    prefetch
+        Number of files read ahead by threads of this process while the current ones are scored (see Parsing.imap_prefetched), 0 to let each process read its files
+    io_threads
+        Number of threads reading the files ahead
+
+    Yields
+    ------
+    results
+        List of the dictionaries produced by score_batch_file for each file, in the order in which they are scored
+    """
+
+    if (workers > 1 and len(file_names) > 1) :
+        with Pool(min(workers, len(file_names)), initializer = init_batch_worker, initargs = (model, statistics, inter_chain)) as pool :
+            if (prefetch > 0) :
+                yield from imap_prefetched(score_prefetched_file, file_names, pool, prefetch, io_threads)
+            else :
+                yield from pool.imap_unordered(score_batch_file, file_names)
+    else :
+        init_batch_worker(model, statistics, inter_chain)
+        if (prefetch > 0) :
+            yield from imap_prefetched(score_prefetched_file, file_names, None, prefetch, io_threads)
+        else :
+            yield from map(score_batch_file, file_names)
+
+def score_batch(file_names, model, output = sys.stdout, output_format = "csv", workers = 1, profiler = None, inter_chain = False, prefetch = 0, io_threads = PREFETCH_THREADS):
+
+    """ Function scoring files and writing each result as soon as it is available
+
+    Parameters
+    ----------
+    file_names
+        List of the paths to the pdb files
+    model
+        ScoringModel used to score the files, or WeightedScoringModel to score them with the models of several atom types
+    output
+        Opened file where the results are written
+    output_format
+        "csv" or "jsonl"
+    workers
+        Number of scoring processes
+    profiler
+        Profiling.RunProfiler to which the statistics of each file are added, None to collect no statistics
+    inter_chain
+        See init_batch_worker
+    prefetch, io_threads
+        See iter_batch_scores
+
+    Returns
+    -------
+    results
+        List of the dictionaries produced by score_batch_file for each model of each file
+    """
+
+    fields = ["name", "model", "energy", "n_pairs", "elapsed", "peak_memory", "error"]
+    if (output_format == "csv") :
+        writer = csv.DictWriter(output, fieldnames = fields)
+        writer.writeheader()
+
+    results = []
+    for file_results in iter_batch_scores(file_names, model, workers, profiler is not None, inter_chain, prefetch, io_threads) :
+        if (profiler is not None) :
+            stats = file_results[0].pop("statistics")
+            profiler.add_file(stats.pop("path"), stats)
+        for result in file_results :
+            if (output_format == "csv") :
+                writer.writerow(result)
+            else :
+                #NaN is not valid JSON, the energy of the files that could not be scored is null
+                output.write(json.dumps(result, allow_nan = False) + "\n")
+        output.flush()
+        results.extend(file_results)
+    return results
+
+def main():
+
+    """ Function called when this script is executed as a script and not imported as a library
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    path_data_dir = str(os.path.join(__file__, "data"))
+    batch_source = None
+    output_path = None
+    workers = os.cpu_count() or 1
+    top = 0
+    inter_chain = False
+    merge_models = False
+    residues_path = None
+    window = 0
+    stats_path = None
+    profile_path = None
+    weights = None
+    prefetch = 0
+    io_threads = PREFETCH_THREADS
+    usage = ("Usage :\n"
+        "python [Path_to_Scoring.py] [-h, --help] [--batch Source] [--output File] [--workers N] [--prefetch N] [--io-threads N] [--top K] [--inter-chain] [--merge-models] [--atoms Type:Weight,...] [--residues File] [--window W] [--stats File] [--profile File] [Path_to_data_directory]\n"
+        "\t[Path_to_Scoring.py] : Path to this scoring script \n"
+        "\t[-h, --help] : Prints this help text \n"
+        "\t[--batch Source] : Scores all the pdb files of Source instead of the input directory\n"
+        "\t\tSource is a directory, a quoted glob pattern or - to read one path per line from the standard input \n"
+        "\t[--output File] : File where the batch results are written as they are available, in JSON lines if it ends with .jsonl, in csv otherwise (default : standard output in csv) \n"
+        "\t[--workers N] : Number of processes scoring the batch (default : number of CPUs) \n"
+        "\t[--prefetch N] : Pipelined mode, N files of the batch are read ahead by threads while the current ones are scored, for the slow or network disks (default : 0, each process reads its files)\n"
+        "\t\tThe numbers of files and MB scored by second are printed in both modes \n"
+        "\t[--io-threads N] : Number of threads reading the files ahead with --prefetch (default : 4) \n"
+        "\t[--top K] : Prints the K files of the batch with the lowest energies once they are all scored \n"
+        "\t[--inter-chain] : Also scores the distances between the atoms of different chains, for complexes \n"
+        "\t[--merge-models] : Scores the atoms of all the models of the input file together, like the former parser did, instead of printing the energy of each model and their mean\n"
+        "\t\tThe models of an NMR ensemble are scored independently by default since the same pair of residues of different models is not a real contact, this option reproduces the former energies of the ensembles \n"
+        "\t[--atoms Type:Weight,...] : Scores with the weighted sum of the energies given by the models of several atom types, trained with Training.py --atoms (the weight is 1 if omitted)\n"
+        "\t\tAll the atom types are read in a single parse of each file, --residues is not available with this option \n"
+        "\t[--residues File] : Writes the energy of each residue of the input file in a csv file, half of the score of each distance going to each of its residues \n"
+        "\t[--window W] : Adds to the --residues file the energy of the window of W residues starting at each residue, the energy of this fragment scored alone \n"
+        "\t[--stats File] : Writes a JSON report of the wall time, CPU time and peak memory of each stage and of each file scored, with the numbers of atoms and pairs of atoms processed \n"
+        "\t[--profile File] : Profiles the run with cProfile and writes the profile to File (readable with pstats), the hottest functions are added to the --stats report\n"
+        "\t\tOnly this process is profiled, use --workers 1 to profile the scoring of a batch \n"
+        "\t[Path_to_data_directory] : Path to the data directory\n"
+        "\t\tMust contain the model.bin file produced by the training or a directory containing the score csv files, and another directory containing only the input pdb file\n"
+        "\t\tThe pdb (.pdb, .ent) and mmCIF (.cif, .mmcif) files are read, compressed with gzip (.gz) or bzip2 (.bz2) or not")
+
+    i = 1
+    while (i < len(sys.argv)):
+        if (sys.argv[i] in ["-h","--help"]) :
+            print(usage)
+            return
+        elif (sys.argv[i] == "--batch" and i + 1 < len(sys.argv)) :
+            batch_source = sys.argv[i + 1]
+            i += 1
+        elif (sys.argv[i] == "--atoms" and i + 1 < len(sys.argv)) :
+            weights = dict()
+            try :
+                for item in sys.argv[i + 1].split(",") :
+                    atom_type, separator, weight = item.rpartition(":") if ":" in item else (item, "", "1")
+                    weights[atom_type] = float(weight)
+            except ValueError :
+                weights = dict()
+            if not (weights) or "" in weights :
+                print(f"Invalid atom types {sys.argv[i + 1]}")
+                print(usage)
+                return
+            i += 1
+        elif (sys.argv[i] == "--inter-chain") :
+            inter_chain = True
+        elif (sys.argv[i] == "--merge-models") :
+            merge_models = True
+        elif (sys.argv[i] in ["--output", "--residues", "--stats", "--profile"] and i + 1 < len(sys.argv)) :
+            if (sys.argv[i] == "--output") :
+                output_path = sys.argv[i + 1]
+            elif (sys.argv[i] == "--residues") :
+                residues_path = sys.argv[i + 1]
+            elif (sys.argv[i] == "--stats") :
+                stats_path = sys.argv[i + 1]
+            else :
+                profile_path = sys.argv[i + 1]
+            i += 1
+        elif (sys.argv[i] in ["--prefetch", "--io-threads"] and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit()) :
+            if (sys.argv[i] == "--prefetch") :
+                prefetch = int(sys.argv[i + 1])
+            else :
+                io_threads = max(1, int(sys.argv[i + 1]))
+            i += 1
+        elif (sys.argv[i] in ["--workers", "--top", "--window"] and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit()) :
+            if (sys.argv[i] == "--workers") :
+                workers = max(1, int(sys.argv[i + 1]))
+            elif (sys.argv[i] == "--top") :
+                top = int(sys.argv[i + 1])
+            else :
+                window = int(sys.argv[i + 1])
+            i += 1
+        elif (os.path.exists(sys.argv[i])):
+            if (os.path.isabs(sys.argv[i])) :
+                path_data_dir = str(sys.argv[i])
+            else:
+                path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
+        else:
+            print(usage)
+            return
+        i += 1
+
+    #The standard output only receives the results in batch mode
+    if (batch_source is None) :
+        print(path_data_dir)
+
+    if( not (os.path.exists(path_data_dir and os.path.isdir(path_data_dir)))):
+        print("Data directory not found.")
+        print(usage)
+        return
+
+    profiler = RunProfiler("Scoring.py", profile = profile_path is not None)
+
+    #The binary model written by the training is preferred to the score csv files
+    with profiler.stage("load_model") :
+        if (weights is not None) :
+            try :
+                model = WeightedScoringModel.from_directory(path_data_dir, weights)
+            except FileNotFoundError as e :
+                print(e)
+                return
+        elif (os.path.isfile(os.path.join(path_data_dir, MODEL_FILE_NAME))) :
+            model = ScoringModel.from_file(os.path.join(path_data_dir, MODEL_FILE_NAME))
+        else :
+            model = ScoringModel.from_dict(load_scores(path_data_dir))
+
+    if (batch_source is not None) :
+        if (residues_path is not None) :
+            print("--residues is only used when scoring the input file, not in batch mode", file = sys.stderr)
+        if (merge_models) :
+            print("--merge-models is only used when scoring the input file, each model of the batch files is scored", file = sys.stderr)
+        with profiler.stage("list_files") :
+            file_names = get_batch_input_files(batch_source)
+        output_format = "jsonl" if (output_path is not None and output_path.endswith(".jsonl")) else "csv"
+        profiler.details.update({"workers" : workers, "files" : len(file_names), "prefetch" : prefetch, "io_threads" : io_threads})
+        start = time.perf_counter()
+        with profiler.stage("score_batch") :
+            if (output_path is None) :
+                results = score_batch(file_names, model, sys.stdout, output_format, workers, profiler if stats_path is not None else None, inter_chain, prefetch, io_threads)
+            else :
+                with open(output_path, "w", newline = "") as output :
+                    results = score_batch(file_names, model, output, output_format, workers, profiler if stats_path is not None else None, inter_chain, prefetch, io_threads)
+
+        #The results have one row for each model of a file, the failed files are counted once
+        failed = [r for r in results if r["error"]]
+        if (failed) :
+            print(f"{len({r['name'] for r in failed})} of {len({r['name'] for r in results})} files could not be scored", file = sys.stderr)
+        elapsed = time.perf_counter() - start
+        nb_bytes = get_files_size(file_names)
+        files_per_second, megabytes_per_second = get_throughput(len(file_names), nb_bytes, elapsed)
+        print(f"Throughput : {files_per_second:.1f} files/s, {megabytes_per_second:.2f} MB/s ({nb_bytes / (1 << 20):.2f} MB) in {elapsed:.3f} s" + (f", {prefetch} files read ahead by {io_threads} threads" if prefetch > 0 else ""), file = sys.stderr)
+        profiler.details.update({"bytes_scored" : nb_bytes, "files_per_second" : files_per_second, "megabytes_per_second" : megabytes_per_second})
+        print(f"Peak memory of the scoring processes : {max([r['peak_memory'] for r in results], default = get_peak_memory()):.1f} MB", file = sys.stderr)
+        if (top > 0) :
+            ranking = sorted([r for r in results if not r["error"]], key = lambda r : r["energy"])[:top]
+            print(f"Top {len(ranking)} lowest energies :", file = sys.stderr if output_path is None else sys.stdout)
+            for rank, r in enumerate(ranking, 1) :
+                print(f"{rank}\t{r['name']}\t{r['model']}\t{r['energy']}", file = sys.stderr if output_path is None else sys.stdout)
+        profiler.details["files_failed"] = len(failed)
+        profiler.stop()
+        profiler.save(stats_path, profile_path)
+        return
+
+    input_path = list_structure_files(os.path.join(path_data_dir,"input/*"))[0]
+
+    #The distances are scored block by block as they are computed, so the memory used does not grow with their number
+    stats = dict() if stats_path is not None else None
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    if (weights is not None) :
+        if (residues_path is not None) :
+            print("--residues is not available with --atoms, only the weighted energies are computed", file = sys.stderr)
+            residues_path = None
+        if (merge_models) :
+            print("--merge-models is not available with --atoms, the energy of each model is computed", file = sys.stderr)
+        with profiler.stage("parse") :
+            table = parse_structure(input_path, model.get_atom_names(), stats)
+        with profiler.stage("score") :
+            energies = model.score_table(table, inter_chain, stats = stats)
+    else :
+        with profiler.stage("parse") :
+            if (merge_models) :
+                models = [("", parse_structure(input_path, stats = stats).get_chains(inter_chain = inter_chain))]
+            else :
+                models = get_models(input_path, inter_chain, stats)
+        with profiler.stage("score") :
+            energies = model.score_models(models, stats = stats)
+    if (stats is not None) :
+        profiler.add_file(input_path, {"wall" : time.perf_counter() - start, "cpu" : time.process_time() - start_cpu, "peak_memory" : get_peak_memory(), **stats})
+    profiler.details["models"] = len(energies)
+
+    #The models of an ensemble are scored independently, the energy of the structure is their mean
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    if (len(energies) > 1) :
+        for model_id, energy, nb_pairs in energies :
+            print(f"Model {model_id} : {energy} ({nb_pairs} distances)")
+        estimated_gibbs_free_energy = sum(energy for model_id, energy, nb_pairs in energies) / len(energies)
+        print(f"Estimated Gibbs free energy for {name} (mean of {len(energies)} models) : {estimated_gibbs_free_energy}")
+    else :
+        estimated_gibbs_free_energy = energies[0][1] if energies else 0.0
+        print(f"Estimated Gibbs free energy for {name} : {estimated_gibbs_free_energy}")
+    print(f"Distances scored : {sum(nb_pairs for model_id, energy, nb_pairs in energies)}, peak memory : {get_peak_memory():.1f} MB")
+
+    if (residues_path is not None) :
+        with profiler.stage("decompose") :
+            save_residue_energies(residues_path, get_residue_energies(model, models, window))
+        print(f"Energies by residue saved in {residues_path}")
+
+    profiler.stop()
+    profiler.save(stats_path, profile_path)
+
+    return
+
+#Call the main function when this script is executed as a script and not imported as a library
+if __name__ == "__main__" :
 	main()
\ No newline at end of file
@@ -0,0 +1,646 @@
+from Scoring import init_batch_worker, score_batch_file, load_scores
+from Model import ScoringModel
+from Profiling import get_peak_memory
+from Utility_script import MODEL_FILE_NAME
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future
+from multiprocessing import Pool
+from collections import deque
+import numpy as np
+import socketserver
+import threading
+import signal
+import queue
+import json
+import os
+import sys
+import time
+
+#Port of the HTTP server on localhost when no Unix socket is given
+DEFAULT_PORT = 8765
+
+#Number of requests waiting to be scored from which the new requests are refused with the status 503
+QUEUE_SIZE = 256
+
+#Largest number of requests sent at once to a scoring process, and time (in seconds) the dispatcher waits for more requests to fill a batch
+BATCH_SIZE = 16
+BATCH_DELAY = 0.002
+
+#Number of batches sent to each scoring process before the dispatcher waits for one of them to be scored, the requests then wait in the queue
+BATCHES_BY_WORKER = 2
+
+#Number of the last requests whose latency is kept for the percentiles, and time (in seconds) over which the recent throughput is measured
+LATENCY_WINDOW = 1000
+THROUGHPUT_WINDOW = 60.0
+
+#Number of connections waiting to be accepted by the server, the next ones are refused by the system
+CONNECTION_BACKLOG = 128
+
+#Largest body of a request (in bytes) and longest time (in seconds) a request waits for its result
+MAX_REQUEST_SIZE = 1 << 26
+REQUEST_TIMEOUT = 300.0
+
+def init_server_worker(model, inter_chain : bool = False):
+
+	""" Function initializing a scoring process of the server, which ignores Ctrl+C and SIGTERM since the server stops it once its requests are scored
+
+	Parameters
+	----------
+	model, inter_chain
+		See Scoring.init_batch_worker
+
+	Returns
+	-------
+	None
+	"""
+
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	signal.signal(signal.SIGTERM, signal.SIG_IGN)
+	init_batch_worker(model, False, inter_chain)
+	return
+
+def score_server_batch(items):
+
+	""" Function scoring a batch of requests in a scoring process initialized by Scoring.init_batch_worker
+
+	Parameters
+	----------
+	items
+		List of (path, data) of each request, see Scoring.score_batch_file
+
+	Returns
+	-------
+	results
+		List of the results of Scoring.score_batch_file for each request
+	"""
+
+	return [score_batch_file(path, data) for path, data in items]
+
+def get_response(name : str, results):
+
+	""" Function building the response to a request from the results of each model of its structure
+
+	Parameters
+	----------
+	name : str
+		Name of the structure in the response
+	results
+		List of the dictionaries of Scoring.score_batch_file
+
+	Returns
+	-------
+	response
+		Dictionary of the name, the estimated Gibbs free energy (mean of the models like the scoring script), the number of distances scored,
+		the energy of each model, the time spent scoring the structure and the error if any
+	"""
+
+	error = results[0]["error"]
+	energies = [r["energy"] for r in results]
+	return {"name" : name, "energy" : sum(energies) / len(energies) if not error else None, "n_pairs" : sum(r["n_pairs"] for r in results),
+		"models" : [{"model" : r["model"], "energy" : r["energy"], "n_pairs" : r["n_pairs"]} for r in results] if not error else [],
+		"elapsed" : results[0]["elapsed"], "error" : error}
+
+class ServerMetrics :
+
+	""" Class counting the requests of a scoring server and measuring their latency and throughput
+
+	Attributes
+	----------
+	started
+		Time (time.perf_counter) at which the server started
+	counters
+		Dictionary of the numbers of requests received, completed, failed (scored with an error) and rejected (queue full), and of batches sent
+	latencies
+		Deque of the latencies (in seconds, from the reception to the result) of the last requests
+	completions
+		Deque of the times at which the last requests were completed, for the recent throughput
+	"""
+
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.counters = dict.fromkeys(["received", "completed", "failed", "rejected", "batches"], 0)
+		self.latencies = deque(maxlen = LATENCY_WINDOW)
+		self.completions = deque()
+		self.lock = threading.Lock()
+
+	def add(self, **counters):
+
+		""" Method adding values to the counters
+
+		Parameters
+		----------
+		counters
+			Values added to the counters of the same names
+
+		Returns
+		-------
+		None
+		"""
+
+		with self.lock :
+			for key, value in counters.items() :
+				self.counters[key] += value
+		return
+
+	def add_result(self, latency : float, failed : bool):
+
+		""" Method recording a completed request
+
+		Parameters
+		----------
+		latency : float
+			Time in seconds between the reception of the request and its result
+		failed : bool
+			True if the structure could not be scored
+
+		Returns
+		-------
+		None
+		"""
+
+		now = time.perf_counter()
+		with self.lock :
+			self.counters["completed"] += 1
+			self.counters["failed"] += int(failed)
+			self.latencies.append(latency)
+			self.completions.append(now)
+			while (self.completions and self.completions[0] < now - THROUGHPUT_WINDOW) :
+				self.completions.popleft()
+		return
+
+	def get_report(self, queued : int = 0, in_flight : int = 0):
+
+		""" Method building the report of the metrics
+
+		Parameters
+		----------
+		queued : int
+			Number of requests waiting in the queue
+		in_flight : int
+			Number of requests being scored
+
+		Returns
+		-------
+		report
+			Dictionary of the counters, the queue, the mean size of the batches, the latency percentiles (in ms) of the last requests,
+			the throughput (requests/s) since the start and over the last THROUGHPUT_WINDOW seconds, and the peak memory (in MB) of the server process
+		"""
+
+		now = time.perf_counter()
+		with self.lock :
+			counters = dict(self.counters)
+			latencies = np.array(self.latencies, dtype = np.float64) * 1000
+			recent = sum(1 for t in self.completions if t >= now - THROUGHPUT_WINDOW)
+		uptime = now - self.started
+		percentiles = dict(zip(["p50", "p90", "p99", "max"], np.percentile(latencies, [50, 90, 99, 100]).tolist())) if len(latencies) else dict.fromkeys(["p50", "p90", "p99", "max"], None)
+		return {"uptime" : uptime, **counters, "queued" : queued, "in_flight" : in_flight, "mean_batch_size" : counters["completed"] / counters["batches"] if counters["batches"] else None,
+			"latency_ms" : percentiles, "throughput" : counters["completed"] / uptime if uptime > 0 else 0.0, "recent_throughput" : recent / min(uptime, THROUGHPUT_WINDOW) if uptime > 0 else 0.0,
+			"peak_memory" : get_peak_memory()}
+
+class ScoringServer :
+
+	""" Class scoring the structures submitted by concurrent clients with a model loaded once
+
+	The requests wait in a bounded queue, a dispatcher thread groups them in batches sent to a pool of scoring processes
+	which received the model when they started. When the processes are busy the queue fills up and the new requests are refused (backpressure)
+
+	Attributes
+	----------
+	model
+		ScoringModel used to score the structures
+	workers
+		Number of scoring processes, the structures are scored by the dispatcher thread of this process if 1
+	inter_chain
+		See Scoring.init_batch_worker
+	batch_size, batch_delay
+		See BATCH_SIZE and BATCH_DELAY
+	requests
+		queue.Queue of the requests waiting to be scored
+	metrics
+		ServerMetrics of the server
+	"""
+
+	def __init__(self, model : ScoringModel, workers : int = 1, inter_chain : bool = False, queue_size : int = QUEUE_SIZE, batch_size : int = BATCH_SIZE, batch_delay : float = BATCH_DELAY):
+		self.model = model
+		self.workers = workers
+		self.inter_chain = inter_chain
+		self.batch_size = batch_size
+		self.batch_delay = batch_delay
+		self.requests = queue.Queue(maxsize = queue_size)
+		self.metrics = ServerMetrics()
+		self.slots = threading.BoundedSemaphore(max(1, workers) * BATCHES_BY_WORKER)
+		self.in_flight = 0
+		self.lock = threading.Lock()
+		self.pool = None
+		self.dispatcher = None
+
+	def start(self):
+
+		""" Method starting the scoring processes and the dispatcher thread
+
+		Returns
+		-------
+		None
+		"""
+
+		#The processes are started before any thread, so that they are not forked while a lock is held
+		if (self.workers > 1) :
+			self.pool = Pool(self.workers, initializer = init_server_worker, initargs = (self.model, self.inter_chain))
+		else :
+			init_batch_worker(self.model, False, self.inter_chain)
+		self.dispatcher = threading.Thread(target = self.dispatch, name = "dispatcher", daemon = True)
+		self.dispatcher.start()
+		return
+
+	def stop(self):
+
+		""" Method stopping the dispatcher thread once the queued requests are sent, and the scoring processes once they are scored
+
+		Returns
+		-------
+		None
+		"""
+
+		if (self.dispatcher is not None) :
+			self.requests.put(None)
+			self.dispatcher.join()
+		if (self.pool is not None) :
+			self.pool.close()
+			self.pool.join()
+		return
+
+	def submit(self, path : str = None, data : bytes = None):
+
+		""" Method adding a request to the queue
+
+		Parameters
+		----------
+		path : str
+			String containing the path to the structure file, or the name of the structure if data is given
+		data : bytes
+			Content of a pdb file, None to read the file
+
+		Returns
+		-------
+		future : Future
+			Future whose result is the list of the dictionaries of Scoring.score_batch_file for the structure
+
+		Raises
+		------
+		queue.Full
+			If the queue is full
+		"""
+
+		future = Future()
+		self.metrics.add(received = 1)
+		try :
+			self.requests.put_nowait((path, data, future, time.perf_counter()))
+		except queue.Full :
+			self.metrics.add(rejected = 1)
+			raise
+		return future
+
+	def dispatch(self):
+
+		""" Method run by the dispatcher thread, sending the requests of the queue in batches until None is found in it
+
+		Returns
+		-------
+		None
+		"""
+
+		stopping = False
+		while not (stopping) :
+			request = self.requests.get()
+			if (request is None) :
+				break
+			batch = [request]
+			#The batch is sent as soon as it is full or when no other request comes in time
+			deadline = time.perf_counter() + self.batch_delay
+			while (len(batch) < self.batch_size) :
+				try :
+					request = self.requests.get(timeout = max(0.0, deadline - time.perf_counter()))
+				except queue.Empty :
+					break
+				if (request is None) :
+					stopping = True
+					break
+				batch.append(request)
+
+			self.slots.acquire()
+			with self.lock :
+				self.in_flight += len(batch)
+			self.metrics.add(batches = 1)
+			items = [(path, data) for path, data, future, received in batch]
+			if (self.pool is None) :
+				self.complete(batch, score_server_batch(items))
+			else :
+				self.pool.apply_async(score_server_batch, (items,), callback = lambda results, batch = batch : self.complete(batch, results), error_callback = lambda e, batch = batch : self.complete(batch, None, e))
+		return
+
+	def complete(self, batch, results, error : Exception = None):
+
+		""" Method giving their results to the requests of a batch
+
+		Parameters
+		----------
+		batch
+			List of the requests of the batch
+		results
+			List of the results of score_server_batch, None if the batch failed
+		error : Exception
+			Exception raised by the scoring process if the batch failed
+
+		Returns
+		-------
+		None
+		"""
+
+		now = time.perf_counter()
+		for k, (path, data, future, received) in enumerate(batch) :
+			if (results is None) :
+				future.set_exception(error)
+			else :
+				future.set_result(results[k])
+			self.metrics.add_result(now - received, results is None or bool(results[k][0]["error"]))
+		with self.lock :
+			self.in_flight -= len(batch)
+		self.slots.release()
+		return
+
+	def get_metrics(self):
+
+		""" Method building the report of the metrics of the server
+
+		Returns
+		-------
+		report
+			See ServerMetrics.get_report
+		"""
+
+		with self.lock :
+			in_flight = self.in_flight
+		return {"workers" : self.workers, **self.metrics.get_report(self.requests.qsize(), in_flight)}
+
+def get_request_path(path : str, root : str):
+
+	""" Function resolving the path to a structure file given in a request, which must be inside the root directory of the server
+
+	Parameters
+	----------
+	path : str
+		String containing the path given in the request, relative to the root directory if it is not absolute
+	root : str
+		String containing the path to the directory the files scored must be in
+
+	Returns
+	-------
+	path : str
+		String containing the resolved path to the file, without any symbolic link
+
+	Raises
+	------
+	PermissionError
+		If the resolved path is outside of the root directory
+	"""
+
+	root = os.path.realpath(root)
+	resolved = os.path.realpath(os.path.join(root, path))
+	if (os.path.commonpath([root, resolved]) != root) :
+		raise PermissionError(f"{path} is outside of the root directory of the server")
+	return resolved
+
+class ScoringRequestHandler(BaseHTTPRequestHandler) :
+
+	""" Class handling the HTTP requests of a scoring server
+
+	GET /health answers {"status" : "ok"}, GET /metrics the report of ScoringServer.get_metrics
+	POST /score scores the structures of the body : a JSON object {"path" : ...} or {"pdb" : ..., "name" : ...}, a JSON list of such objects,
+	or the text of a pdb file. The answer is the response of get_response for each structure, a list for a list
+	The paths must be inside the root directory, the requests with another path are refused with the status 403
+	"""
+
+	#ScoringServer of the requests and directory the paths of the requests must be in, set on the class by main
+	scorer = None
+	root = os.getcwd()
+	protocol_version = "HTTP/1.1"
+
+	def send_json(self, status : int, content, headers : dict = None):
+		body = json.dumps(content).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		for key, value in (headers or dict()).items() :
+			self.send_header(key, value)
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_GET(self):
+		if (self.path == "/health") :
+			self.send_json(200, {"status" : "ok"})
+		elif (self.path == "/metrics") :
+			self.send_json(200, self.scorer.get_metrics())
+		else :
+			self.send_json(404, {"error" : f"Unknown path {self.path}"})
+
+	def do_POST(self):
+		if (self.path != "/score") :
+			self.send_json(404, {"error" : f"Unknown path {self.path}"})
+			return
+		length = int(self.headers.get("Content-Length", 0))
+		if (length > MAX_REQUEST_SIZE) :
+			self.send_json(413, {"error" : f"Request larger than {MAX_REQUEST_SIZE} bytes"})
+			self.close_connection = True
+			return
+		body = self.rfile.read(length)
+
+		#The body is either JSON or the text of a pdb file
+		try :
+			if (self.headers.get("Content-Type", "").startswith("application/json")) :
+				content = json.loads(body)
+				items = content if isinstance(content, list) else [content]
+				structures = [(item.get("name", os.path.basename(item["path"])), item["path"], None) if "path" in item else (item.get("name", "input"), item.get("name", "input"), item["pdb"].encode()) for item in items]
+			else :
+				content = None
+				structures = [(self.headers.get("X-Structure-Name", "input"), self.headers.get("X-Structure-Name", "input"), body)]
+		except (ValueError, KeyError, TypeError, AttributeError) as e :
+			self.send_json(400, {"error" : f"Invalid request, a JSON object with a path or pdb key, a list of them or the text of a pdb file is expected ({type(e).__name__}: {e})"})
+			return
+
+		#No structure is scored if one of the paths is outside of the root directory
+		try :
+			structures = [(name, get_request_path(path, self.root), None) if data is None else (name, path, data) for name, path, data in structures]
+		except (PermissionError, TypeError, ValueError) as e :
+			self.send_json(403, {"error" : str(e)})
+			return
+
+		futures = []
+		try :
+			for name, path, data in structures :
+				futures.append((name, self.scorer.submit(path, data)))
+		except queue.Full :
+			#The structures already queued are still scored, their results are dropped
+			self.send_json(503, {"error" : "Too many requests waiting to be scored"}, {"Retry-After" : "1"})
+			return
+
+		try :
+			responses = [get_response(name, future.result(timeout = REQUEST_TIMEOUT)) for name, future in futures]
+		except TimeoutError :
+			self.send_json(504, {"error" : f"No result after {REQUEST_TIMEOUT} s"})
+			return
+		except Exception as e :
+			self.send_json(500, {"error" : f"{type(e).__name__}: {e}"})
+			return
+		self.send_json(200, responses if isinstance(content, list) else responses[0])
+
+	def address_string(self):
+		#The clients of a Unix socket have no address
+		return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+	def log_message(self, format, *args):
+		return
+
+class ScoringHTTPServer(ThreadingHTTPServer) :
+
+	""" Class of the HTTP server listening on a TCP port, with a thread per connection """
+
+	request_queue_size = CONNECTION_BACKLOG
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer) :
+
+	""" Class of the HTTP server listening on a Unix socket, with a thread per connection like ScoringHTTPServer """
+
+	daemon_threads = True
+	request_queue_size = CONNECTION_BACKLOG
+
+def main():
+
+	""" Function called when this script is executed as a script and not imported as a library
+
+	Parameters
+	----------
+	None
+
+	Returns
+	-------
+	None
+	"""
+
+	path_data_dir = str(os.path.join(__file__, "data"))
+	socket_path = None
+	host = "127.0.0.1"
+	port = DEFAULT_PORT
+	workers = os.cpu_count() or 1
+	queue_size = QUEUE_SIZE
+	batch_size = BATCH_SIZE
+	inter_chain = False
+	root = None
+	usage = ("Usage :\n"
+		"python [Path_to_Server.py] [-h, --help] [--socket Path] [--root Dir] [--host Host] [--port N] [--workers N] [--queue N] [--batch N] [--inter-chain] [Path_to_data_directory]\n"
+		"\t[Path_to_Server.py] : Path to this scoring server script \n"
+		"\t[-h, --help] : Prints this help text \n"
+		"\t[--socket Path] : Listens on a Unix socket created at Path instead of a TCP port, only readable and writable by its owner \n"
+		"\t[--root Dir] : Directory the paths of the requests must be in, the relative paths start from it (default : the data directory) \n"
+		"\t[--host Host] : Address the server listens on (default : 127.0.0.1, only the local clients) \n"
+		"\t[--port N] : Port the server listens on (default : 8765) \n"
+		"\t[--workers N] : Number of scoring processes (default : number of CPUs) \n"
+		"\t[--queue N] : Number of requests waiting to be scored from which the new ones are refused with the status 503 (default : 256) \n"
+		"\t[--batch N] : Largest number of requests sent at once to a scoring process (default : 16) \n"
+		"\t[--inter-chain] : Also scores the distances between the atoms of different chains, for complexes \n"
+		"\t[Path_to_data_directory] : Path to the data directory\n"
+		"\t\tMust contain the model.bin file produced by the training or a directory containing the score csv files\n"
+		"\tRequests :\n"
+		"\t\tPOST /score with a JSON object {\"path\" : ...} or {\"pdb\" : ..., \"name\" : ...}, a JSON list of them or the text of a pdb file\n"
+		"\t\tGET /metrics for the counters, latencies and throughput of the server, GET /health")
+
+	i = 1
+	while (i < len(sys.argv)):
+		if (sys.argv[i] in ["-h","--help"]) :
+			print(usage)
+			return
+		elif (sys.argv[i] == "--inter-chain") :
+			inter_chain = True
+		elif (sys.argv[i] in ["--socket", "--host", "--root"] and i + 1 < len(sys.argv)) :
+			if (sys.argv[i] == "--socket") :
+				socket_path = sys.argv[i + 1]
+			elif (sys.argv[i] == "--root") :
+				root = sys.argv[i + 1]
+			else :
+				host = sys.argv[i + 1]
+			i += 1
+		elif (sys.argv[i] in ["--port", "--workers", "--queue", "--batch"] and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() and int(sys.argv[i + 1]) > 0) :
+			if (sys.argv[i] == "--port") :
+				port = int(sys.argv[i + 1])
+			elif (sys.argv[i] == "--workers") :
+				workers = int(sys.argv[i + 1])
+			elif (sys.argv[i] == "--queue") :
+				queue_size = int(sys.argv[i + 1])
+			else :
+				batch_size = int(sys.argv[i + 1])
+			i += 1
+		elif (os.path.exists(sys.argv[i])):
+			if (os.path.isabs(sys.argv[i])) :
+				path_data_dir = str(sys.argv[i])
+			else:
+				path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
+		else:
+			print(usage)
+			return
+		i += 1
+
+	if( not (os.path.exists(path_data_dir and os.path.isdir(path_data_dir)))):
+		print("Data directory not found.")
+		print(usage)
+		return
+	if (root is None) :
+		root = path_data_dir
+	if not (os.path.isdir(root)) :
+		print(f"Root directory {root} not found.")
+		print(usage)
+		return
+
+	#The binary model written by the training is preferred to the score csv files
+	if (os.path.isfile(os.path.join(path_data_dir, MODEL_FILE_NAME))) :
+		model = ScoringModel.from_file(os.path.join(path_data_dir, MODEL_FILE_NAME))
+	else :
+		model = ScoringModel.from_dict(load_scores(path_data_dir))
+
+	scorer = ScoringServer(model, workers, inter_chain, queue_size, batch_size)
+	scorer.start()
+	ScoringRequestHandler.scorer = scorer
+	ScoringRequestHandler.root = os.path.realpath(root)
+	if (socket_path is not None) :
+		if (os.path.exists(socket_path)) :
+			os.remove(socket_path)
+		#The socket is created with the mode 0600, the other users cannot connect to it
+		umask = os.umask(0o177)
+		try :
+			server = UnixHTTPServer(socket_path, ScoringRequestHandler)
+		finally :
+			os.umask(umask)
+		address = socket_path
+	else :
+		server = ScoringHTTPServer((host, port), ScoringRequestHandler)
+		address = f"http://{host}:{server.server_address[1]}"
+	print(f"Scoring server listening on {address} with {workers} worker(s), scoring the files of {ScoringRequestHandler.root}", flush = True)
+
+	#SIGTERM stops the server like Ctrl+C
+	def stop_server(signum, frame):
+		raise KeyboardInterrupt
+	signal.signal(signal.SIGTERM, stop_server)
+	try :
+		server.serve_forever()
+	except KeyboardInterrupt :
+		pass
+	finally :
+		#The requests already received are scored before the server stops
+		signal.signal(signal.SIGTERM, signal.SIG_DFL)
+		server.server_close()
+		scorer.stop()
+		if (socket_path is not None and os.path.exists(socket_path)) :
+			os.remove(socket_path)
+	return
+
+#Call the main function when this script is executed as a script and not imported as a library
+if __name__ == "__main__" :
+	main()
@@ -0,0 +1,403 @@
+from Parsing import DEFAULT_ATOM_NAMES, AtomTable, parse_structure, list_structure_files, get_atom_names, split_atom_type
+from Distances import RESIDUES, get_residue_codes
+from Cache import get_file_hash
+from Profiling import RunProfiler
+from multiprocessing import Pool
+from functools import partial
+import numpy as np
+import struct
+import json
+import time
+import os
+import sys
+
+#First bytes of the corpus store files and version of their format
+STORE_MAGIC = b"RNASTORE"
+STORE_VERSION = 1
+
+#Path of the store packed from the pdb files of the data directory, relative to it
+STORE_FILE_NAME = os.path.join("cache", "corpus.store")
+
+#Each column starts on a multiple of this number of bytes of the file
+STORE_ALIGNMENT = 64
+
+#Type and number of values by atom of each column of the store
+STORE_COLUMNS = {
+	"coordinates" : ("<f4", 3),
+	"residues" : ("i1", 1),
+	"atom_names" : ("u1", 1),
+	"chain_ids" : ("S4", 1),
+	"positions" : ("<i4", 1),
+	"models" : ("<i4", 1)
+}
+
+#Residue name given back for each residue code, the unknown residues (-1) get the last one
+RESIDUE_NAMES = np.array(list(RESIDUES) + ["N"], dtype = "U1")
+
+#Stores opened by this process, the processes of a Pool open each store once
+open_stores = dict()
+
+def get_store(path : str):
+
+	""" Function opening a store once for this process
+
+	Parameters
+	----------
+	path : str
+		String containing the path to the store file
+
+	Returns
+	-------
+	store : CorpusStore
+		Store of the file, shared by all the calls of this process with the same path
+	"""
+
+	if not (path in open_stores) :
+		open_stores[path] = CorpusStore(path)
+	return open_stores[path]
+
+class CorpusStore :
+
+	""" Class reading the atoms of a corpus of structures packed in a single memory-mapped file
+
+	The atoms of all the structures are stored in columns (float32 coordinates, int8 residue codes, ...) one after the other,
+	the atoms of a structure being the slice between its offset and the next one, so any structure is read without reading the others
+
+	Attributes
+	----------
+	path
+		String containing the path to the store file
+	names
+		List of the paths to the structure files packed, in the order of the store
+	hashes
+		List of the hash of the content of each structure file (see Cache.get_file_hash), when it was packed
+	atom_names
+		List of the names of the atoms packed
+	offsets
+		Array of the index of the first atom of each structure, followed by the number of atoms
+	columns
+		Dictionary of the read-only array of each column (see STORE_COLUMNS), mapped from the file
+	"""
+
+	def __init__(self, path : str):
+		with open(path, "rb") as file :
+			if (file.read(len(STORE_MAGIC)) != STORE_MAGIC) :
+				raise ValueError(f"{path} is not a corpus store")
+			version, header_length = struct.unpack("<II", file.read(8))
+			if (version != STORE_VERSION) :
+				raise ValueError(f"{path} uses the store format version {version}, version {STORE_VERSION} expected")
+			header = json.loads(file.read(header_length))
+
+		self.path = path
+		self.names = header["names"]
+		self.hashes = header["hashes"]
+		self.atom_names = header["atom_names"]
+		self.index = {name : k for k, name in enumerate(self.names)}
+		self.data = np.memmap(path, dtype = np.uint8, mode = "r")
+		columns = {name : np.frombuffer(self.data, dtype = dtype, count = int(np.prod(shape)), offset = offset).reshape(shape) for name, (dtype, offset, shape) in header["columns"].items()}
+		self.offsets = columns.pop("offsets")
+		self.columns = columns
+
+	def __len__(self):
+		return len(self.names)
+
+	def get_table(self, structure):
+
+		""" Method reading the atoms of a structure
+
+		Parameters
+		----------
+		structure
+			Index of the structure in the store or path to its file, as listed in names
+
+		Returns
+		-------
+		table : AtomTable
+			Atoms of the structure, giving the same chains as the table parsed from its file (see Parsing.AtomTable)
+			The residue names are the letters of the residue codes, which is all the chains and the atom types use
+		"""
+
+		k = self.index[structure] if isinstance(structure, str) else int(structure)
+		start, end = int(self.offsets[k]), int(self.offsets[k + 1])
+		c = {name : column[start:end] for name, column in self.columns.items()}
+		return AtomTable(c["chain_ids"].astype("U4"), RESIDUE_NAMES[c["residues"]], np.array(self.atom_names, dtype = "U4")[c["atom_names"]], c["positions"], c["coordinates"], c["models"])
+
+	def iter_tables(self):
+
+		""" Generator reading the atoms of each structure in the order of the store
+
+		Yields
+		------
+		name, table
+			Path to the structure file and AtomTable of its atoms
+		"""
+
+		for k, name in enumerate(self.names) :
+			yield name, self.get_table(k)
+
+	def has_atom_types(self, atom_types):
+
+		""" Method checking that the atoms of some atom types were packed
+
+		Parameters
+		----------
+		atom_types
+			List of atom types, see Parsing.AtomTable.select
+
+		Returns
+		-------
+		missing
+			List of the names of the atoms of the atom types which are not in the store, empty if the store has all of them
+		"""
+
+		return [name for name in get_atom_names(atom_types) if not (name in self.atom_names)]
+
+def save_store(path : str, names, hashes, tables, atom_names = DEFAULT_ATOM_NAMES):
+
+	""" Function writing the atoms of structures in a store file, read with CorpusStore
+
+	The file starts with the STORE_MAGIC string, the format version and the length of a JSON header holding the names, the hashes, the atom names
+	and the type, offset and shape of each column, followed by the offsets of the structures and the columns, each one aligned on STORE_ALIGNMENT bytes
+
+	Parameters
+	----------
+	path : str
+		String containing the path to the store file, replaced once the new one is complete
+	names, hashes
+		Lists of the path and the hash of the file of each structure
+	tables
+		List of the AtomTable of each structure
+	atom_names
+		Names of the atoms of the tables
+
+	Returns
+	-------
+	None
+	"""
+
+	atom_names = list(atom_names)
+	offsets = np.zeros(len(tables) + 1, dtype = "<i8")
+	offsets[1:] = np.cumsum([len(table) for table in tables])
+
+	atom_name_codes = []
+	for table in tables :
+		codes = np.zeros(len(table), dtype = np.uint8)
+		for k, name in enumerate(atom_names) :
+			codes[table.atom_names == name] = k
+		atom_name_codes.append(codes)
+
+	empty = AtomTable([], [], [], [], [])
+	columns = {
+		"offsets" : offsets,
+		"coordinates" : np.concatenate([table.coordinates for table in tables] or [empty.coordinates]),
+		"residues" : np.concatenate([get_residue_codes(table.residue_names.tolist()) for table in tables] or [np.zeros(0, dtype = np.int8)]),
+		"atom_names" : np.concatenate(atom_name_codes or [np.zeros(0, dtype = np.uint8)]),
+		"chain_ids" : np.concatenate([table.chain_ids for table in tables] or [empty.chain_ids]),
+		"positions" : np.concatenate([table.positions for table in tables] or [empty.positions]),
+		"models" : np.concatenate([table.models for table in tables] or [empty.models])
+	}
+	columns = {name : np.ascontiguousarray(column, dtype = "<i8" if name == "offsets" else STORE_COLUMNS[name][0]) for name, column in columns.items()}
+
+	#The offsets of the columns depend on the length of the header, which holds them, so it is padded to a fixed multiple of STORE_ALIGNMENT
+	header = {"names" : list(names), "hashes" : list(hashes), "atom_names" : atom_names, "columns" : {name : [column.dtype.str, 0, list(column.shape)] for name, column in columns.items()}}
+	prefix_length = len(STORE_MAGIC) + 8
+	header_length = len(json.dumps(header).encode()) + 64 * len(columns)
+	header_length += -(prefix_length + header_length) % STORE_ALIGNMENT
+	offset = prefix_length + header_length
+	for name, column in columns.items() :
+		header["columns"][name][1] = offset
+		offset += column.nbytes + (-column.nbytes % STORE_ALIGNMENT)
+	encoded = json.dumps(header).encode()
+	encoded += b" " * (header_length - len(encoded))
+
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "wb") as file :
+		file.write(STORE_MAGIC)
+		file.write(struct.pack("<II", STORE_VERSION, header_length))
+		file.write(encoded)
+		for column in columns.values() :
+			file.write(column.tobytes())
+			file.write(b"\0" * (-column.nbytes % STORE_ALIGNMENT))
+	os.replace(tmp_path, path)
+	return
+
+def parse_file(filename : str, atom_names = DEFAULT_ATOM_NAMES):
+
+	""" Function parsing a structure file for the store, run by the packing processes
+
+	Parameters
+	----------
+	filename : str
+		String containing the path to the structure file
+	atom_names
+		Names of the atoms kept
+
+	Returns
+	-------
+	filename, hash, table, elapsed
+		Path and hash of the file, AtomTable of its atoms and time in seconds spent on the file
+	"""
+
+	start = time.perf_counter()
+	return filename, get_file_hash(filename), parse_structure(filename, atom_names), time.perf_counter() - start
+
+def pack(filenames, path : str, atom_names = DEFAULT_ATOM_NAMES, workers : int = 1, verbose : bool = False, reuse : bool = True):
+
+	""" Function packing the atoms of structure files in a store, in parallel if asked
+
+	The structures of the store previously saved at the same path with the same atom names are kept when their file did not change,
+	only the files added or modified are parsed
+
+	Parameters
+	----------
+	filenames
+		List of the paths to the structure files, kept as absolute paths in the store
+	path : str
+		String containing the path to the store file
+	atom_names
+		Names of the atoms packed, see Parsing.get_atom_names to get them from atom types
+	workers : int
+		Number of processes parsing the files, the files are parsed in this process if 1
+	verbose : bool
+		Boolean used to print the time spent on each file parsed
+	reuse : bool
+		Boolean used to take the unchanged structures from the previous store, all the files are parsed if False
+
+	Returns
+	-------
+	parsed, reused
+		Numbers of files parsed and of files taken from the previous store
+	"""
+
+	atom_names = list(dict.fromkeys(atom_names))
+	names = [os.path.abspath(f) for f in filenames]
+	hashes = [get_file_hash(f) for f in names]
+
+	previous = dict()
+	if (reuse and os.path.isfile(path)) :
+		try :
+			store = CorpusStore(path)
+			if (store.atom_names == atom_names) :
+				previous = {h : k for k, h in enumerate(store.hashes)}
+		except (OSError, KeyError, ValueError) :
+			#Unreadable store, all the files are parsed again
+			previous = dict()
+
+	tables = [store.get_table(previous[h]) if h in previous else None for h in hashes]
+	to_parse = [name for name, table in zip(names, tables) if table is None]
+	parse = partial(parse_file, atom_names = atom_names)
+
+	index = {name : k for k, name in enumerate(names)}
+	def collect(results) :
+		for filename, h, table, elapsed in results :
+			tables[index[filename]] = table
+			if (verbose) :
+				print(f"{os.path.basename(filename)} : {elapsed:.3f} s")
+
+	if (workers > 1 and len(to_parse) > 1) :
+		with Pool(min(workers, len(to_parse))) as pool :
+			collect(pool.imap_unordered(parse, to_parse))
+	else :
+		collect(map(parse, to_parse))
+
+	save_store(path, names, hashes, tables, atom_names)
+	open_stores.pop(path, None)
+	return len(to_parse), len(names) - len(to_parse)
+
+def main():
+
+	""" Function called when this script is executed as a script and not imported as a library
+
+	Parameters
+	----------
+	None
+
+	Returns
+	-------
+	None
+	"""
+
+	path_data_dir = str(os.path.join(__file__, "data"))
+	output_path = None
+	atom_types = None
+	workers = os.cpu_count() or 1
+	stats_path = None
+	profile_path = None
+	usage = ("Usage :\n"
+		"python [Path_to_Store.py] [-h, --help] [--output File] [--atoms Type,Type,...] [--workers N] [--stats File] [--profile File] [Path_to_data_directory]\n"
+		"\t[Path_to_Store.py] : Path to this packing script \n"
+		"\t[-h, --help] : Prints this help text \n"
+		"\t[--output File] : Store file written (default : [Path_to_data_directory]/cache/corpus.store) \n"
+		"\t[--atoms Type,Type,...] : Atom types whose atoms are packed, see Training.py --atoms (default : C3') \n"
+		"\t[--workers N] : Number of processes parsing the pdb files (default : number of CPUs) \n"
+		"\t[--stats File] : Writes a JSON report of the wall time, CPU time and peak memory of each stage \n"
+		"\t[--profile File] : Profiles the run with cProfile and writes the profile to File (readable with pstats), the hottest functions are added to the --stats report \n"
+		"\t[Path_to_data_directory] : Path to the data directory\n"
+		"\t\tMust contain a directory containing pdb files, packed in a single memory-mapped file read by Training.py --store\n"
+		"\t\tThe files not modified since the previous packing are taken from the previous store")
+
+	i = 1
+	while (i < len(sys.argv)):
+		if (sys.argv[i] in ["-h","--help"]) :
+			print(usage)
+			return
+		elif (sys.argv[i] == "--atoms" and i + 1 < len(sys.argv)) :
+			atom_types = list(dict.fromkeys(t for t in sys.argv[i + 1].split(",") if t))
+			if not (atom_types) or any("" in split_atom_type(t) or len(split_atom_type(t)) > 2 for t in atom_types) :
+				print(f"Invalid atom types {sys.argv[i + 1]}")
+				print(usage)
+				return
+			i += 1
+		elif (sys.argv[i] in ["--output", "--stats", "--profile"] and i + 1 < len(sys.argv)) :
+			if (sys.argv[i] == "--output") :
+				output_path = sys.argv[i + 1]
+			elif (sys.argv[i] == "--stats") :
+				stats_path = sys.argv[i + 1]
+			else :
+				profile_path = sys.argv[i + 1]
+			i += 1
+		elif (sys.argv[i] == "--workers" and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() and int(sys.argv[i + 1]) > 0) :
+			workers = int(sys.argv[i + 1])
+			i += 1
+		elif (os.path.exists(sys.argv[i])):
+			if (os.path.isabs(sys.argv[i])) :
+				path_data_dir = str(sys.argv[i])
+			else:
+				path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
+		else:
+			print(usage)
+			return
+		i += 1
+
+	print(path_data_dir)
+
+	if( not (os.path.exists(path_data_dir and os.path.isdir(path_data_dir)))):
+		print("Data directory not found.")
+		print(usage)
+		return
+
+	if (output_path is None) :
+		output_path = os.path.join(path_data_dir, STORE_FILE_NAME)
+	os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok = True)
+
+	profiler = RunProfiler("Store.py", profile = profile_path is not None)
+	profiler.details["workers"] = workers
+
+	with profiler.stage("list_files") :
+		pdb_file_names = list_structure_files(os.path.join(path_data_dir,"pdb*/*"))
+
+	start = time.perf_counter()
+	with profiler.stage("pack") :
+		parsed, reused = pack(pdb_file_names, output_path, get_atom_names(atom_types) if atom_types is not None else DEFAULT_ATOM_NAMES, workers, verbose = True)
+	print(f"{parsed} files parsed with {workers} worker(s), {reused} taken from the previous store, in {time.perf_counter() - start:.3f} s")
+	print(f"{len(pdb_file_names)} structures packed in {output_path} ({os.path.getsize(output_path) / (1 << 20):.2f} MB)")
+	profiler.details.update({"files" : len(pdb_file_names), "files_parsed" : parsed, "files_reused" : reused, "store_size" : os.path.getsize(output_path)})
+
+	profiler.stop()
+	profiler.save(stats_path, profile_path)
+
+	return
+
+#Call the main function when this script is executed as a script and not imported as a library
+if __name__ == "__main__" :
+	main()
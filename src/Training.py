@@ -1,13 +1,135 @@
-from importlib.resources import path
-from math import sqrt, log
-from Utility_script import save_to_csv
-import glob
+from math import log
+from Utility_script import save_to_csv, save_to_binary, get_bootstrap_path, MODEL_FILE_NAME
+from multiprocessing import Pool
+from functools import partial
+from Cache import TrainingCache, get_cache_parameters
+from Profiling import RunProfiler, get_peak_memory, get_files_size, get_throughput
+from Parsing import DEFAULT_ATOM_TYPE, PREFETCH_THREADS, get_chains, list_structure_files, parse_structure, get_atom_names, split_atom_type, imap_prefetched
+from Model import ScoringModel, get_model_file_name
+from Store import CorpusStore, get_store
+from Distances import PAIRS, MIN_SEPARATION, DEFAULT_BINS, BinSpec, count_distances_by_pairs, iter_distances_by_pairs, add_counts_to_distribution, add_values_to_distribution
+import numpy as np
 import os
 import sys
+import time
 
-from Plotting import plot_distrib, plot_distrib_by_pairs
+#Percentiles of the scores saved by the bootstrap, the first and last ones bound the interval drawn by Plotting.py
+BOOTSTRAP_PERCENTILES = (2.5, 50, 97.5)
 
-def get_interatomic_distances_distribution_by_pairs(filename, distances_distribution_by_pairs = dict(),round_down = True):
+#Number of bootstrap replicates whose counts are summed together, which bounds the memory used by the weights and the counts of a block
+BOOTSTRAP_BLOCK = 256
+
+class DistanceHistogram :
+
+	""" Class accumulating the counts of the interatomic distances rounded down of pdb files for each pair of nucleosides
+
+	The counts are kept in a single array, so the memory used does not depend on the number of files added
+
+	Attributes
+	----------
+	counts
+		Array of shape (len(PAIRS), bins.nb_bins) of the counts of the distances of the files added (see Distances.count_distances_by_pairs)
+	nb_files
+		Number of files added, including the ones of the histograms merged
+	bins
+		BinSpec of the counts
+	legacy_pairs, method
+		See get_interatomic_distances_distribution_by_pairs
+	"""
+
+	def __init__(self, bins : BinSpec = DEFAULT_BINS, legacy_pairs : bool = False, method : str = "auto"):
+		self.bins = bins
+		self.legacy_pairs = legacy_pairs
+		self.method = method
+		self.counts = np.zeros((len(PAIRS), bins.nb_bins), dtype = np.int64)
+		self.nb_files = 0
+
+	def add(self, filename : str, stats : dict = None):
+
+		""" Method adding the distances of a pdb file to the counts
+
+		Parameters
+		----------
+		filename : str
+			String containing the path to the pdb file
+		stats : dict
+			See Distances.count_distances_by_pairs
+
+		Returns
+		-------
+		histogram : DistanceHistogram
+			This histogram, so that the calls can be chained
+		"""
+
+		return self.add_counts(count_distances_by_pairs(get_chains(filename, stats), self.bins, legacy_pairs = self.legacy_pairs, method = self.method, stats = stats))
+
+	def add_counts(self, counts, nb_files : int = 1):
+
+		""" Method adding counts computed elsewhere (get_distances_counts, a cache, ...) to the counts
+
+		Parameters
+		----------
+		counts
+			Array of shape (len(PAIRS), bins.nb_bins) of counts with the bins of this histogram
+		nb_files : int
+			Number of files the counts come from
+
+		Returns
+		-------
+		histogram : DistanceHistogram
+			This histogram
+		"""
+
+		self.counts += counts
+		self.nb_files += nb_files
+		return self
+
+	def merge(self, other):
+
+		""" Method adding the counts of another histogram, the counts of several histograms can be merged in any order
+
+		Parameters
+		----------
+		other : DistanceHistogram
+			Histogram with the same bins
+
+		Returns
+		-------
+		histogram : DistanceHistogram
+			This histogram
+		"""
+
+		if (other.bins != self.bins) :
+			raise ValueError(f"Cannot merge histograms with the bins {other.bins} and {self.bins}")
+		return self.add_counts(other.counts, other.nb_files)
+
+	def reset(self):
+
+		""" Method emptying the histogram
+
+		Returns
+		-------
+		histogram : DistanceHistogram
+			This histogram
+		"""
+
+		self.counts[:] = 0
+		self.nb_files = 0
+		return self
+
+	def get_distribution(self):
+
+		""" Method converting the counts to a new dictionary of distributions by pairs
+
+		Returns
+		-------
+		distances_distribution_by_pairs
+			Dictionary containing the distribution of distances for each pair of nucleosides, see get_interatomic_distances_distribution_by_pairs
+		"""
+
+		return add_counts_to_distribution(self.counts, dict(), self.bins)
+
+def get_interatomic_distances_distribution_by_pairs(filename, distances_distribution_by_pairs = None, round_down = True, legacy_pairs = False, method = "auto", bins = DEFAULT_BINS):
 
 	""" Function parsing a pdb file to get the distribution of interatomic distances between each possible pair of nucleosides
 
@@ -16,11 +138,21 @@ def get_interatomic_distances_distribution_by_pairs(filename, distances_distribu
 	filename
 		String containing the path to the pdb file that must be parsed
 	distances_distribution_by_pairs
-		Dictionary in which the distribution of distances by pairs is stored
-		Pass the same dictionary for multiple files to get the distribution across all of them
+		Dictionary in which the distribution of distances by pairs is stored, a new one is created if None
+		Pass the same dictionary for multiple files to get the distribution across all of them, or use a DistanceHistogram
 	round_down
 		Boolean used to know if the distances should be rounded down or not
 		True should be used for the training and False for the scoring
+	legacy_pairs
+		Boolean used to select the pairs of atoms exactly like the former double loop did
+		Only differs from the default when the residue numbers of a chain are not increasing (merged models, ...)
+		True should be used to reproduce score files produced before the NumPy distance engine
+	method
+		String selecting the neighbour search used to find the pairs of atoms below the cutoff ("auto", "brute" or "grid")
+		See Distances.iter_distance_blocks
+	bins
+		BinSpec of the distances rounded down, the labels of the bins are used as keys (by default the integers from 1 to 20 included)
+		When the distances are not rounded down, only the ones between bins.min and bins.max included are kept
 
 	Returns
 	-------
@@ -29,93 +161,251 @@ def get_interatomic_distances_distribution_by_pairs(filename, distances_distribu
 	
 	"""
 
-	lines = []
-
-	#Gets the lines from the "filename" file and strips them of the Carriage Return at the end of the line
-	with open(filename) as f:
-		lines = [line.rstrip() for line in f]
-
-	#Keeps only the lines containing atoms (Line starts with "ATOM")
-	atom_lines = [line for line in lines if line[0:6].replace(" ", "") == "ATOM"]
-	
-	#Keeps only the lines with C3' atoms
-	C3_lines = [line for line in atom_lines if line[12:16].replace(" ", "") == "C3'"]
-	
-	#Get the set of chain IDs in the file
-	chain_ids = set([line[21] for line in C3_lines])
-
-	#Dictionnary for parsed lines for each chain in the file
-	chain_lines = dict()
-	for id in chain_ids :
-		chain_lines[id] = []
+	if (distances_distribution_by_pairs is None) :
+		distances_distribution_by_pairs = dict()
 
-	#Parses the lines from "C3_lines" 
-	for line in C3_lines :
-		chain_lines[line[21]].append([line[17:20].replace(" ", ""), int(line[22:26].replace(" ", "")), float(line[30:38].replace(" ", "")), float(line[38:46].replace(" ", "")), float(line[46:54].replace(" ", ""))])
-		
-	#Dictionnary of interatomic distances for each chain in the file
-	distances_by_chain = dict()
-	for key, value in chain_lines.items() :
-		distances_by_chain[key] = []
-		for i in range(0,len(value)-1) :
-			for j in range(1,len(value)) :
-				#Residues of the two atoms ("A", "C", "T", "G")
-				r1 = chain_lines[key][i][0][-1]
-				r2 = chain_lines[key][j][0][-1]
-
-				#Positions of the two atoms in the chain
-				pos1 = chain_lines[key][i][1]
-				pos2 = chain_lines[key][j][1]
-
-				#Positions of the two atoms on the X axis
-				x1 = chain_lines[key][i][2]
-				x2 = chain_lines[key][j][2]
-
-				#Positions of the two atoms on the Y axis
-				y1 = chain_lines[key][i][3]
-				y2 = chain_lines[key][j][3]
-
-				#Positions of the two atoms on the Z axis
-				z1 = chain_lines[key][i][4]
-				z2 = chain_lines[key][j][4]
-				
-				#Calculates the interatomic distance using the X, Y and Z positions of the two atoms
-				if ( (pos2 - pos1) >= 3) :
-					distance = sqrt( ((x1-x2)**2) + ((y1-y2)**2) + ((z1-z2)**2) )
-					distances_by_chain[key].append( [r1,r2,pos1,pos2,distance] )
-				
-
-	distances_by_pairs = dict()
-	for key, value in distances_by_chain.items() :
-		for l in value :
-			pair = ""
-			for r in sorted(l[:2]) :
-				pair += r
-				
-			if not ("N" in [r for r in pair]):
-				if not (pair in distances_by_pairs.keys()) :
-					distances_by_pairs[pair] = []
-			
-			
-				distances_by_pairs[pair].append(l[2:])
-	
-	for key, value in distances_by_pairs.items() :
-		if not (key in distances_distribution_by_pairs.keys() ):
-			distances_distribution_by_pairs[key] = dict()
-		for l in value :
-			if (round_down) :
-				d = int(l[-1])
-			else :
-				d = l[-1]
-			if (d >=0 and d <=20) :
-				if not (d in distances_distribution_by_pairs[key].keys()) :
-					distances_distribution_by_pairs[key][d] = 0
-				distances_distribution_by_pairs[key][d] += 1
+	if (round_down) :
+		add_counts_to_distribution(DistanceHistogram(bins, legacy_pairs, method).add(filename).counts, distances_distribution_by_pairs, bins)
+	else :
+		for pairs, distances in iter_distances_by_pairs(get_chains(filename), bins.max, legacy_pairs = legacy_pairs, method = method) :
+			kept = distances >= bins.min
+			pairs, distances = pairs[kept], distances[kept]
+			for p in np.unique(pairs).tolist() :
+				pair = PAIRS[p]
+				if not (pair in distances_distribution_by_pairs.keys()) :
+					distances_distribution_by_pairs[pair] = dict()
+				values, nb = np.unique(distances[pairs == p], return_counts = True)
+				for d, count in zip(values.tolist(), nb.tolist()) :
+					distances_distribution_by_pairs[pair][d] = distances_distribution_by_pairs[pair].get(d, 0) + count
 		
 	#print(distances_distribution_by_pairs,"\n")
 			
 	return distances_distribution_by_pairs
 
+def count_atom_types(table, atom_types, bins = DEFAULT_BINS, legacy_pairs = False, method = "auto", stats = None):
+
+	""" Function computing the counts of the interatomic distances of several atom types from a single parsed structure
+
+	The counts of a cross atom type ("C3'-P") are the counts of the atoms of both types minus the counts of the atoms of each type,
+	which leaves the distances between an atom of each type, for the unordered pair of their residues
+
+	Parameters
+	----------
+	table
+		Parsing.AtomTable of the structure, holding the atoms of all the atom types (see Parsing.get_atom_names)
+	atom_types
+		List of the atom types, see Parsing.AtomTable.select
+	bins, legacy_pairs, method
+		See get_interatomic_distances_distribution_by_pairs, the counts of the cross atom types are only exact without legacy_pairs
+	stats : dict
+		See Distances.count_distances_by_pairs
+
+	Returns
+	-------
+	counts
+		Array of shape (len(atom_types), len(PAIRS), bins.nb_bins) of the counts of each atom type (see Distances.count_distances_by_pairs)
+	"""
+
+	#The atoms of all the models are put in the chains of their chain ID, like get_chains does for the training
+	counts_by_type = dict()
+	def get_counts(atom_type) :
+		if not (atom_type in counts_by_type) :
+			counts_by_type[atom_type] = count_distances_by_pairs(table.get_chains(atom_type), bins, legacy_pairs = legacy_pairs, method = method, stats = stats)
+		return counts_by_type[atom_type]
+
+	counts = np.zeros((len(atom_types), len(PAIRS), bins.nb_bins), dtype = np.int64)
+	for k, atom_type in enumerate(atom_types) :
+		counts[k] = get_counts(atom_type)
+		if (len(split_atom_type(atom_type)) > 1) :
+			for part in split_atom_type(atom_type) :
+				counts[k] -= get_counts(part)
+	return counts
+
+def get_distances_counts(filename, bins = DEFAULT_BINS, legacy_pairs = False, method = "auto", statistics = False, atom_types = None, store = None, data = None):
+
+	""" Function parsing a pdb file to get the counts of the interatomic distances in bins for each pair of nucleosides
+
+	Used by the training processes, the counts of several files are merged with merge_counts
+
+	Parameters
+	----------
+	filename
+		String containing the path to the pdb file that must be parsed
+	bins, legacy_pairs, method
+		See get_interatomic_distances_distribution_by_pairs
+	statistics
+		Boolean used to also return the statistics of the file, measured in the process which parsed it
+	atom_types
+		List of the atom types whose distances are counted from a single parse of the file (see count_atom_types), None to count the C3' atoms only
+	store
+		String containing the path to a corpus store (see Store.py) from which the atoms of the file are read instead of parsing it, None to parse the file
+	data
+		Content of the file already read (see Parsing.read_structure_data), or the exception raised while reading it, None to read the file
+
+	Returns
+	-------
+	filename, counts, elapsed
+		Path to the file, array of the counts (see Distances.count_distances_by_pairs, or count_atom_types with atom_types) and time in seconds spent on the file
+		If statistics is True, followed by the dictionary of the wall time, CPU time, peak memory and counters (see Profiling.COUNTERS) of the file
+	"""
+
+	start = time.perf_counter()
+	start_cpu = time.process_time()
+	stats = dict() if statistics else None
+	if (isinstance(data, Exception)) :
+		raise data
+	if (store is not None) :
+		table = get_store(store).get_table(filename)
+		if (atom_types is None) :
+			counts = count_distances_by_pairs(table.get_chains(DEFAULT_ATOM_TYPE), bins, legacy_pairs = legacy_pairs, method = method, stats = stats)
+		else :
+			counts = count_atom_types(table, atom_types, bins, legacy_pairs, method, stats)
+	elif (atom_types is None) :
+		chains = get_chains(filename, stats) if data is None else parse_structure(filename, stats = stats, data = data).get_chains()
+		counts = count_distances_by_pairs(chains, bins, legacy_pairs = legacy_pairs, method = method, stats = stats)
+	else :
+		counts = count_atom_types(parse_structure(filename, get_atom_names(atom_types), stats, data), atom_types, bins, legacy_pairs, method, stats)
+	elapsed = time.perf_counter() - start
+	if not (statistics) :
+		return filename, counts, elapsed
+	return filename, counts, elapsed, {"wall" : elapsed, "cpu" : time.process_time() - start_cpu, "peak_memory" : get_peak_memory(), **stats}
+
+def get_prefetched_counts(item, count_file):
+
+	""" Function counting the distances of a file read ahead, run by the counting processes of the pipelined mode
+
+	Parameters
+	----------
+	item
+		Tuple of the path to the file and of its content, yielded by Parsing.iter_structure_data
+	count_file
+		get_distances_counts with its parameters set
+
+	Returns
+	-------
+	result
+		See get_distances_counts
+	"""
+
+	filename, data = item
+	return count_file(filename, data = data)
+
+def merge_counts(counts, other):
+
+	""" Function merging two arrays of counts produced by get_distances_counts
+
+	The merge is a sum, so the counts of the files can be merged in any order
+
+	Parameters
+	----------
+	counts, other
+		Arrays of counts of the same shape
+
+	Returns
+	-------
+	merged
+		Array of the counts of both arrays
+	"""
+
+	return counts + other
+
+def report_distances_counts(result, verbose = False, profiler = None):
+
+	""" Function printing and recording the result of get_distances_counts for a file
+
+	Parameters
+	----------
+	result
+		Tuple returned by get_distances_counts
+	verbose, profiler
+		See iter_distances_counts
+
+	Returns
+	-------
+	filename, counts, elapsed
+		See get_distances_counts, without the statistics
+	"""
+
+	filename, counts, elapsed = result[:3]
+	if (profiler is not None) :
+		profiler.add_file(filename, result[3])
+	if (verbose) :
+		print(f"{os.path.basename(filename)} : {elapsed:.3f} s")
+	return filename, counts, elapsed
+
+def iter_distances_counts(filenames, workers = 1, bins = DEFAULT_BINS, legacy_pairs = False, method = "auto", verbose = False, profiler = None, atom_types = None, store = None, prefetch = 0, io_threads = PREFETCH_THREADS):
+
+	""" Generator parsing pdb files, in parallel if asked, to get the counts of interatomic distances of each file
+
+	Parameters
+	----------
+	filenames
+		List of the paths to the pdb files
+	workers
+		Number of processes parsing the files, the files are parsed in this process if 1
+	bins, legacy_pairs, method
+		See get_interatomic_distances_distribution_by_pairs
+	verbose
+		Boolean used to print the time spent on each file
+	profiler
+		Profiling.RunProfiler to which the statistics of each file are added, None to collect no statistics
+	atom_types, store
+		See get_distances_counts, the processes open the store once and read the structures from it
+	prefetch
+		Number of files read ahead by threads while the current ones are counted (see Parsing.imap_prefetched), 0 to let each process read its files
+		Not used with a store, whose structures are not read from files
+	io_threads
+		Number of threads reading the files ahead
+
+	Yields
+	------
+	filename, counts, elapsed
+		See get_distances_counts, the files are yielded in the order in which they are parsed
+	"""
+
+	count_file = partial(get_distances_counts, bins = bins, legacy_pairs = legacy_pairs, method = method, statistics = profiler is not None, atom_types = atom_types, store = store)
+
+	if (prefetch > 0 and store is None) :
+		#The files are read and decompressed by threads of this process, and sent to the counting processes as they are read
+		count_data = partial(get_prefetched_counts, count_file = count_file)
+		if (workers > 1 and len(filenames) > 1) :
+			with Pool(min(workers, len(filenames))) as pool :
+				for result in imap_prefetched(count_data, filenames, pool, prefetch, io_threads) :
+					yield report_distances_counts(result, verbose, profiler)
+		else :
+			for result in imap_prefetched(count_data, filenames, None, prefetch, io_threads) :
+				yield report_distances_counts(result, verbose, profiler)
+	elif (workers > 1 and len(filenames) > 1) :
+		with Pool(min(workers, len(filenames))) as pool :
+			for result in pool.imap_unordered(count_file, filenames) :
+				yield report_distances_counts(result, verbose, profiler)
+	else :
+		for result in map(count_file, filenames) :
+			yield report_distances_counts(result, verbose, profiler)
+
+def get_distances_distribution_from_files(filenames, workers = 1, bins = DEFAULT_BINS, legacy_pairs = False, method = "auto", verbose = False):
+
+	""" Function computing the distribution of interatomic distances rounded down for each pair of nucleosides across pdb files
+
+	Parameters
+	----------
+	filenames
+		List of the paths to the pdb files
+	workers, bins, legacy_pairs, method, verbose
+		See iter_distances_counts
+
+	Returns
+	-------
+	distances_distribution_by_pairs
+		Dictionary containing the distribution of distances for each pair of nucleosides, identical whatever the number of workers
+	"""
+
+	histogram = DistanceHistogram(bins, legacy_pairs, method)
+	for filename, counts, elapsed in iter_distances_counts(filenames, workers, bins, legacy_pairs, method, verbose) :
+		histogram.add_counts(counts)
+
+	return histogram.get_distribution()
+
 def get_reference_distances_distribution(distances_distribution_by_pairs):
 
 	"""Function calculating the distances distribution across all pairs of nucleosides from a dictionary by pairs
@@ -187,7 +477,355 @@ def get_scores(distance_frequencies_by_pairs : dict, reference_distance_frequenc
 	return distance_scores_by_pairs
 
 
-def save_distribs(path_distrib_dir : str,distribs_by_pairs : dict):
+def get_frequencies_by_pairs(counts, bins : BinSpec = DEFAULT_BINS):
+
+	"""Function calculating the distances frequencies from an array of counts, like get_frequencies does for each dictionary
+
+	Parameters
+	----------
+	counts
+		Array of the counts of the distances in the bins, of shape (nb_bins,) or (nb_pairs, nb_bins)
+	bins : BinSpec
+		Bins of the counts
+
+	Returns
+	-------
+	frequencies
+		Array of the same shape as counts, each count is divided by the sum of the labels of the non empty bins of its row
+		like get_frequencies which divides by the sum of the keys of the dictionary
+	"""
+
+	N = np.where(counts > 0, bins.labels, 0).sum(axis = -1, keepdims = True)
+	return np.divide(counts, N, out = np.zeros(counts.shape, dtype = np.float64), where = N > 0)
+
+def get_scores_by_pairs(frequencies, reference_frequencies, counts):
+
+	"""Function calculating the distance scores from arrays of frequencies, like get_scores does for dictionaries
+
+	Parameters
+	----------
+	frequencies
+		Array of shape (nb_pairs, nb_bins) of the distance frequencies of each pair of nucleosides
+	reference_frequencies
+		Array of shape (nb_bins,) of the distance frequencies across all pairs of nucleosides
+	counts
+		Array of shape (nb_pairs, nb_bins) of the counts the frequencies were calculated from, the scores of the empty bins are 0
+
+	Returns
+	-------
+	scores
+		Array of shape (nb_pairs, nb_bins) of the distance scores, capped at 10
+	"""
+
+	scores = np.zeros(frequencies.shape, dtype = np.float64)
+	present = counts > 0
+	ratios = frequencies / np.where(reference_frequencies > 0, reference_frequencies, 1)
+	#math.log instead of np.log, whose vectorized implementation can differ in the last bit, to keep the scores of get_scores
+	scores[present] = np.minimum(-np.array([log(r) for r in ratios[present].tolist()]), 10)
+	return scores
+
+def get_model_arrays(total, bins : BinSpec = DEFAULT_BINS):
+
+	"""Function calculating the arrays of a model from the total counts of the distances of the training files
+
+	Parameters
+	----------
+	total
+		Array of shape (len(PAIRS), bins.nb_bins) of the counts of the distances of each pair of nucleosides
+	bins : BinSpec
+		Bins of the counts
+
+	Returns
+	-------
+	counts, frequencies, scores
+		Arrays of shape (len(PAIRS) + 1, bins.nb_bins) of the counts, frequencies and scores of each pair followed by the reference ones ("XX"), whose scores are 0
+	"""
+
+	counts = np.vstack([total, total.sum(axis = 0)])
+	frequencies = get_frequencies_by_pairs(counts, bins)
+	scores = np.vstack([get_scores_by_pairs(frequencies[:-1], frequencies[-1], counts[:-1]), np.zeros(bins.nb_bins)])
+	return counts, frequencies, scores
+
+def get_scoring_model(total, bins : BinSpec = DEFAULT_BINS):
+
+	"""Function building the ScoringModel of the total counts of the distances of the training files, without writing any file
+
+	Parameters
+	----------
+	total, bins
+		See get_model_arrays
+
+	Returns
+	-------
+	model : ScoringModel
+		Model holding the same scores as the model file saved by the training, the pairs without any count are unknown like in ScoringModel.from_file
+	"""
+
+	counts, frequencies, scores = get_model_arrays(total, bins)
+	return ScoringModel(scores[:-1], total.sum(axis = 1) > 0, bins)
+
+def get_bootstrap_scores(counts, bins : BinSpec = DEFAULT_BINS, nb_replicates : int = 1000, percentiles = BOOTSTRAP_PERCENTILES, seed : int = None):
+
+	"""Function estimating the uncertainty of the scores by resampling the training files with replacement
+
+	The counts of a replicate are the sum of the counts of the files weighted by the number of times each one is drawn,
+	so the replicates are computed by blocks as a product of a matrix of weights and of the counts of the files, without any training
+
+	Parameters
+	----------
+	counts
+		Array of shape (nb_files, len(PAIRS), bins.nb_bins) of the counts of each training file
+	bins : BinSpec
+		Bins of the counts
+	nb_replicates : int
+		Number of samples of the files drawn
+	percentiles
+		Iterable of the percentiles (between 0 and 100) of the scores of the replicates calculated for each bin
+	seed : int
+		Seed of the draws, None for different draws at each call
+
+	Returns
+	-------
+	scores, empty
+		Array of shape (len(percentiles), len(PAIRS), bins.nb_bins) of the percentiles of the scores of each bin
+		and array of shape (len(PAIRS), bins.nb_bins) of the fraction of the replicates in which each bin is empty (its score is then 0, like in the model)
+	"""
+
+	counts = np.asarray(counts, dtype = np.float64)
+	nb_files = counts.shape[0]
+	if (nb_files == 0 or nb_replicates < 1) :
+		raise ValueError("The bootstrap needs at least one file and one replicate")
+	counts = counts.reshape(nb_files, -1)
+	rng = np.random.default_rng(seed)
+
+	replicates = np.empty((nb_replicates, len(PAIRS), bins.nb_bins), dtype = np.float64)
+	empty = np.zeros((len(PAIRS), bins.nb_bins), dtype = np.int64)
+	for start in range(0, nb_replicates, BOOTSTRAP_BLOCK) :
+		nb = min(BOOTSTRAP_BLOCK, nb_replicates - start)
+		#Number of times each file is drawn in each replicate, the counts are exact in float64 far beyond the size of a corpus
+		weights = rng.multinomial(nb_files, np.full(nb_files, 1 / nb_files), size = nb).astype(np.float64)
+		total = (weights @ counts).reshape(nb, len(PAIRS), bins.nb_bins)
+		block = np.concatenate([total, total.sum(axis = 1, keepdims = True)], axis = 1)
+		frequencies = get_frequencies_by_pairs(block, bins)
+		reference = frequencies[:, -1:]
+		present = block[:, :-1] > 0
+		with np.errstate(divide = "ignore", invalid = "ignore") :
+			ratios = frequencies[:, :-1] / np.where(reference > 0, reference, 1)
+			replicates[start:start + nb] = np.where(present, np.minimum(-np.log(np.where(present, ratios, 1)), 10), 0)
+		empty += (~present).sum(axis = 0)
+
+	return np.percentile(replicates, list(percentiles), axis = 0), empty / nb_replicates
+
+class TrainingCorpus :
+
+	""" Class keeping in memory the counts of the distances of each training file, to build models on subsets of the files without parsing them again
+
+	The counts of a subset are the total counts minus the counts of the files left out, so the models of the folds of a cross-validation
+	cost one subtraction each instead of a training
+
+	Attributes
+	----------
+	filenames
+		List of the paths to the files, in the order of the rows of counts
+	counts
+		Array of shape (len(filenames), len(PAIRS), bins.nb_bins) of the counts of each file
+	total
+		Array of shape (len(PAIRS), bins.nb_bins) of the sum of the counts of all the files
+	bins
+		BinSpec of the counts
+	store
+		String containing the path to the corpus store the files are read from, None if they are parsed
+	"""
+
+	def __init__(self, filenames, counts, bins : BinSpec = DEFAULT_BINS, store : str = None):
+		self.filenames = list(filenames)
+		self.counts = np.asarray(counts, dtype = np.int64).reshape(len(self.filenames), len(PAIRS), bins.nb_bins)
+		self.total = self.counts.sum(axis = 0)
+		self.bins = bins
+		self.store = store
+
+	@classmethod
+	def from_files(cls, filenames, bins : BinSpec = DEFAULT_BINS, workers : int = 1, legacy_pairs : bool = False, method : str = "auto", store : str = None):
+
+		""" Method parsing the files, in parallel if asked, to get their counts
+
+		Parameters
+		----------
+		filenames
+			List of the paths to the structure files
+		bins, workers, legacy_pairs, method, store
+			See iter_distances_counts
+
+		Returns
+		-------
+		corpus : TrainingCorpus
+			Counts of the files, in the order of filenames whatever the order in which they were parsed
+		"""
+
+		index = {filename : k for k, filename in enumerate(filenames)}
+		counts = np.zeros((len(filenames), len(PAIRS), bins.nb_bins), dtype = np.int64)
+		for filename, file_counts, elapsed in iter_distances_counts(list(index.keys()), workers, bins, legacy_pairs, method, store = store) :
+			counts[index[filename]] = file_counts
+		return cls(index.keys(), counts, bins, store)
+
+	@classmethod
+	def from_store(cls, path : str, bins : BinSpec = DEFAULT_BINS, workers : int = 1, legacy_pairs : bool = False, method : str = "auto"):
+
+		""" Method reading the structures of a corpus store (see Store.py) to get their counts, without parsing any file
+
+		Parameters
+		----------
+		path : str
+			String containing the path to the store file
+		bins, workers, legacy_pairs, method
+			See iter_distances_counts
+
+		Returns
+		-------
+		corpus : TrainingCorpus
+			Counts of the structures, in the order of the store, with the paths to their files as filenames
+		"""
+
+		return cls.from_files(CorpusStore(path).names, bins, workers, legacy_pairs, method, os.path.abspath(path))
+
+	def __len__(self):
+		return len(self.filenames)
+
+	def get_model(self, excluded = None):
+
+		""" Method building the model of the files, except the ones excluded
+
+		Parameters
+		----------
+		excluded
+			Iterable of the indices of the files left out of the training, None to use all the files
+
+		Returns
+		-------
+		model : ScoringModel
+			See get_scoring_model
+		"""
+
+		total = self.total
+		if (excluded is not None) :
+			total = total - self.counts[np.asarray(list(excluded), dtype = np.intp)].sum(axis = 0)
+		return get_scoring_model(total, self.bins)
+
+	def get_folds(self, k : int, seed : int = None):
+
+		""" Method splitting the files into k folds of sizes differing by at most 1
+
+		Parameters
+		----------
+		k : int
+			Number of folds, between 2 and the number of files
+		seed : int
+			Seed of the shuffling of the files before they are split, None to split them in their order
+
+		Returns
+		-------
+		folds
+			List of k arrays of the indices of the files of each fold
+		"""
+
+		if not (2 <= k <= len(self)) :
+			raise ValueError(f"The number of folds must be between 2 and the number of files ({len(self)}), not {k}")
+		order = np.arange(len(self)) if seed is None else np.random.default_rng(seed).permutation(len(self))
+		return np.array_split(order, k)
+
+	def iter_folds(self, k : int, seed : int = None):
+
+		""" Generator building the model of each fold of a k-fold cross-validation
+
+		Parameters
+		----------
+		k, seed
+			See get_folds
+
+		Yields
+		------
+		held_out, model
+			Array of the indices of the files of the fold and ScoringModel trained on all the other files
+		"""
+
+		for held_out in self.get_folds(k, seed) :
+			yield held_out, self.get_model(held_out)
+
+	def get_bootstrap(self, nb_replicates : int = 1000, percentiles = BOOTSTRAP_PERCENTILES, seed : int = None):
+
+		""" Method calculating the percentiles of the scores of the models of samples of the files drawn with replacement
+
+		Parameters
+		----------
+		nb_replicates, percentiles, seed
+			See get_bootstrap_scores
+
+		Returns
+		-------
+		scores, empty
+			See get_bootstrap_scores
+		"""
+
+		return get_bootstrap_scores(self.counts, self.bins, nb_replicates, percentiles, seed)
+
+def train(filenames, bins : BinSpec = DEFAULT_BINS, workers : int = 1, legacy_pairs : bool = False, method : str = "auto", store : str = None):
+
+	""" Function training a model on structure files without writing the csv and model files
+
+	Parameters
+	----------
+	filenames
+		List of the paths to the structure files, as listed in the store if one is given
+	bins, workers, legacy_pairs, method, store
+		See iter_distances_counts
+
+	Returns
+	-------
+	model : ScoringModel
+		Model of the files, which scores chains with model.score and files with model.score_file, identical to the model saved by the training script
+	"""
+
+	return TrainingCorpus.from_files(filenames, bins, workers, legacy_pairs, method, store).get_model()
+
+def cross_validate(corpus : TrainingCorpus, k : int, seed : int = None, method : str = "auto"):
+
+	""" Function scoring each file with the model trained on the files of the other folds
+
+	Parameters
+	----------
+	corpus : TrainingCorpus
+		Counts of the files
+	k, seed
+		See TrainingCorpus.get_folds
+	method : str
+		See Distances.iter_distance_blocks
+
+	Returns
+	-------
+	energies
+		Dictionary associating the path to each file to its fold and its estimated Gibbs free energy (see ScoringModel.score_file)
+		The files with a pair of nucleosides absent from the other folds cannot be scored, they are left out and counted on the error output
+		The structures are read from the store of the corpus if it has one
+	"""
+
+	energies = dict()
+	left_out = dict()
+	for fold, (held_out, model) in enumerate(corpus.iter_folds(k, seed)) :
+		for f in held_out.tolist() :
+			try :
+				if (corpus.store is None) :
+					energy = model.score_file(corpus.filenames[f], method)
+				else :
+					energy = model.get_energy(get_store(corpus.store).get_table(corpus.filenames[f]).get_chains(DEFAULT_ATOM_TYPE), method)
+			except KeyError as e :
+				left_out[corpus.filenames[f]] = e.args[0]
+				continue
+			energies[corpus.filenames[f]] = (fold, energy)
+	if (left_out) :
+		print(f"{len(left_out)} of {len(corpus.filenames)} files left out of the cross-validation, their pairs of nucleosides are absent from the other folds : " + ", ".join(f"{os.path.basename(name)} ({pair})" for name, pair in left_out.items()), file = sys.stderr)
+	return energies
+
+def save_distribs(path_distrib_dir : str,distribs_by_pairs : dict, bins : BinSpec = DEFAULT_BINS):
 
 	"""Function saving the data produced in this script usin the save_to_csv function from Utility_script.py
 
@@ -197,6 +835,8 @@ def save_distribs(path_distrib_dir : str,distribs_by_pairs : dict):
 		String containing the path to the directory where the files for each pairs of nucleotides that contain the data of the dictionary passed as a parameter must be saved
 	distribs_by_pairs
 		Dictionary containing the distributions, frequencies or scores that must be saved
+	bins : BinSpec
+		Bins of the distributions, one line is written for each of them
 
 	Returns
 	-------
@@ -207,10 +847,83 @@ def save_distribs(path_distrib_dir : str,distribs_by_pairs : dict):
 		os.mkdir(path_distrib_dir)
 	for key, value in distribs_by_pairs.items() :
 		#print(os.path.join(path_distrib_dir,f"{path_distrib_dir.split('/')[-1]}_{key}.csv"))
-		save_to_csv(os.path.join(path_distrib_dir,f"{path_distrib_dir.split('/')[-1]}_{key}.csv"),value)
+		save_to_csv(os.path.join(path_distrib_dir,f"{path_distrib_dir.split('/')[-1]}_{key}.csv"),value, bins.get_labels())
 	return
 
 
+def save_model(path : str, counts, frequencies, scores, bins : BinSpec = DEFAULT_BINS, corpus_hash : str = "", atom_type : str = DEFAULT_ATOM_TYPE):
+
+	"""Function saving the distributions, frequencies and scores produced in this script in a single binary model file using the save_to_binary function from Utility_script.py
+
+	The array saved has a shape (3, len(PAIRS) + 1, bins.nb_bins) for the counts, frequencies and scores of each pair,
+	the last row holding the reference distribution ("XX") and null scores
+	The bootstrap file left next to the model file by a former training is removed (see save_bootstrap)
+
+	Parameters
+	----------
+	path : str
+		String containing the path to the model file
+	counts, frequencies, scores
+		Arrays of shape (len(PAIRS) + 1, bins.nb_bins) of the counts, frequencies and scores of each pair of nucleosides followed by the reference ones
+	bins : BinSpec
+		Bins of the arrays
+	corpus_hash : str
+		Hash identifying the pdb files used for the training
+	atom_type : str
+		Atom type of the distances counted (see Parsing.AtomTable.select)
+
+	Returns
+	-------
+	None
+	"""
+
+	metadata = {"arrays" : ["counts", "frequencies", "scores"], "pairs" : PAIRS + ["XX"], **bins.to_metadata(), "min_separation" : MIN_SEPARATION, "corpus_hash" : corpus_hash}
+	#The atom type is only written for the other atoms than C3', so that the files of the default model do not change
+	if (atom_type != DEFAULT_ATOM_TYPE) :
+		metadata["atom_type"] = atom_type
+	save_to_binary(path, np.stack([counts, frequencies, scores]), metadata)
+	#The bootstrap of a former training does not describe the new model, it is saved again after the model with --bootstrap
+	if (os.path.isfile(get_bootstrap_path(path))) :
+		os.remove(get_bootstrap_path(path))
+	return
+
+def save_bootstrap(path : str, scores, empty, percentiles = BOOTSTRAP_PERCENTILES, bins : BinSpec = DEFAULT_BINS, nb_replicates : int = 1000, seed : int = None, corpus_hash : str = "", atom_type : str = DEFAULT_ATOM_TYPE):
+
+	"""Function saving the bootstrap percentiles of the scores in a binary file like save_model, next to the model file (see Utility_script.get_bootstrap_path)
+
+	The array saved has a shape (len(percentiles) + 1, len(PAIRS), bins.nb_bins) for the percentiles of the scores of each pair
+	followed by the fraction of the replicates in which each bin is empty
+
+	Parameters
+	----------
+	path : str
+		String containing the path to the bootstrap file
+	scores, empty
+		Arrays returned by get_bootstrap_scores
+	percentiles
+		Percentiles of the scores
+	bins : BinSpec
+		Bins of the arrays
+	nb_replicates : int
+		Number of replicates drawn
+	seed : int
+		Seed of the draws, None if they cannot be repeated
+	corpus_hash : str
+		Hash identifying the pdb files used for the training
+	atom_type : str
+		Atom type of the distances counted (see Parsing.AtomTable.select)
+
+	Returns
+	-------
+	None
+	"""
+
+	metadata = {"arrays" : [f"p{q:g}" for q in percentiles] + ["empty"], "percentiles" : [float(q) for q in percentiles], "pairs" : list(PAIRS), **bins.to_metadata(), "replicates" : nb_replicates, "seed" : seed, "corpus_hash" : corpus_hash}
+	if (atom_type != DEFAULT_ATOM_TYPE) :
+		metadata["atom_type"] = atom_type
+	save_to_binary(path, np.concatenate([scores, empty[np.newaxis]]), metadata)
+	return
+
 def main():
 
 	""" Function called when this script is executed as a script and not imported as a library
@@ -225,24 +938,108 @@ def main():
     """
 
 	plot_option = False
+	plot_dir = None
+	plot_formats = ("png",)
+	atom_types = None
+	nb_replicates = 0
+	bootstrap_seed = 0
+	workers = os.cpu_count() or 1
+	rebuild_cache = False
+	bins = DEFAULT_BINS
+	stats_path = None
+	profile_path = None
+	store_path = None
+	prefetch = 0
+	io_threads = PREFETCH_THREADS
 	path_data_dir = str(os.path.join(__file__, "data"))
-	usage = "Usage :\npython [Path_to_Training.py] [-h, --help] [--plot] [Path_to_data_directory]\n\t[Path_to_Training.py] : Path to this training script \n\t[-h, --help] : Prints this help text \n\t[--plot] : Use if plots of the intermediary and scores distributions wanted \n\t[Path_to_data_directory] : Path to the data directory\n\t\tMust contain a directory containing pdb files"
+	usage = ("Usage :\n"
+		"python [Path_to_Training.py] [-h, --help] [--plot] [--plot-dir Dir] [--plot-format Ext,Ext,...] [--workers N] [--prefetch N] [--io-threads N] [--rebuild-cache] [--bins Min:Max:Width] [--atoms Type,Type,...] [--bootstrap B] [--bootstrap-seed S] [--store File] [--stats File] [--profile File] [Path_to_data_directory]\n"
+		"\t[Path_to_Training.py] : Path to this training script \n"
+		"\t[-h, --help] : Prints this help text \n"
+		"\t[--plot] : Use if plots of the intermediary and scores distributions wanted \n"
+		"\t[--plot-dir Dir] : Saves the plots to image files in Dir instead of showing them, without any display, drawn in parallel by the workers\n"
+		"\t\tThe plots already saved for the same model are not drawn again \n"
+		"\t[--plot-format Ext,Ext,...] : Formats of the image files of --plot-dir (default : png), for example png,svg \n"
+		"\t[--workers N] : Number of processes parsing the pdb files (default : number of CPUs), the time spent on each file is printed \n"
+		"\t[--prefetch N] : Pipelined mode, N files are read ahead by threads while the current ones are parsed and counted, for the slow or network disks (default : 0, each process reads its files)\n"
+		"\t\tThe numbers of files and MB parsed by second are printed in both modes \n"
+		"\t[--io-threads N] : Number of threads reading the files ahead with --prefetch (default : 4) \n"
+		"\t[--rebuild-cache] : Ignores the counts of the pdb files cached by the previous trainings in the cache directory and parses all the files again \n"
+		"\t[--bins Min:Max:Width] : Bins of the distance distributions, labelled by their lower bound from Min to Max included (default : 1:20:1) \n"
+		"\t[--atoms Type,Type,...] : Atom types whose potentials are trained from a single parse of each file (default : C3')\n"
+		"\t\tAn atom name (C3', P, C4', ...), N1/N9 for the glycosidic nitrogen of each residue, or two types joined by - for the distances between an atom of each type (C3'-P)\n"
+		"\t\tThe C3' model is saved like without this option, the model of each other type in model_<type>.bin (see Model.get_model_file_name) \n"
+		"\t[--bootstrap B] : Draws B samples of the pdb files with replacement and saves the 2.5, 50 and 97.5 percentiles of the scores of each bin next to each model (model_bootstrap.bin)\n"
+		"\t\tThe samples are computed from the cached counts of each file, without training again, and the intervals are drawn with --plot-dir \n"
+		"\t[--bootstrap-seed S] : Seed of the samples of --bootstrap (default : 0) \n"
+		"\t[--store File] : Reads the atoms of the structures from a corpus store packed by Store.py instead of parsing the pdb files\n"
+		"\t\tThe structures of the store are used, whatever the files of the data directory, it must hold the atoms of the --atoms types \n"
+		"\t[--stats File] : Writes a JSON report of the wall time, CPU time and peak memory of each stage and of each file parsed, with the numbers of atoms and pairs of atoms processed \n"
+		"\t[--profile File] : Profiles the run with cProfile and writes the profile to File (readable with pstats), the hottest functions are added to the --stats report\n"
+		"\t\tOnly this process is profiled, use --workers 1 to profile the parsing \n"
+		"\t[Path_to_data_directory] : Path to the data directory\n"
+		"\t\tMust contain a directory containing pdb files\n"
+		"\t\tThe pdb (.pdb, .ent) and mmCIF (.cif, .mmcif) files are read, compressed with gzip (.gz) or bzip2 (.bz2) or not")
 
-	if (len(sys.argv) > 1):
-		for i in range(len(sys.argv)):
-			if (sys.argv[i] in ["-h","--help"]) :
+	i = 1
+	while (i < len(sys.argv)):
+		if (sys.argv[i] in ["-h","--help"]) :
+			print(usage)
+			return
+		elif (sys.argv[i] == "--plot") :
+			plot_option = True
+		elif (sys.argv[i] == "--rebuild-cache") :
+			rebuild_cache = True
+		elif (sys.argv[i] == "--bins" and i + 1 < len(sys.argv)) :
+			try :
+				bins = BinSpec.parse(sys.argv[i + 1])
+			except ValueError as e :
+				print(e)
 				print(usage)
 				return
-			elif (sys.argv[i] == "--plot") :
-				plot_option = True
-			elif (os.path.exists(sys.argv[i])):
-				if (os.path.isabs(sys.argv[i])) :
-					path_data_dir = str(sys.argv[i])
-				else:
-					path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
-			else:
+			i += 1
+		elif (sys.argv[i] == "--workers" and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() and int(sys.argv[i + 1]) > 0) :
+			workers = int(sys.argv[i + 1])
+			i += 1
+		elif (sys.argv[i] in ["--bootstrap", "--bootstrap-seed", "--prefetch"] and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit()) :
+			if (sys.argv[i] == "--bootstrap") :
+				nb_replicates = int(sys.argv[i + 1])
+			elif (sys.argv[i] == "--prefetch") :
+				prefetch = int(sys.argv[i + 1])
+			else :
+				bootstrap_seed = int(sys.argv[i + 1])
+			i += 1
+		elif (sys.argv[i] == "--io-threads" and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit() and int(sys.argv[i + 1]) > 0) :
+			io_threads = int(sys.argv[i + 1])
+			i += 1
+		elif (sys.argv[i] == "--atoms" and i + 1 < len(sys.argv)) :
+			atom_types = list(dict.fromkeys(t for t in sys.argv[i + 1].split(",") if t))
+			if not (atom_types) or any("" in split_atom_type(t) or len(split_atom_type(t)) > 2 for t in atom_types) :
+				print(f"Invalid atom types {sys.argv[i + 1]}")
 				print(usage)
 				return
+			i += 1
+		elif (sys.argv[i] in ["--stats", "--profile", "--plot-dir", "--plot-format", "--store"] and i + 1 < len(sys.argv)) :
+			if (sys.argv[i] == "--stats") :
+				stats_path = sys.argv[i + 1]
+			elif (sys.argv[i] == "--store") :
+				store_path = os.path.abspath(sys.argv[i + 1])
+			elif (sys.argv[i] == "--profile") :
+				profile_path = sys.argv[i + 1]
+			elif (sys.argv[i] == "--plot-dir") :
+				plot_dir = sys.argv[i + 1]
+			else :
+				plot_formats = tuple(f.strip(".") for f in sys.argv[i + 1].split(",") if f)
+			i += 1
+		elif (os.path.exists(sys.argv[i])):
+			if (os.path.isabs(sys.argv[i])) :
+				path_data_dir = str(sys.argv[i])
+			else:
+				path_data_dir = str(os.path.join(os.getcwd(), sys.argv[i]))
+		else:
+			print(usage)
+			return
+		i += 1
 
 	
 	print(path_data_dir)
@@ -252,36 +1049,125 @@ def main():
 		print(usage)
 		return
 
-	pdb_file_names = glob.glob(os.path.join(path_data_dir,"pdb*/*.pdb"))
+	#Only the C3' atoms are parsed and cached like before when no other atom type is asked
+	if (atom_types == [DEFAULT_ATOM_TYPE]) :
+		atom_types = None
+
+	profiler = RunProfiler("Training.py", profile = profile_path is not None)
+	profiler.details.update({"workers" : workers, "prefetch" : prefetch, "io_threads" : io_threads})
+
+	with profiler.stage("list_files") :
+		if (store_path is None) :
+			pdb_file_names = list_structure_files(os.path.join(path_data_dir,"pdb*/*"))
+			file_hashes = None
+		else :
+			try :
+				store = get_store(store_path)
+			except (OSError, ValueError) as e :
+				print(f"Unreadable store {store_path} : {e}")
+				return
+			missing = store.has_atom_types([DEFAULT_ATOM_TYPE] if atom_types is None else atom_types)
+			if (missing) :
+				print(f"The atoms {', '.join(missing)} are not in the store {store_path}, pack them with Store.py --atoms")
+				return
+			#The hashes of the files when they were packed identify their counts in the cache, like the hashes of the files themselves
+			pdb_file_names = store.names
+			file_hashes = store.hashes
+			profiler.details["store"] = store_path
+
+	start = time.perf_counter()
+	cache = TrainingCache(os.path.join(path_data_dir, "cache", "training_counts.npz"), get_cache_parameters(bins, atom_types = atom_types), bins, None if atom_types is None else len(atom_types))
+	with profiler.stage("load_cache") :
+		if not (rebuild_cache) :
+			cache.load()
+	#Files parsed because they are not in the cache, for the throughput
+	parsed_files = []
+	def count_files(filenames) :
+		parsed_files.extend(filenames)
+		return iter_distances_counts(filenames, workers, bins, verbose = True, profiler = profiler if stats_path is not None else None, atom_types = atom_types, store = store_path, prefetch = prefetch, io_threads = io_threads)
+
+	with profiler.stage("count_distances") :
+		count_start = time.perf_counter()
+		parsed, reused, removed = cache.update(pdb_file_names, count_files, file_hashes)
+		count_elapsed = time.perf_counter() - count_start
+	with profiler.stage("save_cache") :
+		cache.save()
+	print(f"{parsed} files {'parsed' if store_path is None else 'read from the store'} with {workers} worker(s), {len(pdb_file_names) - parsed} taken from the cache ({reused} moved or copied), {removed} removed, in {time.perf_counter() - start:.3f} s")
+	profiler.details.update({"files" : len(pdb_file_names), "files_parsed" : parsed, "files_cached" : len(pdb_file_names) - parsed, "files_removed" : removed})
+	if (parsed > 0) :
+		#The size of the files on the disk is used, compressed or not, the structures of a store are counted without their size
+		nb_bytes = get_files_size(parsed_files) if store_path is None else 0
+		files_per_second, megabytes_per_second = get_throughput(parsed, nb_bytes, count_elapsed)
+		print(f"Throughput : {files_per_second:.1f} files/s" + (f", {megabytes_per_second:.2f} MB/s ({nb_bytes / (1 << 20):.2f} MB)" if store_path is None else "") + f" in {count_elapsed:.3f} s" + (f", {prefetch} files read ahead by {io_threads} threads" if prefetch > 0 and store_path is None else ""))
+		profiler.details.update({"bytes_parsed" : nb_bytes, "files_per_second" : files_per_second, "megabytes_per_second" : megabytes_per_second})
+
+	#Total counts of each atom type, the default one is also saved in the csv files read by the former scoring and plotting
+	totals = {DEFAULT_ATOM_TYPE : cache.total} if atom_types is None else dict(zip(atom_types, cache.total))
+	model_paths = {atom_type : os.path.join(path_data_dir, get_model_file_name(atom_type)) for atom_type in totals.keys()}
+
+	if (DEFAULT_ATOM_TYPE in totals) :
+		with profiler.stage("reduce") :
+			#Counts, frequencies and scores of each pair followed by the reference ones ("XX")
+			counts, frequencies, scores = get_model_arrays(totals[DEFAULT_ATOM_TYPE], bins)
+
+			present = counts > 0
+			d = add_values_to_distribution(counts[:-1], present[:-1], dict(), bins)
+			distance_frequencies_by_pairs = add_values_to_distribution(frequencies[:-1], present[:-1], dict(), bins)
+			reference_distance_frequencies = add_values_to_distribution(frequencies[-1:], present[-1:], dict(), bins, ["XX"]).get("XX", dict())
+			distance_scores_by_pairs = add_values_to_distribution(scores[:-1], present[:-1], dict(), bins)
+
+		with profiler.stage("save_csv") :
+			save_distribs(os.path.join(path_data_dir,"distribs"),d, bins)
+			save_distribs(os.path.join(path_data_dir,"frequencies"),{**distance_frequencies_by_pairs,**{"XX" : reference_distance_frequencies}}, bins)
+			save_distribs(os.path.join(path_data_dir,"scores"),distance_scores_by_pairs, bins)
+		with profiler.stage("save_model") :
+			save_model(model_paths[DEFAULT_ATOM_TYPE], counts, frequencies, scores, bins, cache.get_corpus_hash())
 
-	d = dict()
-	for file in pdb_file_names :
-		d = get_interatomic_distances_distribution_by_pairs(file,d)
+	with profiler.stage("save_models") :
+		for atom_type, total in totals.items() :
+			if (atom_type != DEFAULT_ATOM_TYPE) :
+				save_model(model_paths[atom_type], *get_model_arrays(total, bins), bins, cache.get_corpus_hash(), atom_type)
+				print(f"Model of the atom type {atom_type} saved in {model_paths[atom_type]}")
 
-	reference_distances_distribution = get_reference_distances_distribution(d)
+	if (nb_replicates > 0 and cache.entries) :
+		with profiler.stage("bootstrap") :
+			start = time.perf_counter()
+			#The files are sorted so that the samples of a seed do not depend on the order of the cache
+			file_counts = np.stack([cache.entries[f][1] for f in sorted(cache.entries.keys())])
+			for k, (atom_type, path) in enumerate(model_paths.items()) :
+				scores_percentiles, empty = get_bootstrap_scores(file_counts if atom_types is None else file_counts[:, k], bins, nb_replicates, BOOTSTRAP_PERCENTILES, bootstrap_seed)
+				save_bootstrap(get_bootstrap_path(path), scores_percentiles, empty, BOOTSTRAP_PERCENTILES, bins, nb_replicates, bootstrap_seed, cache.get_corpus_hash(), atom_type)
+			print(f"{nb_replicates} bootstrap replicates of {len(file_counts)} files saved next to {len(model_paths)} model(s) in {time.perf_counter() - start:.3f} s")
+		profiler.details["bootstrap_replicates"] = nb_replicates
 
-	reference_distance_frequencies = get_frequencies(reference_distances_distribution)
+	if (plot_dir is not None) :
+		with profiler.stage("plot") :
 
-	distance_frequencies_by_pairs = dict()
+			#Imported here so that matplotlib is only loaded when plots are wanted
+			from Plotting import render_model_figures
 
-	for pair, distrib in d.items():
-		distance_frequencies_by_pairs[pair] = get_frequencies(distrib)
+			#The figures of the default model are saved in the directory, the ones of the other atom types in a directory named like their model
+			for atom_type, path in model_paths.items() :
+				directory = plot_dir if atom_type == DEFAULT_ATOM_TYPE else os.path.join(plot_dir, os.path.splitext(os.path.basename(path))[0])
+				rendered, skipped = render_model_figures(path, directory, plot_formats, workers)
+				print(f"{len(rendered)} image files saved in {directory}, {len(skipped)} unchanged")
 
-	distance_scores_by_pairs = get_scores(distance_frequencies_by_pairs,reference_distance_frequencies)
+	elif (plot_option and DEFAULT_ATOM_TYPE in totals):
+		with profiler.stage("plot") :
 
-	save_distribs(os.path.join(path_data_dir,"distribs"),d)
-	save_distribs(os.path.join(path_data_dir,"frequencies"),{**distance_frequencies_by_pairs,**{"XX" : reference_distance_frequencies}})
-	save_distribs(os.path.join(path_data_dir,"scores"),distance_scores_by_pairs)
+			#Imported here so that matplotlib is only loaded when plots are wanted
+			from Plotting import plot_distrib_by_pairs
 
-	if (plot_option):
+			plot_distrib_by_pairs(d, plot_name = "Distribution of distances by pairs", bins = bins)
 
-		plot_distrib_by_pairs(d, plot_name = "Distribution of distances by pairs")
+			plot_distrib_by_pairs(distance_frequencies_by_pairs, plot_name = "Frequencies of distances by pairs", bins = bins)
 
-		plot_distrib_by_pairs(distance_frequencies_by_pairs, plot_name = "Frequencies of distances by pairs")
+			plot_distrib_by_pairs({"XX" : reference_distance_frequencies}, plot_name = "Reference distance frequencies", bins = bins)
 
-		plot_distrib_by_pairs({"XX" : reference_distance_frequencies}, plot_name = "Reference distance frequencies")
+			plot_distrib_by_pairs(distance_scores_by_pairs, plot_name = "Distribution of distance scores by pairs", bins = bins)
 
-		plot_distrib_by_pairs(distance_scores_by_pairs, plot_name = "Distribution of distance scores by pairs")
+	profiler.stop()
+	profiler.save(stats_path, profile_path)
 
 	return
 
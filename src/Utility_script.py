@@ -1,55 +1,156 @@
-def save_to_csv(path : str, data : dict):
-
-	"""Saves a directory distribution produced in the Training.py file to a csv file
-	
-	Parameters
-	----------
-	path : str
-		String containing path to the file where the data must be saved
-	data : dict
-		Dictionary containing the data that must be saved
-		This functionned is specifically designed for a dictionary with keys ranging from 1 to 20 included
-
-	Returns
-	-------
-		None
-	"""
-
-	with open(path,"w") as file:
-		for d in range(1,21):
-			if d in data: 
-				#Writes the data for the keys existing in the dictionary
-				file.write(f"{d},{data[d]}\n")
-			else :
-				#Writes the data for the keys between 1 and 20 included to get 20 lines in the file
-				file.write(f"{d},0\n")
-	return
-
-def import_from_csv(file_path : str,imported_data : dict):
-	
-	""" Imports the data from a csv file with the same format as the ones created by the function save_to_csv
-	
-	Parameters
-	----------
-	file_path : str
-		String containing the path to the file containing the data that must be imported
-
-	imported_data : dict
-		Dictionary where the data must be imported to
-
-	Returns
-	-------
-	imported_data : dict
-		Dictionary where the function imported the data to
-	"""
-
-	with open(file_path,"r") as file :
-			for line in file.readlines() :
-				distance, score = line.split(",")
-				imported_data[int(distance)] = float(score)
-
-	##Prints used for debugging
-	#print(file_path)
-	#print(imported_data)
-
-	return imported_data
\ No newline at end of file
+import numpy as np
+import struct
+import json
+import os
+
+#First bytes of the binary model files and version of their format
+MODEL_MAGIC = b"RNAMODEL"
+MODEL_VERSION = 1
+
+#Name of the binary model file written in the data directory by the training
+MODEL_FILE_NAME = "model.bin"
+
+#Suffix of the name of the file of the bootstrap score percentiles saved next to a model file
+BOOTSTRAP_SUFFIX = "_bootstrap"
+
+def save_to_csv(path : str, data : dict, labels = range(1, 21)):
+
+	"""Saves a directory distribution produced in the Training.py file to a csv file
+	
+	Parameters
+	----------
+	path : str
+		String containing path to the file where the data must be saved
+	data : dict
+		Dictionary containing the data that must be saved
+	labels
+		Labels of the bins written in the file, in order (see Distances.BinSpec.get_labels)
+		By default the keys ranging from 1 to 20 included
+
+	Returns
+	-------
+		None
+	"""
+
+	with open(path,"w") as file:
+		for d in labels:
+			if d in data: 
+				#Writes the data for the keys existing in the dictionary
+				file.write(f"{d},{data[d]}\n")
+			else :
+				#Writes the data for the other labels to get one line per bin in the file
+				file.write(f"{d},0\n")
+	return
+
+def import_from_csv(file_path : str,imported_data : dict):
+	
+	""" Imports the data from a csv file with the same format as the ones created by the function save_to_csv
+	
+	Parameters
+	----------
+	file_path : str
+		String containing the path to the file containing the data that must be imported
+
+	imported_data : dict
+		Dictionary where the data must be imported to
+
+	Returns
+	-------
+	imported_data : dict
+		Dictionary where the function imported the data to
+	"""
+
+	with open(file_path,"r") as file :
+			for line in file.readlines() :
+				distance, score = line.split(",")
+				#The labels are integers for the default bins and floats for finer ones
+				imported_data[int(distance) if distance.strip().isdigit() else float(distance)] = float(score)
+
+	##Prints used for debugging
+	#print(file_path)
+	#print(imported_data)
+
+	return imported_data
+
+def save_to_binary(path : str, data, metadata : dict):
+
+	"""Saves an array of float64 and its metadata to a binary model file
+
+	The file starts with the MODEL_MAGIC string, the format version and the length of a JSON header holding the metadata and the shape of the array,
+	padded so that the array, written in C order after it, starts on a multiple of 64 bytes
+
+	Parameters
+	----------
+	path : str
+		String containing path to the file where the data must be saved
+	data
+		Array of floats that must be saved
+	metadata : dict
+		Dictionary of JSON serializable metadata saved with the array
+
+	Returns
+	-------
+		None
+	"""
+
+	data = np.ascontiguousarray(data, dtype = "<f8")
+	header = json.dumps({**metadata, "shape" : list(data.shape)}).encode()
+	prefix_length = len(MODEL_MAGIC) + 8
+	header += b" " * (-(prefix_length + len(header)) % 64)
+
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "wb") as file:
+		file.write(MODEL_MAGIC)
+		file.write(struct.pack("<II", MODEL_VERSION, len(header)))
+		file.write(header)
+		file.write(data.tobytes())
+	os.replace(tmp_path, path)
+	return
+
+def get_bootstrap_path(path_model : str):
+
+	""" Gives the path to the file of the bootstrap score percentiles of a model file
+
+	Parameters
+	----------
+	path_model : str
+		String containing the path to the model file
+
+	Returns
+	-------
+	path : str
+		Path to the file saved next to the model file, model_bootstrap.bin for model.bin
+	"""
+
+	root, extension = os.path.splitext(path_model)
+	return root + BOOTSTRAP_SUFFIX + extension
+
+def import_from_binary(file_path : str):
+
+	""" Imports the data from a binary model file created by the function save_to_binary
+
+	The array is memory-mapped in read-only mode, so that the processes loading the same file share its pages
+
+	Parameters
+	----------
+	file_path : str
+		String containing the path to the file containing the data that must be imported
+
+	Returns
+	-------
+	data, metadata
+		Read-only memory-mapped array and dictionary of the metadata saved with it
+	"""
+
+	with open(file_path, "rb") as file :
+		if (file.read(len(MODEL_MAGIC)) != MODEL_MAGIC) :
+			raise ValueError(f"{file_path} is not a model file")
+		version, header_length = struct.unpack("<II", file.read(8))
+		if (version != MODEL_VERSION) :
+			raise ValueError(f"{file_path} uses the model format version {version}, version {MODEL_VERSION} expected")
+		metadata = json.loads(file.read(header_length))
+
+	shape = tuple(metadata.pop("shape"))
+	data = np.memmap(file_path, dtype = "<f8", mode = "r", offset = len(MODEL_MAGIC) + 8 + header_length, shape = shape)
+
+	return data, metadata
@@ -0,0 +1,9 @@
+import os
+import sys
+
+#The modules of the project are imported from src like the scripts do
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+DATA_DIR = os.path.join(os.path.dirname(SRC_DIR), "data")
+
+if not (SRC_DIR in sys.path) :
+	sys.path.insert(0, SRC_DIR)
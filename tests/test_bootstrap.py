@@ -0,0 +1,62 @@
+import glob
+import os
+import numpy as np
+import pytest
+from conftest import DATA_DIR
+from Plotting import is_bootstrap_of_model
+from Training import BOOTSTRAP_PERCENTILES, TrainingCorpus, get_bootstrap_scores, get_model_arrays, save_bootstrap, save_model
+from Utility_script import get_bootstrap_path, import_from_binary
+
+PDB_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "pdb_files", "*.pdb")))[:12]
+
+@pytest.fixture(scope = "module")
+def corpus():
+	return TrainingCorpus.from_files(PDB_FILES)
+
+def test_bootstrap_of_a_single_file_gives_the_model(corpus):
+
+	""" Every replicate of a single file draws it once, so all the percentiles are the scores of its model """
+
+	single = TrainingCorpus(corpus.filenames[:1], corpus.counts[:1], corpus.bins)
+	scores, empty = single.get_bootstrap(20, seed = 0)
+	model_scores = get_model_arrays(single.total, single.bins)[2][:-1]
+	assert scores.shape == (len(BOOTSTRAP_PERCENTILES), *model_scores.shape)
+	for percentile_scores in scores :
+		np.testing.assert_allclose(percentile_scores, model_scores, rtol = 1e-12, atol = 1e-12)
+	np.testing.assert_array_equal(empty, single.total == 0)
+
+def test_bootstrap_percentiles(corpus):
+
+	""" The percentiles of each bin are ordered, the scores of the model are inside the interval of the bins never empty
+	and close to their median, and the same seed gives the same draws """
+
+	scores, empty = corpus.get_bootstrap(200, seed = 1)
+	assert np.all(np.diff(scores, axis = 0) >= 0)
+	assert np.all((empty >= 0) & (empty <= 1))
+	assert np.all(corpus.total[empty < 1] > 0)
+	model_scores = get_model_arrays(corpus.total, corpus.bins)[2][:-1]
+	full = empty == 0
+	assert np.any(full)
+	assert np.all((scores[0][full] <= model_scores[full]) & (model_scores[full] <= scores[-1][full]))
+	assert np.abs(scores[1][full] - model_scores[full]).max() < 0.2
+
+	same_scores, same_empty = get_bootstrap_scores(corpus.counts, corpus.bins, 200, BOOTSTRAP_PERCENTILES, 1)
+	np.testing.assert_array_equal(scores, same_scores)
+	np.testing.assert_array_equal(empty, same_empty)
+	assert not np.array_equal(scores, corpus.get_bootstrap(200, seed = 2)[0])
+
+	with pytest.raises(ValueError) :
+		get_bootstrap_scores(corpus.counts[:0], corpus.bins)
+
+def test_bootstrap_file_matches_its_model(corpus, tmp_path):
+
+	""" A bootstrap saved with the corpus hash of a model is recognized as its bootstrap, not one of another corpus """
+
+	path = str(tmp_path / "model.bin")
+	save_model(path, *get_model_arrays(corpus.total, corpus.bins), corpus.bins, "abc")
+	save_bootstrap(get_bootstrap_path(path), *corpus.get_bootstrap(10, seed = 0), BOOTSTRAP_PERCENTILES, corpus.bins, 10, 0, "abc")
+	model_metadata = import_from_binary(path)[1]
+	bootstrap_metadata = import_from_binary(get_bootstrap_path(path))[1]
+	assert is_bootstrap_of_model(bootstrap_metadata, model_metadata)
+	assert not is_bootstrap_of_model({**bootstrap_metadata, "corpus_hash" : "def"}, model_metadata)
+	assert not is_bootstrap_of_model({**bootstrap_metadata, "atom_type" : "P"}, model_metadata)
@@ -0,0 +1,57 @@
+import os
+import shutil
+import numpy as np
+from conftest import DATA_DIR
+from Cache import TrainingCache, get_cache_parameters
+from Parsing import list_structure_files
+from Training import iter_distances_counts
+
+PDB_FILES = list_structure_files(os.path.join(DATA_DIR, "pdb_files", "*"))[:5]
+
+def get_cache(path):
+	cache = TrainingCache(os.path.join(path, "cache", "training_counts.npz"), get_cache_parameters())
+	cache.load()
+	return cache
+
+def copy_corpus(path):
+	os.makedirs(path)
+	for filename in PDB_FILES :
+		shutil.copy(filename, path)
+	return list_structure_files(os.path.join(path, "*"))
+
+def test_moved_corpus_is_not_parsed_again(tmp_path):
+
+	""" The counts of the files of a renamed corpus directory are taken from the cache by the hash of their content """
+
+	parsed_files = []
+	def count_files(filenames) :
+		parsed_files.extend(filenames)
+		return iter_distances_counts(filenames)
+
+	filenames = copy_corpus(str(tmp_path / "corpus"))
+	cache = get_cache(str(tmp_path))
+	assert cache.update(filenames, count_files) == (len(filenames), 0, 0)
+	total = cache.total.copy()
+	cache.save()
+
+	os.rename(str(tmp_path / "corpus"), str(tmp_path / "renamed"))
+	parsed_files.clear()
+	cache = get_cache(str(tmp_path))
+	assert cache.update(list_structure_files(str(tmp_path / "renamed" / "*")), count_files) == (0, len(filenames), 0)
+	assert parsed_files == []
+	assert np.array_equal(cache.total, total)
+	assert all(os.path.dirname(f) == str(tmp_path / "renamed") for f in cache.entries)
+
+def test_deleted_and_modified_files_are_counted_again(tmp_path):
+
+	""" A deleted file is removed from the cache and a modified file is parsed again """
+
+	filenames = copy_corpus(str(tmp_path / "corpus"))
+	cache = get_cache(str(tmp_path))
+	cache.update(filenames, iter_distances_counts)
+
+	os.remove(filenames[0])
+	with open(filenames[1], "a") as f :
+		f.write("END\n")
+	assert cache.update(filenames[1:], iter_distances_counts) == (1, 0, 1)
+	assert np.array_equal(cache.total, sum(counts for filename, counts, elapsed in iter_distances_counts(filenames[1:])))
@@ -0,0 +1,20 @@
+import glob
+import os
+import pytest
+from conftest import DATA_DIR
+from Training import get_interatomic_distances_distribution_by_pairs
+
+PDB_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "pdb_files", "*.pdb")))
+
+@pytest.mark.parametrize("legacy_pairs", [False, True])
+@pytest.mark.parametrize("round_down", [True, False])
+def test_grid_and_brute_force_give_identical_distributions(legacy_pairs, round_down):
+
+	""" The cell grid must find exactly the same distances as the brute force on every bundled pdb file,
+	for the histograms of the training and for the raw distances of the scoring """
+
+	assert PDB_FILES
+	for filename in PDB_FILES :
+		grid = get_interatomic_distances_distribution_by_pairs(filename, dict(), round_down, legacy_pairs, method = "grid")
+		brute = get_interatomic_distances_distribution_by_pairs(filename, dict(), round_down, legacy_pairs, method = "brute")
+		assert grid == brute, os.path.basename(filename)
@@ -0,0 +1,39 @@
+import copy
+import os
+from conftest import DATA_DIR
+from Model import ScoringModel
+from Training import get_interatomic_distances_distribution_by_pairs
+
+PDB_FILE = os.path.join(DATA_DIR, "input", "1a60.pdb")
+MODEL_FILE = os.path.join(DATA_DIR, "model.bin")
+
+#Energy of 1a60 with the bundled model, all the models of the file merged in the same chains
+EXPECTED_ENERGY = 356117.83860535535
+
+def test_scoring_twice_gives_the_same_energy():
+
+	""" Scoring the same file twice in the same process must not be affected by the first scoring """
+
+	model = ScoringModel.from_file(MODEL_FILE)
+	assert model.score_file(PDB_FILE) == EXPECTED_ENERGY
+	assert model.score_file(PDB_FILE) == EXPECTED_ENERGY
+	assert ScoringModel.from_file(MODEL_FILE).score_file(PDB_FILE) == EXPECTED_ENERGY
+
+def test_only_the_given_dictionary_accumulates():
+
+	""" Distributions are only accumulated in the dictionary passed by the caller, never in a shared default """
+
+	first = get_interatomic_distances_distribution_by_pairs(PDB_FILE)
+	reference = copy.deepcopy(first)
+	assert get_interatomic_distances_distribution_by_pairs(PDB_FILE) == reference
+
+	accumulator = {}
+	returned = get_interatomic_distances_distribution_by_pairs(PDB_FILE, accumulator)
+	assert returned is accumulator
+	get_interatomic_distances_distribution_by_pairs(PDB_FILE, accumulator)
+	assert accumulator == {pair : {label : 2 * count for label, count in counts.items()} for pair, counts in reference.items()}
+
+	#Neither the previous results nor new calls without a dictionary were affected by the accumulation
+	assert first == reference
+	assert get_interatomic_distances_distribution_by_pairs(PDB_FILE) == reference
+	assert get_interatomic_distances_distribution_by_pairs.__defaults__[0] is None
@@ -0,0 +1,16 @@
+import json
+import subprocess
+import sys
+from conftest import SRC_DIR
+
+#Generous bound of the import time of the scoring script, it is far below it without matplotlib
+IMPORT_TIME_BUDGET = 2.0
+
+def test_scoring_import_is_light():
+
+	""" Importing the scoring script alone in a new interpreter must not load matplotlib and must stay fast """
+
+	code = "import json, sys, time\nstart = time.perf_counter()\nimport Scoring\nprint(json.dumps({'seconds' : time.perf_counter() - start, 'matplotlib' : 'matplotlib' in sys.modules}))"
+	output = json.loads(subprocess.run([sys.executable, "-c", code], cwd = SRC_DIR, capture_output = True, text = True, check = True).stdout)
+	assert not output["matplotlib"]
+	assert output["seconds"] < IMPORT_TIME_BUDGET
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+from conftest import DATA_DIR
+from Distances import Chain
+from Model import ScoringModel, IncrementalScorer
+from Parsing import get_models
+
+PDB_FILE = os.path.join(DATA_DIR, "input", "1a60.pdb")
+
+@pytest.fixture
+def scorer():
+	model = ScoringModel.from_file(os.path.join(DATA_DIR, "model.bin"))
+	model_id, chains = get_models(PDB_FILE)[0]
+	return IncrementalScorer(model, chains)
+
+def get_full_energy(scorer, indices = None, coordinates = None):
+
+	""" Energy of all the distances of the chains of the scorer, with some atoms moved if given """
+
+	moved = scorer.coordinates.copy()
+	if (indices is not None) :
+		moved[indices] = coordinates
+	chains = [Chain(scorer.residues[atoms], scorer.positions[atoms], moved[atoms]) for atoms in [np.flatnonzero(scorer.chain_index == k) for k in np.unique(scorer.chain_index)]]
+	return scorer.model.get_energy(chains)
+
+@pytest.mark.parametrize("nb_moved", [1, 3, 10])
+def test_proposed_delta_matches_a_full_rescore(scorer, nb_moved):
+
+	""" The energy difference of a move must be the difference of the energies of all the distances before and after it """
+
+	rng = np.random.default_rng(nb_moved)
+	before = get_full_energy(scorer)
+	assert scorer.energy == pytest.approx(before, rel = 1e-12)
+	for k in range(5) :
+		indices = rng.choice(len(scorer), nb_moved, replace = False)
+		coordinates = scorer.coordinates[indices] + rng.normal(0.0, 1.5, (nb_moved, 3))
+		delta = scorer.propose(indices, coordinates)
+		after = get_full_energy(scorer, indices, coordinates)
+		assert delta == pytest.approx(after - before, abs = 1e-6)
+		assert scorer.commit() == pytest.approx(after, abs = 1e-6)
+		before = after
+	assert scorer.recompute() == pytest.approx(before, rel = 1e-12)
+
+def test_rollback_keeps_the_committed_state(scorer):
+
+	""" A move rolled back changes neither the coordinates nor the energy """
+
+	energy = scorer.energy
+	coordinates = scorer.coordinates.copy()
+	scorer.propose([0, 5], coordinates[[0, 5]] + 2.0)
+	assert scorer.rollback() == energy
+	assert np.array_equal(scorer.coordinates, coordinates)
+	with pytest.raises(RuntimeError) :
+		scorer.commit()
+
+def test_invalid_moves_are_refused(scorer):
+	with pytest.raises(ValueError) :
+		scorer.propose([0, 0], np.zeros((2, 3)))
+	with pytest.raises(ValueError) :
+		scorer.propose([0, 1], np.zeros((1, 3)))
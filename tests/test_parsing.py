@@ -0,0 +1,69 @@
+import bz2
+import gzip
+import os
+import shutil
+import numpy as np
+import pytest
+from conftest import DATA_DIR
+from Parsing import parse_structure, parse_pdb, list_structure_files, read_structure_data
+
+PDB_FILE = os.path.join(DATA_DIR, "input", "1a60.pdb")
+ATOM_NAMES = ("C3'", "P", "N1", "N9")
+
+def write_mmcif(pdb_file, path):
+
+	""" Writes the ATOM records of a pdb file as the _atom_site loop of a mmCIF file, with a HETATM row which must be ignored """
+
+	model = 1
+	rows = []
+	with open(pdb_file) as f :
+		for line in f :
+			if (line.startswith("MODEL ")) :
+				model = int(line[10:14])
+			elif (line.startswith("ATOM")) :
+				atom_name = line[12:16].strip()
+				atom_name = f'"{atom_name}"' if "'" in atom_name else atom_name
+				rows.append(f"ATOM {len(rows) + 1} {atom_name} {line[17:20].strip()} {line[21]} {int(line[22:26])} {line[30:38].strip()} {line[38:46].strip()} {line[46:54].strip()} {model}")
+	rows.append(f"HETATM {len(rows) + 1} P HOH Z 1 0.0 0.0 0.0 1")
+	columns = ["group_PDB", "id", "auth_atom_id", "auth_comp_id", "auth_asym_id", "auth_seq_id", "Cartn_x", "Cartn_y", "Cartn_z", "pdbx_PDB_model_num"]
+	with open(path, "w") as f :
+		f.write("data_TEST\n#\nloop_\n" + "".join(f"_atom_site.{c}\n" for c in columns) + "\n".join(rows) + "\n#\n")
+
+def assert_same_tables(table, reference):
+	for field in ("chain_ids", "residue_names", "atom_names", "positions", "models") :
+		assert np.array_equal(getattr(table, field), getattr(reference, field)), field
+	assert np.array_equal(table.get_coordinates(), reference.get_coordinates())
+
+@pytest.fixture
+def structure_files(tmp_path):
+
+	""" The bundled 1a60 as pdb and mmCIF files, plain and compressed with gzip and bzip2 """
+
+	files = []
+	for name in ["1a60.pdb", "1a60.cif"] :
+		path = str(tmp_path / name)
+		if (name.endswith(".pdb")) :
+			shutil.copy(PDB_FILE, path)
+		else :
+			write_mmcif(PDB_FILE, path)
+		with open(path, "rb") as f :
+			data = f.read()
+		for extension, compress in ((".gz", gzip.compress), (".bz2", bz2.compress)) :
+			with open(path + extension, "wb") as f :
+				f.write(compress(data))
+		files += [path, path + ".gz", path + ".bz2"]
+	return files
+
+def test_all_formats_give_the_atoms_of_the_pdb_parse(structure_files):
+
+	""" The mmCIF files and the compressed files must give exactly the atoms, models and coordinates of the plain pdb file """
+
+	reference = parse_pdb(PDB_FILE, ATOM_NAMES)
+	assert len(set(reference.models.tolist())) == 24
+	for filename in structure_files :
+		assert_same_tables(parse_structure(filename, ATOM_NAMES), reference)
+		assert_same_tables(parse_structure(filename, ATOM_NAMES, data = read_structure_data(filename)), reference)
+
+def test_structure_files_are_listed_by_extension(structure_files, tmp_path):
+	(tmp_path / "notes.txt").write_text("")
+	assert list_structure_files(str(tmp_path / "*")) == sorted(structure_files)
@@ -0,0 +1,28 @@
+import os
+import pytest
+from conftest import DATA_DIR
+from Model import ScoringModel
+from Scoring import get_batch_input_files, get_estimated_energy, load_scores
+from Training import get_interatomic_distances_distribution_by_pairs
+
+PDB_FILE = os.path.join(DATA_DIR, "input", "1a60.pdb")
+
+def test_estimated_energy_with_a_compiled_model():
+
+	""" The raw distances are scored the same with the compiled model loaded once and with the dictionary of the score csv files """
+
+	model = ScoringModel.from_file(os.path.join(DATA_DIR, "model.bin"))
+	distances = get_interatomic_distances_distribution_by_pairs(PDB_FILE, round_down = False)
+	energy = get_estimated_energy(distances, model)
+	assert energy == pytest.approx(model.score_file(PDB_FILE), rel = 1e-12)
+	assert energy == pytest.approx(get_estimated_energy(distances, load_scores(DATA_DIR)), rel = 1e-12)
+
+def test_batch_glob_lists_the_structure_files_only(tmp_path):
+
+	""" A glob pattern of the batch mode keeps the same files as the directory of the pattern """
+
+	for name in ["a.pdb", "b.cif.gz", "notes.txt", "scores.csv"] :
+		(tmp_path / name).write_text("")
+	expected = [str(tmp_path / "a.pdb"), str(tmp_path / "b.cif.gz")]
+	assert get_batch_input_files(str(tmp_path / "*")) == expected
+	assert get_batch_input_files(str(tmp_path)) == expected
@@ -0,0 +1,103 @@
+import http.client
+import json
+import os
+import queue
+import threading
+import pytest
+from conftest import DATA_DIR
+from Model import ScoringModel
+from Server import ScoringServer, ScoringHTTPServer, ScoringRequestHandler, get_request_path, get_response
+
+PDB_FILE = os.path.join(DATA_DIR, "input", "1a60.pdb")
+
+@pytest.fixture(scope = "module")
+def model():
+	return ScoringModel.from_file(os.path.join(DATA_DIR, "model.bin"))
+
+@pytest.fixture
+def http_server(model):
+
+	""" HTTP server on a free port of localhost whose paths must be inside the data directory, its ScoringServer is not started """
+
+	scorer = ScoringServer(model, queue_size = 2)
+	handler = type("Handler", (ScoringRequestHandler,), {"scorer" : scorer, "root" : DATA_DIR})
+	server = ScoringHTTPServer(("127.0.0.1", 0), handler)
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+	yield server, scorer
+	server.shutdown()
+	server.server_close()
+	if (scorer.dispatcher is None) :
+		scorer.start()
+	scorer.stop()
+
+def post(server, content):
+	connection = http.client.HTTPConnection(*server.server_address[:2], timeout = 60)
+	connection.request("POST", "/score", json.dumps(content), {"Content-Type" : "application/json"})
+	response = connection.getresponse()
+	result = response.status, json.loads(response.read())
+	connection.close()
+	return result
+
+def test_queued_requests_are_scored_in_batches(model):
+
+	""" The requests queued before the dispatcher starts are sent in full batches and scored like each model of the file alone """
+
+	scorer = ScoringServer(model, batch_size = 2)
+	futures = [scorer.submit(PDB_FILE) for k in range(4)]
+	with open(PDB_FILE, "rb") as f :
+		futures.append(scorer.submit("1a60.pdb", f.read()))
+	scorer.start()
+	results = [future.result(timeout = 60) for future in futures]
+	scorer.stop()
+
+	expected = [energy for name, energy, nb_pairs in model.score_file_models(PDB_FILE)]
+	for r in results :
+		assert [m["energy"] for m in r] == pytest.approx(expected, rel = 1e-12)
+	assert get_response("1a60", results[0])["energy"] == pytest.approx(sum(expected) / len(expected), rel = 1e-12)
+	metrics = scorer.get_metrics()
+	assert (metrics["received"], metrics["completed"], metrics["failed"], metrics["batches"]) == (5, 5, 0, 3)
+
+def test_full_queue_is_refused(model):
+
+	""" A request is refused once the queue is full, and counted as rejected """
+
+	scorer = ScoringServer(model, queue_size = 2)
+	futures = [scorer.submit(PDB_FILE) for k in range(2)]
+	with pytest.raises(queue.Full) :
+		scorer.submit(PDB_FILE)
+	scorer.start()
+	scorer.stop()
+	assert all(future.done() for future in futures)
+	assert scorer.get_metrics()["rejected"] == 1
+
+def test_request_paths_must_be_inside_the_root():
+
+	""" The paths are resolved relative to the root directory, those leading outside of it are refused """
+
+	assert get_request_path("input/1a60.pdb", DATA_DIR) == os.path.realpath(PDB_FILE)
+	assert get_request_path(PDB_FILE, DATA_DIR) == os.path.realpath(PDB_FILE)
+	for path in ["../README.md", "/etc/passwd", "input/../../src/Server.py"] :
+		with pytest.raises(PermissionError) :
+			get_request_path(path, DATA_DIR)
+
+def test_http_status_of_the_requests(http_server):
+
+	""" The server answers 403 to a path outside of its root, 503 when its queue is full and 200 with the energy otherwise """
+
+	server, scorer = http_server
+	assert post(server, {"path" : "/etc/passwd"})[0] == 403
+	assert post(server, [{"path" : "input/1a60.pdb"}, {"path" : "../README.md"}])[0] == 403
+
+	#The ScoringServer is not started yet, so the queue stays full
+	scorer.submit(PDB_FILE)
+	scorer.submit(PDB_FILE)
+	assert post(server, {"path" : "input/1a60.pdb"})[0] == 503
+	assert scorer.get_metrics()["rejected"] == 1
+
+	scorer.start()
+	status, response = post(server, {"path" : "input/1a60.pdb"})
+	assert status == 200
+	assert response["name"] == "1a60.pdb" and not response["error"]
+	expected = [energy for name, energy, nb_pairs in scorer.model.score_file_models(PDB_FILE)]
+	assert [m["energy"] for m in response["models"]] == pytest.approx(expected, rel = 1e-12)
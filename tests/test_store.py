@@ -0,0 +1,75 @@
+import glob
+import os
+import shutil
+import numpy as np
+import pytest
+from conftest import DATA_DIR
+from Distances import get_residue_codes
+from Parsing import DEFAULT_ATOM_NAMES, parse_structure
+from Store import CorpusStore, pack
+from Training import TrainingCorpus
+
+PDB_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "pdb_files", "*.pdb")))[:5] + [os.path.join(DATA_DIR, "input", "1a60.pdb")]
+
+@pytest.fixture
+def corpus_files(tmp_path):
+
+	""" Copies of a few bundled files, which the tests may modify or rename """
+
+	directory = tmp_path / "pdb_files"
+	directory.mkdir()
+	files = []
+	for filename in PDB_FILES :
+		files.append(str(directory / os.path.basename(filename)))
+		shutil.copy(filename, files[-1])
+	return files
+
+def assert_same_atoms(table, parsed):
+	for column in ["chain_ids", "atom_names", "positions", "models"] :
+		np.testing.assert_array_equal(getattr(table, column), getattr(parsed, column))
+	np.testing.assert_array_equal(get_residue_codes(table.residue_names.tolist()), get_residue_codes(parsed.residue_names.tolist()))
+	np.testing.assert_array_equal(table.coordinates, parsed.coordinates)
+
+def test_store_gives_the_atoms_of_the_files(corpus_files, tmp_path):
+
+	""" Every structure read from the store has the atoms parsed from its file, with or without processes packing them """
+
+	for workers in [1, 2] :
+		path = str(tmp_path / f"corpus_{workers}.store")
+		assert pack(corpus_files, path, workers = workers) == (len(corpus_files), 0)
+		store = CorpusStore(path)
+		assert store.names == [os.path.abspath(f) for f in corpus_files]
+		for name, table in store.iter_tables() :
+			assert_same_atoms(table, parse_structure(name, DEFAULT_ATOM_NAMES))
+
+def test_repacking_reuses_the_unchanged_files(corpus_files, tmp_path):
+
+	""" Packing again only parses the modified files, the renamed ones are taken from the previous store by their hash """
+
+	path = str(tmp_path / "corpus.store")
+	pack(corpus_files, path)
+	assert pack(corpus_files, path) == (0, len(corpus_files))
+
+	renamed = corpus_files[0].replace(".pdb", "_renamed.pdb")
+	os.rename(corpus_files[0], renamed)
+	with open(corpus_files[1], "a") as f :
+		f.write("REMARK   1 MODIFIED\n")
+	corpus_files = [renamed] + corpus_files[1:]
+	assert pack(corpus_files, path) == (1, len(corpus_files) - 1)
+	assert pack(corpus_files, path, reuse = False) == (len(corpus_files), 0)
+
+	store = CorpusStore(path)
+	assert store.names[0] == os.path.abspath(renamed)
+	for name, table in store.iter_tables() :
+		assert_same_atoms(table, parse_structure(name, DEFAULT_ATOM_NAMES))
+
+def test_training_from_the_store_counts_like_the_files(corpus_files, tmp_path):
+
+	""" The counts of a corpus read from a store are the counts of its files """
+
+	path = str(tmp_path / "corpus.store")
+	pack(corpus_files, path)
+	from_store = TrainingCorpus.from_store(path)
+	from_files = TrainingCorpus.from_files(corpus_files)
+	assert from_store.filenames == [os.path.abspath(f) for f in corpus_files]
+	np.testing.assert_array_equal(from_store.counts, from_files.counts)